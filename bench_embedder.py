@@ -0,0 +1,51 @@
+"""
+Embedding Throughput Benchmark
+Compares per-chunk get_embedding calls with batched get_embeddings
+against a local mock Ollama server (no model required).
+
+Usage:
+    python bench_embedder.py [--chunks 256] [--batch-size 32] [--request-latency 0.02] [--text-latency 0.002]
+"""
+
+import argparse
+import time
+
+import pipeline.embedder as embedder
+from mock_ollama import MockOllamaServer
+
+def run_benchmark(num_chunks, batch_size, request_latency, text_latency):
+    chunks = [f"Madde {i} - Hacettepe Üniversitesi yönerge metni örneği {i}." * 20 for i in range(num_chunks)]
+
+    with MockOllamaServer(request_latency=request_latency, text_latency=text_latency) as server:
+        embedder.OLLAMA_BASE_URL = server.base_url
+
+        start = time.perf_counter()
+        single = [embedder.get_embedding(c) for c in chunks]
+        single_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = embedder.get_embeddings(chunks, batch_size=batch_size)
+        batched_time = time.perf_counter() - start
+
+    assert single == batched, "Batched embeddings differ from single-request embeddings!"
+
+    print("=" * 80)
+    print("EMBEDDING THROUGHPUT BENCHMARK (mock Ollama)")
+    print("=" * 80)
+    print(f"Chunks: {num_chunks} | Batch size: {batch_size} | "
+          f"Latency: {request_latency*1000:.1f}ms/request + {text_latency*1000:.1f}ms/text")
+    print(f"get_embedding loop : {single_time:.2f}s  ({num_chunks / single_time:.1f} chunks/sec)")
+    print(f"get_embeddings     : {batched_time:.2f}s  ({num_chunks / batched_time:.1f} chunks/sec)")
+    print(f"Speedup: {single_time / batched_time:.1f}x")
+    print(f"TCP connections opened: {len(server.connections)} for {len(server.requests)} requests "
+          f"(max {server.max_in_flight} concurrent)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched embedding throughput")
+    parser.add_argument("--chunks", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--request-latency", type=float, default=0.02)
+    parser.add_argument("--text-latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    run_benchmark(args.chunks, args.batch_size, args.request_latency, args.text_latency)
@@ -0,0 +1,48 @@
+"""
+Entity Extraction Benchmark
+Compares the compiled single-pass extractor (extract_entities / extract_entities_batch)
+with the old per-pattern re.findall extractor on the golden corpus of
+test_entity_extractor.py (chunks of hybrid_pdf_*.txt + synthetic strings).
+
+Usage:
+    python bench_entity_extractor.py [--min-length 500] [--repeat 3]
+"""
+
+import argparse
+import time
+
+from pipeline.entity_extractor import extract_entities, extract_entities_batch
+from test_entity_extractor import canonical, golden_corpus, reference_extract
+
+def best_time(fn, texts, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(texts)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def run_benchmark(min_length, repeat):
+    texts = [text for text in golden_corpus() if len(text) >= min_length]
+    for text in texts:
+        assert canonical(extract_entities(text)) == canonical(reference_extract(text)), "Results differ!"
+
+    reference = best_time(lambda batch: [reference_extract(t) for t in batch], texts, repeat)
+    single = best_time(lambda batch: [extract_entities(t) for t in batch], texts, repeat)
+    batched = best_time(extract_entities_batch, texts, repeat)
+
+    print("=" * 80)
+    print("ENTITY EXTRACTION BENCHMARK")
+    print("=" * 80)
+    print(f"Texts: {len(texts)} (>= {min_length} chars) | Best of {repeat}")
+    print(f"re.findall per pattern  : {reference * 1000 / len(texts):.3f} ms/chunk")
+    print(f"extract_entities        : {single * 1000 / len(texts):.3f} ms/chunk  ({reference / single:.1f}x)")
+    print(f"extract_entities_batch  : {batched * 1000 / len(texts):.3f} ms/chunk  ({reference / batched:.1f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the compiled entity extractor")
+    parser.add_argument("--min-length", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    run_benchmark(args.min_length, args.repeat)
@@ -4,11 +4,14 @@ import os
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DOCS_DIR = os.path.join(BASE_DIR, "belgeler")
 LANCEDB_URI = os.path.join(BASE_DIR, "lancedb_data")
+REGISTRY_PATH = os.path.join(LANCEDB_URI, "document_registry.json")  # İndekslenmiş belgelerin hash/mtime kaydı
 
 # Models
 OLLAMA_BASE_URL = "http://127.0.0.1:11434"
 EMBEDDING_MODEL = "bge-m3:latest"
 LLM_MODEL = "llama3.1:8b"  # User requested switch to installed model
+EMBEDDING_BATCH_SIZE = 32  # Chunks per /api/embed request during ingestion
+EMBEDDING_DIM = 1024       # bge-m3 vektör boyutu (LanceDB şeması: fixed_size_list<float32, 1024>)
 
 # Chunking
 # Dynamic chunking will try to respect "Madde" boundaries.
@@ -16,6 +19,44 @@ LLM_MODEL = "llama3.1:8b"  # User requested switch to installed model
 CHUNK_SIZE = 4000  
 CHUNK_OVERLAP = 200
 
+# OCR (taranmış sayfalar)
+OCR_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))  # Tesseract worker process sayısı (1 = seri)
+OCR_DPI = 72              # Render çözünürlüğü (PyMuPDF varsayılanı; daha iyi OCR için 200-300)
+OCR_LANG = "tur+eng"
+OCR_MIN_TEXT_CHARS = 50   # Bu sayıdan az metin içeren sayfalar OCR'a gönderilir
+OCR_CACHE_ENABLED = True  # Sayfa OCR sonuçlarını piksel hash'i + dil + DPI ile önbelleğe al
+
+# Ingestion
+# initial_scan'de load/OCR/clean/chunk/entity aşamalarını çalıştıran process sayısı (1 = seri)
+INGEST_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+# Streaming aşamaları (sayfa -> blok -> chunk -> embedding batch -> yazma) arasındaki kuyruk boyutu
+STREAM_QUEUE_SIZE = 8
+# Vektör yazıcısı: küçük batch'ler biriktirilip tek Arrow tablosu (tek LanceDB fragment'ı) olarak yazılır
+VECTOR_WRITE_BATCH_ROWS = 2048  # Bu kadar satır birikince yaz
+VECTOR_WRITE_BATCH_MB = 32      # ... veya bu kadar MB birikince
+VECTOR_READ_CONSISTENCY_SECONDS = 5  # Açık tablolar başka process'lerin yazmalarını en geç bu sürede görür
+
+# Watcher (belgeler/ klasörü)
+WATCH_DEBOUNCE_SECONDS = 1.0  # Dosya bu kadar süre değişmeden (boyut/mtime sabit) kalınca işlenir
+WATCH_WORKERS = 2             # Ingestion kuyruğunu işleyen thread sayısı
+
+# ANN Index (IVF_PQ, vectors tablosu)
+VECTOR_INDEX_MIN_ROWS = 10000      # Satır sayısı bunu geçince index otomatik oluşturulur (altında flat scan)
+VECTOR_INDEX_REBUILD_RATIO = 0.2   # İndekslenmemiş satır / indekslenmiş satır oranı bunu geçince yeniden oluştur
+VECTOR_INDEX_PARTITIONS = None     # IVF partition sayısı (None = sqrt(satır sayısı))
+VECTOR_INDEX_SUB_VECTORS = None    # PQ alt vektör sayısı (None = boyut / 16)
+VECTOR_NPROBES = 20                # Sorguda taranan partition sayısı (yüksek = daha iyi recall, daha yavaş)
+VECTOR_REFINE_FACTOR = 5           # limit * refine_factor aday tam vektörlerle yeniden sıralanır (None = kapalı)
+
+# DB Maintenance (fragment compaction + eski versiyon temizliği + index yenileme)
+MAINTENANCE_ENABLED = True            # main.py arka plan bakım thread'i
+MAINTENANCE_CHECK_SECONDS = 300       # Tablo sağlığı kontrol aralığı
+MAINTENANCE_IDLE_SECONDS = 60         # Son arama/yazmadan bu kadar saniye sonra (boşta iken) çalışır
+MAINTENANCE_MAX_FRAGMENTS = 32        # Fragment sayısı bunu geçince compaction
+MAINTENANCE_MAX_DELETED_RATIO = 0.1   # Silinmiş (ama hâlâ diskte duran) satır oranı bunu geçince compaction
+MAINTENANCE_MAX_VERSIONS = 100        # Versiyon sayısı bunu geçince eski versiyonları temizle
+MAINTENANCE_KEEP_VERSIONS_HOURS = 1   # Bundan yeni versiyonlar silinmez (açık okuyucular için)
+
 # RAG
 TOP_K = 6  # Artırıldı: Daha fazla chunk getir, entity re-ranking daha iyi çalışsın
 MIN_SCORE_THRESHOLD = 0.35  # Geri getirildi: Kalite kontrolü için threshold
@@ -24,15 +65,65 @@ MIN_SCORE_THRESHOLD = 0.35  # Geri getirildi: Kalite kontrolü için threshold
 ENABLE_HYBRID_RAG = True  # Hybrid RAG'i aktif et
 VECTOR_WEIGHT = 0.6       # Azaltıldı: Entity matching'e daha fazla ağırlık ver
 ENTITY_WEIGHT = 0.4       # Artırıldı: Spesifik sorgular için entity match önemli
+ENTITY_INDEX_CANDIDATES = 6    # Entity index'ten (vektör top-k dışından) eklenen aday sayısı
+ENTITY_INDEX_MAX_IDS = 512     # En çok entity eşleşen bu kadar chunk arasından vektör mesafesine göre seçilir
+
+# Lexical (BM25) arama - vektör sonuçlarıyla Reciprocal Rank Fusion (RRF) ile birleştirilir
+LEXICAL_SEARCH_ENABLED = True
+LEXICAL_TOP_K = 12          # BM25 kanalından alınan aday sayısı
+LEXICAL_PREFIX_LENGTH = 5   # Türkçe kelimeler ilk N harfe kırpılır (sabit önek kökleme)
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60                  # RRF sabiti: skor = sum(1 / (RRF_K + sıra))
 
 # Cache Settings
 ENABLE_CACHE = True       # Query-answer cache'i aktif et
 CACHE_DIR = os.path.join(BASE_DIR, "cache")
 CACHE_MAX_AGE_HOURS = 24  # Cache geçerlilik süresi (saat)
+CACHE_TAGGED_MAX_AGE_HOURS = 168  # Kaynak belgeleriyle etiketli cevaplar (belge değişince zaten silinir)
+CACHE_SWEEP_INTERVAL_SECONDS = 600  # Süresi dolan cevaplar bu aralıkla toplu silinir (cache/answers.sqlite)
+CACHE_MEMORY_MAX_ENTRIES = 256    # Bellekte tutulan cevap sayısı sınırı
+CACHE_MEMORY_MAX_MB = 32          # Bellekteki cevapların toplam boyut sınırı (cevaplar chunk metinlerini içerir)
+CACHE_MEMORY_POLICY = "tinylfu"   # "tinylfu": tek seferlik sorular sık sorulanları bellekten atamaz | "lru"
+SEMANTIC_CACHE_ENABLED = True     # Benzer (paraphrase) sorulara en yakın cache'li sorunun cevabı
+SEMANTIC_CACHE_THRESHOLD = 0.92   # Minimum cosine benzerliği
+SEMANTIC_CACHE_MAX_ENTRIES = 5000 # Semantic katmanda tutulan soru embedding'i sayısı
+SEMANTIC_CACHE_FLUSH_EVERY = 32   # Semantic index bu kadar değişiklikte bir diske yazılır
+SEMANTIC_CACHE_FLUSH_SECONDS = 30 # ... ya da son yazmadan bu kadar saniye geçtiyse (çıkışta da yazılır)
+
+# Embedding Cache (chunk metni hash'i -> embedding, kalıcı)
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "embeddings.sqlite")
+EMBEDDING_CACHE_MAX_MB = 256  # Boyut sınırı; aşılınca en az kullanılanlar silinir
+
+# Query Embedding Cache (retrieve_context: normalize soru metni -> embedding)
+QUERY_EMBEDDING_CACHE_SIZE = 1024      # Bellekte tutulan soru embedding'i sayısı (LRU, 0 = kapalı)
+QUERY_EMBEDDING_CACHE_PERSIST = True   # Kalıcı katman: yeniden başlatınca da Ollama'ya gidilmez
+QUERY_EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "query_embeddings.sqlite")
+QUERY_EMBEDDING_CACHE_MAX_MB = 32
+
+# Retrieval Cache (retrieve_context: tablo versiyonu + ayarlar + normalize soru -> sıralı chunk id'leri ve skorlar)
+# Cevap süresi dolunca veya LLM_MODEL / SYSTEM_PROMPT değişince arama tekrar yapılmaz; tabloya her yazım versiyonu değiştirir
+RETRIEVAL_CACHE_SIZE = 1024            # Bellekte tutulan arama sonucu sayısı (LRU, 0 = kapalı)
+RETRIEVAL_CACHE_PERSIST = True         # Kalıcı katman (yeniden başlatınca da geçerli)
+RETRIEVAL_CACHE_PATH = os.path.join(CACHE_DIR, "retrieval.sqlite")
+RETRIEVAL_CACHE_MAX_MB = 32
+
+# OCR Cache (sayfa pikselleri hash'i -> OCR metni, kalıcı)
+OCR_CACHE_PATH = os.path.join(CACHE_DIR, "ocr.sqlite")
+OCR_CACHE_MAX_MB = 64
+
+# Ollama Client (paylaşılan keep-alive bağlantı havuzu)
+OLLAMA_MAX_CONCURRENCY = 4      # Aynı anda Ollama'ya giden istek sayısı (= havuz boyutu)
+OLLAMA_CONNECT_TIMEOUT = 5      # seconds
+OLLAMA_READ_TIMEOUT = 60        # seconds, varsayılan yanıt bekleme süresi
+OLLAMA_EMBED_TIMEOUT = 60       # seconds, embedding isteği başına
+OLLAMA_GENERATE_TIMEOUT = 300   # seconds, LLM yanıtı (CPU'da uzun sürebilir)
 
 # Retry Settings
 MAX_RETRIES = 3
-RETRY_DELAY = 2  # seconds
+RETRY_BACKOFF_BASE = 1.0  # seconds; exponential backoff + jitter: rastgele 0..base*2^deneme
+RETRY_BACKOFF_MAX = 30.0  # seconds, tek bekleme için üst sınır
 
 # System Prompt
 SYSTEM_PROMPT = """
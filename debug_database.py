@@ -3,7 +3,8 @@ Debug script to check if Hybrid RAG PDF was processed and contains institute inf
 """
 
 import lancedb
-import json
+
+from pipeline.entity_extractor import ENTITY_TYPES
 
 # Connect to database
 db = lancedb.connect("lancedb_data")
@@ -26,16 +27,12 @@ else:
         print(f"Source: {result.get('source', 'N/A')}")
         print(f"Distance: {result.get('_distance', 'N/A')}")
         
-        # Check metadata for entities
-        metadata_str = result.get('metadata', '{}')
-        try:
-            metadata = json.loads(metadata_str) if metadata_str else {}
-            print(f"Entities in metadata:")
-            for entity_type, values in metadata.items():
-                if values:
-                    print(f"  - {entity_type}: {values}")
-        except:
-            print(f"  Metadata: {metadata_str}")
+        # Entity columns (one list<string> column per entity type)
+        print(f"Entities in chunk:")
+        for entity_type in ENTITY_TYPES:
+            values = result.get(entity_type)
+            if values:
+                print(f"  - {entity_type}: {values}")
         
         # Show text preview
         text = result.get('text', '')
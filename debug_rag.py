@@ -5,8 +5,8 @@ Sorunun neden "Belge bulunmadığı için yanıt veremiyorum" döndüğünü ana
 
 from pipeline.embedder import get_embedding
 from pipeline.vector_store import search_vectors
-from pipeline.entity_extractor import extract_entities
-from config import TOP_K
+from pipeline.entity_extractor import ENTITY_TYPES, extract_entities, normalize_entities, calculate_entity_overlap
+from config import TOP_K, VECTOR_WEIGHT, ENTITY_WEIGHT
 
 print("=" * 80)
 print("RAG DEBUG - Context Retrieval Analysis")
@@ -29,7 +29,7 @@ else:
 # 2. Vector search
 print("\n2️⃣ Vector Search")
 print("-" * 80)
-results = search_vectors(query_embedding, limit=TOP_K * 2)
+results = search_vectors(query_embedding, limit=TOP_K * 2, columns=["id", "text", "source"] + ENTITY_TYPES)
 print(f"Bulunan sonuç sayısı: {len(results)}")
 
 if not results:
@@ -54,7 +54,7 @@ for i, r in enumerate(results[:5], 1):
 # 4. Entity extraction
 print("\n4️⃣ Entity Extraction")
 print("-" * 80)
-query_entities = extract_entities(query)
+query_entities = normalize_entities(extract_entities(query))
 print(f"Query entities:")
 for entity_type, values in query_entities.items():
     if values:
@@ -64,26 +64,17 @@ for entity_type, values in query_entities.items():
 print("\n5️⃣ Hybrid Scoring Simulation")
 print("-" * 80)
 
-from pipeline.entity_extractor import calculate_entity_overlap
-import json
-
 for i, r in enumerate(results[:5], 1):
     distance = r.get('_distance', 2.0)
-    metadata_str = r.get('metadata', '{}')
-    
-    try:
-        chunk_entities = json.loads(metadata_str) if metadata_str else {}
-    except:
-        chunk_entities = {}
     
     # Vector score
     vector_score = max(0.0, min(1.0, 1.0 - (distance / 2.0)))
     
-    # Entity score
-    entity_score = calculate_entity_overlap(query_entities, chunk_entities)
+    # Entity score (the result row holds one list column per entity type, as in rag_engine)
+    entity_score = calculate_entity_overlap(query_entities, r)
     
     # Final score
-    final_score = (0.7 * vector_score) + (0.3 * entity_score)
+    final_score = (VECTOR_WEIGHT * vector_score) + (ENTITY_WEIGHT * entity_score)
     
     print(f"\n[{i}] Final Score: {final_score:.3f}")
     print(f"    Vector: {vector_score:.3f} (distance: {distance})")
@@ -97,8 +88,8 @@ print("=" * 80)
 
 if results:
     best_score = max([
-        (0.7 * max(0.0, min(1.0, 1.0 - (r.get('_distance', 2.0) / 2.0)))) + 
-        (0.3 * calculate_entity_overlap(query_entities, json.loads(r.get('metadata', '{}')) if r.get('metadata') else {}))
+        (VECTOR_WEIGHT * max(0.0, min(1.0, 1.0 - (r.get('_distance', 2.0) / 2.0)))) + 
+        (ENTITY_WEIGHT * calculate_entity_overlap(query_entities, r))
         for r in results[:5]
     ])
     
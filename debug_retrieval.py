@@ -4,8 +4,7 @@ Debug script to check retrieval and scoring
 
 from pipeline.embedder import get_embedding
 from pipeline.vector_store import search_vectors
-from pipeline.entity_extractor import extract_entities
-import json
+from pipeline.entity_extractor import ENTITY_TYPES, extract_entities
 
 print("=" * 80)
 print("DEBUG: Testing Retrieval System")
@@ -35,7 +34,7 @@ else:
 # Step 3: Search vectors
 print("\n3. Searching vector database...")
 try:
-    results = search_vectors(query_embedding, limit=5)
+    results = search_vectors(query_embedding, limit=5, columns=["id", "text", "source"] + ENTITY_TYPES)
     print(f"✅ Found {len(results)} results")
     
     if not results:
@@ -51,17 +50,12 @@ try:
             print(f"Source: {result.get('source', 'N/A')}")
             print(f"Distance: {result.get('_distance', 'N/A'):.4f}")
             
-            # Check metadata
-            metadata_str = result.get('metadata', '{}')
-            try:
-                metadata = json.loads(metadata_str) if metadata_str else {}
-                if metadata:
-                    print("Entities in chunk:")
-                    for entity_type, values in metadata.items():
-                        if values:
-                            print(f"  - {entity_type}: {values}")
-            except Exception as e:
-                print(f"  Metadata parse error: {e}")
+            # Entity columns (one list<string> column per entity type)
+            entities = {entity_type: result.get(entity_type) for entity_type in ENTITY_TYPES if result.get(entity_type)}
+            if entities:
+                print("Entities in chunk:")
+                for entity_type, values in entities.items():
+                    print(f"  - {entity_type}: {values}")
             
             # Show text preview
             text = result.get('text', '')
@@ -1,33 +1,34 @@
 import sys
 import os
+import time
 import argparse
-from pipeline.vector_store import get_db_connection, delete_document_by_source, is_file_indexed
+from config import MAINTENANCE_KEEP_VERSIONS_HOURS
+from pipeline.vector_store import (get_store, get_manifest, manifest_name, is_file_indexed, index_status,
+                                   build_vector_index, measure_recall, rebuild_entity_index)
+from pipeline.ingest import remove_document
+from pipeline.embedding_cache import get_embedding_cache, get_query_embedding_cache
+from pipeline.db_maintenance import table_health, maintenance_reasons, optimize_tables
+from pipeline.ocr_cache import get_ocr_cache
+from pipeline.cache import get_cache
+from pipeline.retrieval_cache import get_retrieval_cache
 from main import process_file
 
 def list_documents():
-    db = get_db_connection()
-    if "vectors" not in db.table_names():
+    if get_store().table("vectors") is None:
         print("No 'vectors' table found.")
         return
 
-    table = db.open_table("vectors")
-    # LanceDB doesn't have a distinct query easily yet in all versions
-    # But we can iterate. Ideally we query distinct sources.
-    # For now, let's fetch unique sources via pyarrow/pandas if dataset is small
-    # or just show count.
-    
-    # Efficient way:
+    # Answered from the per-document manifest (no vector scan)
     try:
-        df = table.to_pandas()
-        if df.empty:
+        manifest = get_manifest()
+        if not manifest:
             print("Database is empty.")
             return
-            
-        sources = df['source'].unique()
-        print(f"Indexed Documents ({len(sources)}):")
-        for s in sources:
-            count = len(df[df['source'] == s])
-            print(f"- {s} ({count} chunks)")
+
+        print(f"Indexed Documents ({len(manifest)}):")
+        for source, entry in sorted(manifest.items()):
+            ingested = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["ingested_at"])) if entry["ingested_at"] else "-"
+            print(f"- {source} ({entry['chunks']} chunks, ingested {ingested})")
     except Exception as e:
         print(f"Error listing documents: {e}")
 
@@ -41,7 +42,7 @@ def add_document(file_path):
         print(f"Warning: {filename} is already indexed.")
         choice = input("Do you want to delete and re-index it? (y/n): ")
         if choice.lower() == 'y':
-            delete_document_by_source(filename)
+            remove_document(filename)
             print(f"Deleted old entries for {filename}")
         else:
             print("Skipping.")
@@ -58,7 +59,7 @@ def delete_document(filename):
 
     check = input(f"Are you sure you want to delete all vectors for '{filename}'? (y/n): ")
     if check.lower() == 'y':
-        success = delete_document_by_source(filename)
+        success = remove_document(filename)
         if success:
             print(f"Successfully deleted {filename}.")
         else:
@@ -66,6 +67,79 @@ def delete_document(filename):
     else:
         print("Cancelled.")
 
+def cache_command(action, kind="all"):
+    caches = []
+    if kind in ("embeddings", "all"):
+        caches.append(("Embedding cache", get_embedding_cache()))
+    if kind in ("ocr", "all"):
+        caches.append(("OCR cache", get_ocr_cache()))
+    if kind in ("queries", "all") and get_query_embedding_cache().persistent is not None:
+        caches.append(("Query embedding cache", get_query_embedding_cache().persistent))
+    if kind in ("answers", "all"):
+        # Clearing goes through QueryCache so the semantic index is emptied too
+        caches.append(("Answer cache", get_cache().disk if action == "stats" else get_cache()))
+    if kind in ("retrieval", "all") and get_retrieval_cache().persistent is not None:
+        caches.append(("Retrieval cache", get_retrieval_cache().persistent))
+
+    for label, cache in caches:
+        if action == "stats":
+            stats = cache.stats()
+            print(f"{label}:")
+            print(f"- Entries: {stats['entries']}")
+            print(f"- Size: {stats['bytes'] / 1024 / 1024:.1f} MB / {stats['max_bytes'] / 1024 / 1024:.0f} MB")
+            print(f"- Hits: {stats['hits']} | Misses: {stats['misses']} | Hit rate: {stats['hit_rate']:.1%}")
+            print(f"- Evictions: {stats['evictions']}")
+        elif action == "clear":
+            cache.clear()
+            print(f"{label} cleared.")
+
+def print_index_status(status):
+    print("Vector index:")
+    print(f"- Rows: {status['rows']}")
+    if status["indexed"]:
+        print(f"- Index: {status['name']} ({status['index_type']})")
+        print(f"- Indexed rows: {status['num_indexed_rows']} | Unindexed rows: {status['num_unindexed_rows']}")
+    else:
+        print("- Index: none (flat scan)")
+
+def index_command(args):
+    if args.action == "status":
+        print_index_status(index_status())
+    elif args.action == "build":
+        print_index_status(build_vector_index(num_partitions=args.partitions, num_sub_vectors=args.sub_vectors))
+    elif args.action == "recall":
+        report = measure_recall(samples=args.samples, k=args.k, nprobes=args.nprobes,
+                                refine_factor=args.refine_factor)
+        mode = "IVF_PQ index" if report["indexed"] else "no index - flat scan"
+        print(f"Recall@{report['k']} over {report['samples']} queries ({mode}): {report['recall']:.1%}")
+        print(f"- Avg latency: {report['index_ms']:.1f} ms (search) vs {report['flat_ms']:.1f} ms (flat scan)")
+    elif args.action == "entities":
+        index = rebuild_entity_index()
+        print(f"Entity index rebuilt: {len(index)} distinct entity values")
+
+def print_health(health):
+    reasons = maintenance_reasons(health)
+    print(f"{health['table']}: {health['rows']} rows, {health['bytes'] / 1024 / 1024:.1f} MB, "
+          f"{health['fragments']} fragments ({health['small_fragments']} small), "
+          f"~{health['deleted_ratio']:.0%} deleted rows, {health['versions']} versions"
+          + (f" -> needs maintenance: {', '.join(reasons)}" if reasons else ""))
+
+def optimize_command(args):
+    if args.dry_run:
+        for name in ("vectors", manifest_name()):
+            health = table_health(name)
+            if health:
+                print_health(health)
+        return
+
+    report = optimize_tables(force=not args.if_needed, keep_hours=args.keep_hours)
+    if not report:
+        print("Nothing to optimize.")
+    for entry in report:
+        print(f"Optimized in {entry['seconds']:.1f}s:")
+        print_health(entry["before"])
+        print_health(entry["after"])
+
 def main():
     parser = argparse.ArgumentParser(description="Manage LanceDB Vector Database")
     subparsers = parser.add_subparsers(dest="command", help="Command")
@@ -81,6 +155,28 @@ def main():
     parser_delete = subparsers.add_parser("delete", help="Delete a document by filename")
     parser_delete.add_argument("filename", help="Filename (e.g., document.pdf)")
     
+    # Cache
+    parser_cache = subparsers.add_parser("cache", help="Embedding / OCR / query-embedding / answer / retrieval cache statistics / clear")
+    parser_cache.add_argument("action", choices=["stats", "clear"])
+    parser_cache.add_argument("--kind", choices=["embeddings", "ocr", "queries", "answers", "retrieval", "all"], default="all", help="Which cache (default: all)")
+    
+    # Index
+    parser_index = subparsers.add_parser("index", help="ANN (IVF_PQ) index status / build / recall check, entity index rebuild")
+    parser_index.add_argument("action", choices=["status", "build", "recall", "entities"])
+    parser_index.add_argument("--partitions", type=int, help="build: IVF partitions (default sqrt(rows))")
+    parser_index.add_argument("--sub-vectors", type=int, help="build: PQ sub-vectors (default dim/16)")
+    parser_index.add_argument("--samples", type=int, default=50, help="recall: number of sample queries")
+    parser_index.add_argument("--k", type=int, default=10, help="recall: neighbours compared per query")
+    parser_index.add_argument("--nprobes", type=int, help="recall: override VECTOR_NPROBES")
+    parser_index.add_argument("--refine-factor", type=int, help="recall: override VECTOR_REFINE_FACTOR")
+    
+    # Optimize
+    parser_optimize = subparsers.add_parser("optimize", help="Compact fragments, clean up old versions, refresh indexes")
+    parser_optimize.add_argument("--dry-run", action="store_true", help="Only show table health")
+    parser_optimize.add_argument("--if-needed", action="store_true", help="Only tables past a maintenance threshold")
+    parser_optimize.add_argument("--keep-hours", type=float, default=MAINTENANCE_KEEP_VERSIONS_HOURS,
+                                 help="Keep versions newer than this (default MAINTENANCE_KEEP_VERSIONS_HOURS)")
+    
     args = parser.parse_args()
     
     if args.command == "list":
@@ -89,6 +185,12 @@ def main():
         add_document(args.path)
     elif args.command == "delete":
         delete_document(args.filename)
+    elif args.command == "cache":
+        cache_command(args.action, args.kind)
+    elif args.command == "index":
+        index_command(args)
+    elif args.command == "optimize":
+        optimize_command(args)
     else:
         parser.print_help()
 
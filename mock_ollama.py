@@ -0,0 +1,126 @@
+"""
+Mock Ollama Server
+Local stand-in for the Ollama HTTP API, used by benchmarks and tests.
+Implements /api/embeddings, /api/embed and /api/generate with a configurable
+simulated latency, so round-trip costs can be measured without a real model.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def fake_embedding(text, dim=1024):
+    """Deterministic pseudo-embedding derived from the text hash."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [((digest[i % len(digest)] + i) % 256) / 255.0 for i in range(dim)]
+
+class MockOllamaServer:
+    """
+    Threaded HTTP server mimicking the parts of Ollama the pipeline uses.
+
+    Args:
+        request_latency: Seconds slept once per HTTP request (round-trip overhead)
+        text_latency: Seconds slept per embedded text (model compute)
+        dim: Embedding dimension
+    """
+
+    def __init__(self, request_latency=0.0, text_latency=0.0, dim=1024):
+        self.request_latency = request_latency
+        self.text_latency = text_latency
+        self.dim = dim
+        self.requests = []          # (path, number of inputs)
+        self.fail_next = {}         # path -> number of upcoming requests to fail with 500
+        self.legacy_only = False    # True: /api/embed answers 404 like old Ollama versions
+        self.connections = set()    # client (host, port) pairs = TCP connections opened
+        self.in_flight = 0
+        self.max_in_flight = 0      # highest number of concurrently served requests
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; avoid Nagle/delayed-ACK stalls on keep-alive
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.connections.add(self.client_address)
+                status, body = server._handle(self.path, payload)
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handle(self, path, payload):
+        if path == "/api/embed":
+            inputs = payload.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+        elif path == "/api/embeddings":
+            inputs = [payload.get("prompt", "")]
+        elif path == "/api/generate":
+            inputs = [payload.get("prompt", "")]
+        else:
+            return 404, {"error": "not found"}
+
+        with self._lock:
+            self.requests.append((path, len(inputs)))
+            if self.fail_next.get(path, 0) > 0:
+                self.fail_next[path] -= 1
+                return 500, {"error": "simulated failure"}
+
+        if path == "/api/embed" and self.legacy_only:
+            return 404, {"error": "not found"}
+
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.request_latency + self.text_latency * len(inputs))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        if path == "/api/embed":
+            return 200, {"model": payload.get("model"),
+                         "embeddings": [fake_embedding(t, self.dim) for t in inputs]}
+        if path == "/api/embeddings":
+            return 200, {"embedding": fake_embedding(inputs[0], self.dim)}
+        return 200, {"model": payload.get("model"), "response": "Mock yanıt.", "done": True}
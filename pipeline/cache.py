@@ -1,31 +1,671 @@
 """
 Simple Query-Answer Cache for RAG System
-Stores query-answer pairs to avoid reprocessing identical questions
+Stores query-answer pairs to avoid reprocessing identical questions.
+A semantic tier (SemanticIndex) also serves paraphrases of a cached question
+("Hacettepe ne zaman kuruldu?" / "Hacettepe Üniversitesi hangi yıl kuruldu?")
+by nearest-neighbour search over the cached questions' embeddings.
+The memory tier (MemoryTier) is bounded by entry count and total bytes; with the
+TinyLFU admission policy a one-off question cannot push out a frequently asked one.
+The disk tier (AnswerStore) is a single SQLite file; expired entries are removed in
+batch sweeps. Legacy one-JSON-file-per-query caches are imported once.
+Answers are tagged with the documents (and their content hashes) they were built from;
+re-indexing or deleting a document invalidates only the answers that used it
+(invalidate_documents), so tagged answers can live longer than untagged ones.
 """
 
+import atexit
 import hashlib
 import json
+import os
+import re
+import sqlite3
+import sys
+import threading
 import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+
+from config import ENABLE_CACHE, CACHE_DIR, CACHE_MAX_AGE_HOURS, CACHE_TAGGED_MAX_AGE_HOURS, CACHE_SWEEP_INTERVAL_SECONDS
+from config import SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES
+from config import SEMANTIC_CACHE_FLUSH_EVERY, SEMANTIC_CACHE_FLUSH_SECONDS
+from config import CACHE_MEMORY_MAX_ENTRIES, CACHE_MEMORY_MAX_MB, CACHE_MEMORY_POLICY
+from pipeline.doc_registry import get_registry
+
+class FrequencySketch:
+    """
+    Approximate access counts per cache key (count-min sketch, 4 rows of 8-bit counters).
+    All counters are halved every 10 x width increments, so old popularity fades.
+    """
+
+    def __init__(self, width: int):
+        self.width = 1 << max(int(width) - 1, 15).bit_length()  # power of two >= width
+        self.table = np.zeros((4, self.width), dtype=np.uint8)
+        self.rows = np.arange(4)
+        self.additions = 0
+        self.sample_size = 10 * self.width
+
+    def _columns(self, key: str) -> List[int]:
+        # Cache keys are MD5 hex digests: 4 independent 32-bit slices
+        return [int(key[i * 8:(i + 1) * 8], 16) & (self.width - 1) for i in range(4)]
+
+    def increment(self, key: str):
+        columns = self._columns(key)
+        counters = self.table[self.rows, columns]
+        self.table[self.rows, columns] = np.minimum(counters.astype(np.int32) + 1, 255)
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.table >>= 1
+            self.additions //= 2
+
+    def frequency(self, key: str) -> int:
+        return int(self.table[self.rows, self._columns(key)].min())
+
+def _entry_size(entry: Dict[str, Any]) -> int:
+    """Approximate bytes held by a cache entry (answers embed the full context chunks)"""
+    return (sys.getsizeof(entry['query']) + sys.getsizeof(entry['answer'])
+            + len(json.dumps(entry.get('metadata') or {}, ensure_ascii=False)) + 200)
+
+class MemoryTier:
+    """
+    In-memory cache entries bounded by max_entries and max_bytes (least recently used
+    entries are evicted first).
+    policy "tinylfu": a new entry is admitted only if it is accessed at least as often as
+    every entry it would evict (frequencies from a FrequencySketch), so hot FAQs survive
+    a burst of one-off questions; rejected entries stay available on disk.
+    policy "lru": always admitted.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 32 * 1024 * 1024, policy: str = "tinylfu"):
+        if policy not in ("tinylfu", "lru"):
+            raise ValueError(f"Unknown memory cache policy: {policy}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.sketch = FrequencySketch(max(max_entries, 1) * 8) if policy == "tinylfu" else None
+        self._entries: OrderedDict = OrderedDict()  # cache key -> (entry, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+        self._lock = threading.Lock()
+
+    def record_access(self, key: str):
+        """Counts a lookup of the key (hit or miss) for the admission policy"""
+        if self.sketch is not None:
+            with self._lock:
+                self.sketch.increment(key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: str, entry: Dict[str, Any]) -> bool:
+        """Stores an entry if the admission policy lets it in; returns whether it is held"""
+        size = _entry_size(entry)
+        with self._lock:
+            self._pop(key)
+            if size > self.max_bytes or self.max_entries <= 0:
+                self.rejections += 1
+                return False
+
+            # Victims that would make room, oldest first
+            victims, freed = [], 0
+            for victim in self._entries:
+                if (len(self._entries) - len(victims) < self.max_entries
+                        and self.bytes - freed + size <= self.max_bytes):
+                    break
+                victims.append(victim)
+                freed += self._entries[victim][1]
+
+            if victims and self.sketch is not None:
+                frequency = self.sketch.frequency(key)
+                if any(self.sketch.frequency(victim) > frequency for victim in victims):
+                    self.rejections += 1
+                    return False
+
+            for victim in victims:
+                self._pop(victim)
+                self.evictions += 1
+            self._entries[key] = (entry, size)
+            self.bytes += size
+            return True
+
+    def _pop(self, key: str):
+        """Removes a key (caller holds lock)"""
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.bytes -= item[1]
+
+    def remove(self, key: str):
+        with self._lock:
+            self._pop(key)
+
+    def remove_where(self, predicate) -> int:
+        """Removes the entries for which predicate(entry) is true"""
+        with self._lock:
+            keys = [key for key, (entry, _) in self._entries.items() if predicate(entry)]
+            for key in keys:
+                self._pop(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = self.rejections = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+class SemanticIndex:
+    """
+    Cached questions' embeddings as one L2-normalized float32 matrix (row -> cache key).
+    The matrix is preallocated to max_entries rows and a key -> row dict locates entries;
+    when full, the least recently used row is reused. Changes are saved to a single .npz
+    file (live rows only) after flush_every changes or flush_seconds, outside the lock,
+    and by flush() at shutdown, so the index survives restarts.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 5000, flush_every: int = 32, flush_seconds: float = 30):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self._reset(0)
+        self._dirty = 0
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._load()
+
+    def _reset(self, dim: int):
+        """Empty index for dim-dimensional embeddings (caller holds the lock)"""
+        self.matrix = np.zeros((self.max_entries if dim else 0, dim), dtype=np.float32)
+        self.last_used = np.zeros(self.max_entries)
+        self.used = np.zeros(self.max_entries, dtype=bool)
+        self.keys: List[Optional[str]] = [None] * self.max_entries
+        self.queries: List[Optional[str]] = [None] * self.max_entries
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._size = 0  # rows ever used (the high-water mark scanned by nearest)
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path) as data:
+                keys = data["keys"].tolist()
+                queries = data["queries"].tolist()
+                matrix = data["matrix"].astype(np.float32)
+                last_used = data["last_used"].astype(np.float64)
+        except Exception as e:
+            print(f"⚠️ Semantic cache read error: {e}")
+            return
+        if not keys:
+            return
+        # Keep the most recently used rows if max_entries shrank
+        order = np.argsort(-last_used)[:self.max_entries]
+        self._reset(matrix.shape[1])
+        for row, source in enumerate(order):
+            self.keys[row] = keys[source]
+            self.queries[row] = queries[source]
+            self._rows[keys[source]] = row
+        count = len(order)
+        self.matrix[:count] = matrix[order]
+        self.last_used[:count] = last_used[order]
+        self.used[:count] = True
+        self._size = count
+
+    def _save(self, keys, queries, matrix, last_used):
+        """Atomic write (temp file + rename); called without the index lock"""
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, keys=np.array(keys, dtype=str), queries=np.array(queries, dtype=str),
+                         matrix=matrix, last_used=last_used)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"⚠️ Semantic cache write error: {e}")
+
+    def flush(self):
+        """Saves the live rows if anything changed since the last save"""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                rows = np.flatnonzero(self.used[:self._size])
+                snapshot = ([self.keys[row] for row in rows], [self.queries[row] for row in rows],
+                            self.matrix[rows], self.last_used[rows])
+                self._dirty = 0
+                self._last_flush = time.time()
+            self._save(*snapshot)
+
+    def _changed(self):
+        """Counts a change (caller holds the lock); True when a save is due"""
+        self._dirty += 1
+        return self._dirty >= self.flush_every or time.time() - self._last_flush >= self.flush_seconds
+
+    def add(self, key: str, query: str, embedding: List[float]):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0 or not self.max_entries:
+            return
+        vector = vector / norm
+        with self._lock:
+            if self.matrix.shape[1] != len(vector):
+                # First entry, or the embedding model changed: old rows are not comparable
+                self._reset(len(vector))
+            row = self._rows.get(key)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                elif self._size < self.max_entries:
+                    row = self._size
+                    self._size += 1
+                else:
+                    row = int(np.argmin(self.last_used))
+                    del self._rows[self.keys[row]]
+                self._rows[key] = row
+            self.keys[row] = key
+            self.queries[row] = query
+            self.matrix[row] = vector
+            self.last_used[row] = time.time()
+            self.used[row] = True
+            due = self._changed()
+        if due:
+            self.flush()
+
+    def remove(self, key: str):
+        self.remove_many([key])
+
+    def remove_many(self, keys: List[str]):
+        due = False
+        with self._lock:
+            for key in keys:
+                row = self._rows.pop(key, None)
+                if row is None:
+                    continue
+                self.keys[row] = self.queries[row] = None
+                self.used[row] = False
+                self.last_used[row] = 0
+                self._free.append(row)
+                due = self._changed()
+        if due:
+            self.flush()
+
+    def nearest(self, embedding: List[float], threshold: float, limit: int = 5) -> List[tuple]:
+        """Closest cached questions with cosine similarity >= threshold: [(key, query, similarity)]"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        with self._lock:
+            if not self._rows or norm == 0 or self.matrix.shape[1] != len(vector):
+                return []
+            similarities = self.matrix[:self._size] @ (vector / norm)
+            similarities[~self.used[:self._size]] = -np.inf
+            count = min(limit, self._size)
+            top = np.argpartition(-similarities, count - 1)[:count]
+            top = top[np.argsort(-similarities[top])]
+            rows = [row for row in top if similarities[row] >= threshold]
+            # Recency only matters for eviction in this process; it is saved with the next change
+            self.last_used[rows] = time.time()
+            return [(self.keys[row], self.queries[row], float(similarities[row])) for row in rows]
+
+    def clear(self):
+        with self._save_lock, self._lock:
+            self._reset(0)
+            self._dirty = 0
+            self.path.unlink(missing_ok=True)
+
+    def __len__(self):
+        return len(self._rows)
+
+# Source tag of answers built without any document context (invalidated by every ingest)
+ANY_SOURCE = "*"
+
+class AnswerStore:
+    """
+    Disk tier of the query cache: one SQLite table (cache key -> entry) in WAL mode, so
+    get/set are single indexed statements and writes are atomic across processes.
+    answer_sources maps documents to the answers built from them; every invalidation is
+    also appended to the invalidations log, from which other processes drop their
+    in-memory copies. Hit/miss/expiry counters are persisted so the CLI can report hit rates;
+    lookup counts are kept in memory and written with the next write, every flush_every
+    lookups or flush_seconds, so get stays a single SELECT.
+    """
+
+    def __init__(self, path: Path, flush_every: int = 64, flush_seconds: float = 30):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._pending = {"hits": 0, "misses": 0}
+        self._last_flush = time.time()
+
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY, query TEXT NOT NULL, answer TEXT NOT NULL, metadata TEXT NOT NULL,"
+            " timestamp REAL NOT NULL, size INTEGER NOT NULL, sources TEXT)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(answers)")]
+        if "sources" not in columns:
+            self._conn.execute("ALTER TABLE answers ADD COLUMN sources TEXT")  # NULL = untagged
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_timestamp ON answers(timestamp)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answer_sources ("
+            " key TEXT NOT NULL, source TEXT NOT NULL, version TEXT, PRIMARY KEY (key, source))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answer_sources_source ON answer_sources(source)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS invalidations ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, timestamp REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT query, answer, metadata, timestamp, sources FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            self._pending["hits" if row is not None else "misses"] += 1
+            if (sum(self._pending.values()) >= self.flush_every
+                    or time.time() - self._last_flush >= self.flush_seconds):
+                self._write_pending()
+                self._conn.commit()
+        if row is None:
+            return None
+        return {'query': row[0], 'answer': row[1], 'metadata': json.loads(row[2]), 'timestamp': row[3],
+                'sources': json.loads(row[4]) if row[4] is not None else None}
+
+    def set(self, key: str, entry: Dict[str, Any], since: Optional[int] = None) -> bool:
+        """
+        Stores one entry. With since (an invalidation log id, see last_invalidation_id) the
+        write is skipped if one of the entry's sources was invalidated after it; the check
+        and the write are one transaction. Returns whether the entry was stored.
+        """
+        if since is None or entry.get('sources') is None:
+            self.set_many([(key, entry)])
+            return True
+        sources = list(entry['sources']) or [ANY_SOURCE]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")  # no invalidation between the check and the write
+            try:
+                stale = self._conn.execute(
+                    f"SELECT 1 FROM invalidations WHERE id > ? AND source IN ({', '.join('?' * len(sources))}) LIMIT 1",
+                    (since, *sources)
+                ).fetchone()
+                if not stale:
+                    self._insert([(key, entry)], replace=True)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return not stale
+
+    def set_many(self, items, replace: bool = True):
+        """Stores (key, entry) pairs in one transaction (replace=False keeps existing keys)"""
+        with self._lock:
+            self._insert(items, replace)
+            self._conn.commit()
+
+    def _insert(self, items, replace: bool):
+        """Writes (key, entry) pairs and their source rows (caller holds lock and commits)"""
+        self._write_pending()
+        rows, source_rows = [], []
+        for key, entry in items:
+            metadata = json.dumps(entry.get('metadata') or {}, ensure_ascii=False)
+            size = len(entry['query'].encode('utf-8')) + len(entry['answer'].encode('utf-8')) + len(metadata)
+            sources = entry.get('sources')
+            rows.append((key, entry['query'], entry['answer'], metadata, entry['timestamp'], size,
+                         json.dumps(sources, ensure_ascii=False) if sources is not None else None))
+            if sources is not None:
+                source_rows.extend((key, source, version) for source, version in (sources or {ANY_SOURCE: None}).items())
+        if replace:
+            self._conn.executemany("DELETE FROM answer_sources WHERE key = ?", [(row[0],) for row in rows])
+        self._conn.executemany(
+            f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO answers"
+            " (key, query, answer, metadata, timestamp, size, sources) VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO answer_sources (key, source, version) VALUES (?, ?, ?)", source_rows
+        )
+
+    def delete(self, key: str):
+        with self._lock:
+            self._delete_keys([key])
+            self._conn.commit()
+
+    def _delete_keys(self, keys: List[str]):
+        """Deletes answers and their source rows (caller holds lock)"""
+        self._conn.executemany("DELETE FROM answers WHERE key = ?", [(key,) for key in keys])
+        self._conn.executemany("DELETE FROM answer_sources WHERE key = ?", [(key,) for key in keys])
+
+    def sweep(self, max_age_seconds: float, tagged_max_age_seconds: Optional[float] = None) -> List[str]:
+        """
+        Deletes all expired entries in one statement; returns their keys.
+        Untagged entries expire after max_age_seconds, tagged ones after tagged_max_age_seconds.
+        """
+        now = time.time()
+        tagged_max_age_seconds = tagged_max_age_seconds or max_age_seconds
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute(
+                "DELETE FROM answers WHERE timestamp < ? AND (sources IS NULL OR timestamp < ?) RETURNING key",
+                (now - max_age_seconds, now - tagged_max_age_seconds)
+            ).fetchall()]
+            self._conn.executemany("DELETE FROM answer_sources WHERE key = ?", [(key,) for key in keys])
+            # Processes that did not look at the log for that long hold no live entries anyway
+            self._conn.execute("DELETE FROM invalidations WHERE timestamp < ?",
+                               (now - max(max_age_seconds, tagged_max_age_seconds),))
+            self._bump_counters(expired=len(keys))
+            self._conn.commit()
+        return keys
+
+    def invalidate(self, changed: Dict[str, Optional[str]]) -> List[str]:
+        """
+        Deletes the answers built from changed documents; returns their keys.
+        changed: {source: new content version, None = document removed}. Answers tagged with
+        the new version are kept; answers built without any context go on every new version.
+        """
+        conditions = [(source, version) for source, version in changed.items()]
+        if any(version is not None for version in changed.values()):
+            conditions.append((ANY_SOURCE, None))
+        with self._lock:
+            keys = set()
+            for source, version in conditions:
+                keys.update(row[0] for row in self._conn.execute(
+                    "SELECT key FROM answer_sources WHERE source = ? AND (? IS NULL OR version IS NOT ?)",
+                    (source, version, version)
+                ))
+            keys = sorted(keys)
+            self._delete_keys(keys)
+            now = time.time()
+            self._conn.executemany("INSERT INTO invalidations (source, timestamp) VALUES (?, ?)",
+                                   [(source, now) for source, _ in conditions])
+            self._bump_counters(invalidated=len(keys))
+            self._conn.commit()
+        return keys
+
+    def invalidations_since(self, last_id: int) -> tuple:
+        """(newest log id, set of sources invalidated after last_id)"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, source FROM invalidations WHERE id > ?", (last_id,)).fetchall()
+        if not rows:
+            return last_id, set()
+        return max(row[0] for row in rows), {row[1] for row in rows}
+
+    def last_invalidation_id(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM invalidations").fetchone()[0]
+
+    def import_json_dir(self, directory: Path) -> int:
+        """
+        One-time migration of the legacy disk tier (one <cache key>.json file per query).
+        Runs once per store (recorded in the meta table); existing keys are kept.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")  # one process migrates, the others wait
+            try:
+                if self._conn.execute("SELECT 1 FROM meta WHERE name = 'json_imported'").fetchone():
+                    self._conn.rollback()
+                    return 0
+                items = []
+                for path in Path(directory).glob("*.json"):
+                    try:
+                        with open(path, 'r', encoding='utf-8') as f:
+                            entry = json.load(f)
+                        items.append((path.stem, entry))
+                    except Exception as e:
+                        print(f"⚠️ Cache migration skipped {path.name}: {e}")
+                self._conn.execute("INSERT INTO meta (name, value) VALUES ('json_imported', ?)", (str(time.time()),))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        if items:
+            self.set_many(items, replace=False)
+        return len(items)
+
+    def _bump_counters(self, **deltas):
+        for name, delta in deltas.items():
+            if delta:
+                self._conn.execute(
+                    "INSERT INTO counters (name, value) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, delta)
+                )
+
+    def _write_pending(self):
+        """Writes the buffered hit/miss counts (caller holds lock and commits)"""
+        self._bump_counters(**self._pending)
+        self._pending = {"hits": 0, "misses": 0}
+        self._last_flush = time.time()
+
+    def flush(self):
+        """Writes the buffered hit/miss counts"""
+        with self._lock:
+            self._write_pending()
+            self._conn.commit()
+
+    def clear(self):
+        """Removes all entries and resets counters"""
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.execute("DELETE FROM answer_sources")
+            self._conn.execute("DELETE FROM counters")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+            self._pending = {"hits": 0, "misses": 0}
+
+    def stats(self) -> Dict[str, float]:
+        """Entry count, stored bytes and (persisted + buffered) hit/miss/expiry/invalidation totals"""
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM answers").fetchone()
+            totals = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            for name, delta in self._pending.items():
+                totals[name] = totals.get(name, 0) + delta
+        hits, misses = totals.get("hits", 0), totals.get("misses", 0)
+        lookups = hits + misses
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': 0,
+            'hits': hits,
+            'misses': misses,
+            'evictions': totals.get("expired", 0),
+            'invalidated': totals.get("invalidated", 0),
+            'hit_rate': hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._write_pending()
+            self._conn.commit()
+            self._conn.close()
+
+def _depends_on(entry: Dict[str, Any], sources: set) -> bool:
+    """Whether a cache entry was built from one of the sources (see AnswerStore.invalidate)"""
+    tags = entry.get('sources')
+    if tags is None:
+        return False
+    return bool(sources.intersection(tags)) or (not tags and ANY_SOURCE in sources)
+
+def _registered_versions(sources: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+    """{source: content hash currently in the document registry} for the given sources"""
+    registry = get_registry()
+    return {source: (registry.get(source) or {}).get("sha256") for source in sources}
+
+def _numbers(text: str) -> List[str]:
+    """Numbers in a question ("Madde 12", "2024") - paraphrases must agree on them"""
+    return sorted(re.findall(r"\d+", text))
 
 class QueryCache:
     """Simple disk-based cache for query-answer pairs"""
     
-    def __init__(self, cache_dir: str = "cache", max_age_hours: int = 24):
+    def __init__(self, cache_dir: str = "cache", max_age_hours: int = 24,
+                 semantic_threshold: float = 0.92, semantic_max_entries: int = 5000,
+                 memory_max_entries: int = 256, memory_max_mb: float = 32, memory_policy: str = "tinylfu",
+                 sweep_interval_seconds: float = 600, tagged_max_age_hours: Optional[float] = None,
+                 semantic_flush_every: int = 32, semantic_flush_seconds: float = 30):
         """
         Initialize cache
         
         Args:
             cache_dir: Directory to store cache files
             max_age_hours: Maximum age of cache entries in hours (default: 24)
+            semantic_threshold: Minimum cosine similarity for a semantic (paraphrase) hit
+            semantic_max_entries: Size bound of the semantic tier (0 = disabled)
+            memory_max_entries: Entry bound of the in-memory tier
+            memory_max_mb: Size bound of the in-memory tier in megabytes
+            memory_policy: Admission policy of the in-memory tier ("tinylfu" or "lru")
+            sweep_interval_seconds: How often set() deletes all expired entries from disk
+            tagged_max_age_hours: Maximum age of entries tagged with their source documents
+                (they are invalidated when a document changes; default: max_age_hours)
+            semantic_flush_every: Save the semantic tier after this many changes
+            semantic_flush_seconds: ... or when this many seconds passed since the last save
         """
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         self.max_age_seconds = max_age_hours * 3600
+        self.tagged_max_age_seconds = (tagged_max_age_hours if tagged_max_age_hours is not None
+                                       else max_age_hours) * 3600
+        
+        # In-memory cache for faster access (bounded, see MemoryTier)
+        self.memory_cache = MemoryTier(memory_max_entries, int(memory_max_mb * 1024 * 1024), memory_policy)
+        self.hits = 0
+        self.misses = 0
         
-        # In-memory cache for faster access
-        self.memory_cache: Dict[str, Dict[str, Any]] = {}
+        # Semantic tier: question embeddings -> cache keys
+        self.semantic_threshold = semantic_threshold
+        self.semantic = SemanticIndex(self.cache_dir / "semantic_index.npz", semantic_max_entries,
+                                      semantic_flush_every, semantic_flush_seconds) \
+            if semantic_max_entries else None
+        self.semantic_hits = 0
+        
+        # Disk tier: single SQLite file (legacy *.json files are imported once)
+        self.disk = AnswerStore(self.cache_dir / "answers.sqlite")
+        imported = self.disk.import_json_dir(self.cache_dir)
+        if imported:
+            print(f"📦 Imported {imported} cached answers from JSON files")
+        self._invalidation_id = self.disk.last_invalidation_id()
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.sweep_expired()
     
     def _get_cache_key(self, query: str) -> str:
         """Generate cache key from query"""
@@ -34,10 +674,6 @@ class QueryCache:
         # Generate hash
         return hashlib.md5(normalized.encode('utf-8')).hexdigest()
     
-    def _get_cache_path(self, cache_key: str) -> Path:
-        """Get file path for cache key"""
-        return self.cache_dir / f"{cache_key}.json"
-    
     def get(self, query: str) -> Optional[str]:
         """
         Get cached answer for query
@@ -48,41 +684,102 @@ class QueryCache:
         Returns:
             Cached answer if found and not expired, None otherwise
         """
-        cache_key = self._get_cache_key(query)
+        entry = self._get_entry(self._get_cache_key(query), query)
+        if entry is not None:
+            self.hits += 1
+            return entry['answer']
+        
+        self.misses += 1
+        print(f"❌ Cache MISS: {query[:50]}...")
+        return None
+    
+    def get_similar(self, query: str, embedding: Optional[List[float]]) -> Optional[str]:
+        """
+        Semantic tier: answer of the most similar cached question (exact-key miss)
+        
+        Args:
+            query: User query
+            embedding: Query embedding
+            
+        Returns:
+            Cached answer of a question with similarity >= semantic_threshold
+            (and the same numbers in it), None otherwise
+        """
+        if self.semantic is None or not embedding:
+            return None
+        
+        numbers = _numbers(query)
+        for cache_key, cached_query, similarity in self.semantic.nearest(embedding, self.semantic_threshold):
+            if _numbers(cached_query) != numbers:
+                continue
+            entry = self._get_entry(cache_key, cached_query)
+            if entry is None:
+                # Expired or removed: drop it from the semantic tier too
+                self.semantic.remove(cache_key)
+                continue
+            self.semantic_hits += 1
+            print(f"💾 Cache HIT (semantic {similarity:.3f}): {query[:50]}... ≈ {cached_query[:50]}...")
+            return entry['answer']
+        return None
+    
+    def _get_entry(self, cache_key: str, query: str) -> Optional[Dict[str, Any]]:
+        """Valid entry for a cache key (memory first, then disk), None otherwise"""
+        self._sync_invalidations()
+        self.memory_cache.record_access(cache_key)
         
         # Check memory cache first
-        if cache_key in self.memory_cache:
-            entry = self.memory_cache[cache_key]
+        entry = self.memory_cache.get(cache_key)
+        if entry is not None:
             if self._is_valid(entry):
                 print(f"💾 Cache HIT (memory): {query[:50]}...")
-                return entry['answer']
+                return entry
             else:
                 # Expired, remove from memory
-                del self.memory_cache[cache_key]
+                self.memory_cache.remove(cache_key)
         
         # Check disk cache
-        cache_path = self._get_cache_path(cache_key)
-        if cache_path.exists():
-            try:
-                with open(cache_path, 'r', encoding='utf-8') as f:
-                    entry = json.load(f)
-                
-                if self._is_valid(entry):
-                    # Load into memory cache
-                    self.memory_cache[cache_key] = entry
-                    print(f"💾 Cache HIT (disk): {query[:50]}...")
-                    return entry['answer']
-                else:
-                    # Expired, delete file
-                    cache_path.unlink()
-                    print(f"🗑️ Cache EXPIRED: {query[:50]}...")
-            except Exception as e:
-                print(f"⚠️ Cache read error: {e}")
-        
-        print(f"❌ Cache MISS: {query[:50]}...")
+        try:
+            entry = self.disk.get(cache_key)
+        except Exception as e:
+            print(f"⚠️ Cache read error: {e}")
+            return None
+        if entry is not None:
+            if self._is_valid(entry):
+                # Load into memory cache (if admitted)
+                self.memory_cache.put(cache_key, entry)
+                print(f"💾 Cache HIT (disk): {query[:50]}...")
+                return entry
+            else:
+                # Expired, delete row
+                self.disk.delete(cache_key)
+                print(f"🗑️ Cache EXPIRED: {query[:50]}...")
         return None
     
-    def set(self, query: str, answer: str, metadata: Optional[Dict] = None):
+    def _sync_invalidations(self):
+        """Drops in-memory entries of documents invalidated (possibly by another process)"""
+        try:
+            self._invalidation_id, sources = self.disk.invalidations_since(self._invalidation_id)
+        except Exception as e:
+            print(f"⚠️ Cache read error: {e}")
+            return
+        if sources:
+            self.memory_cache.remove_where(lambda entry: _depends_on(entry, sources))
+    
+    def invalidation_mark(self) -> int:
+        """
+        Current position of the invalidation log. Take it before retrieving an answer's
+        context and pass it to set(since=...), so an answer whose documents are re-indexed
+        or removed in the meantime is not cached.
+        """
+        try:
+            return self.disk.last_invalidation_id()
+        except Exception as e:
+            print(f"⚠️ Cache read error: {e}")
+            return self._invalidation_id
+    
+    def set(self, query: str, answer: str, metadata: Optional[Dict] = None,
+            embedding: Optional[List[float]] = None, sources: Optional[Dict[str, Optional[str]]] = None,
+            since: Optional[int] = None):
         """
         Cache query-answer pair
         
@@ -90,53 +787,133 @@ class QueryCache:
             query: User query
             answer: Generated answer
             metadata: Optional metadata (sources, chunks, etc.)
+            embedding: Query embedding (adds the question to the semantic tier)
+            sources: {source document: content version} the answer was built from
+                ({} = no document context). Tagged entries are invalidated when one of
+                their documents changes and live tagged_max_age_hours; None = untagged.
+            since: invalidation_mark() taken before sources were read. The write is skipped
+                if a source's registered content hash no longer matches sources or the
+                source was invalidated after the mark.
         """
         cache_key = self._get_cache_key(query)
+        if since is not None and sources and _registered_versions(sources) != sources:
+            print(f"⏭️ Not cached (sources changed): {query[:50]}...")
+            return
         
         entry = {
             'query': query,
             'answer': answer,
             'timestamp': time.time(),
-            'metadata': metadata or {}
+            'metadata': metadata or {},
+            'sources': sources
         }
         
-        # Save to memory cache
-        self.memory_cache[cache_key] = entry
-        
         # Save to disk cache
-        cache_path = self._get_cache_path(cache_key)
         try:
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                json.dump(entry, f, ensure_ascii=False, indent=2)
+            if not self.disk.set(cache_key, entry, since):
+                print(f"⏭️ Not cached (sources invalidated): {query[:50]}...")
+                return
             print(f"💾 Cached: {query[:50]}...")
         except Exception as e:
             print(f"⚠️ Cache write error: {e}")
+        
+        # Save to memory cache (if admitted)
+        self.memory_cache.put(cache_key, entry)
+        
+        if self.semantic is not None and embedding:
+            self.semantic.add(cache_key, query, embedding)
+        
+        if time.time() - self._last_sweep >= self.sweep_interval_seconds:
+            self.sweep_expired()
+    
+    def sweep_expired(self) -> int:
+        """Deletes all expired entries (disk and semantic tier) in one batch; returns how many"""
+        self._last_sweep = time.time()
+        try:
+            keys = self.disk.sweep(self.max_age_seconds, self.tagged_max_age_seconds)
+        except Exception as e:
+            print(f"⚠️ Cache sweep error: {e}")
+            return 0
+        if keys:
+            for key in keys:
+                self.memory_cache.remove(key)
+            if self.semantic is not None:
+                self.semantic.remove_many(keys)
+            print(f"🗑️ Cache sweep: {len(keys)} expired entries removed")
+        return len(keys)
+    
+    def invalidate_sources(self, changed: Dict[str, Optional[str]]) -> int:
+        """
+        Removes the answers built from changed documents (all tiers); returns how many
+        
+        Args:
+            changed: {source: new content version, None = document removed}
+        """
+        keys = self.disk.invalidate(changed)
+        for key in keys:
+            self.memory_cache.remove(key)
+        if keys and self.semantic is not None:
+            self.semantic.remove_many(keys)
+        self._sync_invalidations()
+        if keys:
+            print(f"🗑️ Cache: {len(keys)} answers invalidated ({', '.join(sorted(changed))})")
+        return len(keys)
     
     def _is_valid(self, entry: Dict) -> bool:
         """Check if cache entry is still valid"""
         age = time.time() - entry['timestamp']
+        if entry.get('sources') is not None:
+            return age < self.tagged_max_age_seconds
         return age < self.max_age_seconds
     
     def clear(self):
         """Clear all cache (memory and disk)"""
         # Clear memory
         self.memory_cache.clear()
+        self.hits = self.misses = self.semantic_hits = 0
+        if self.semantic is not None:
+            self.semantic.clear()
         
-        # Clear disk
+        # Clear disk (and legacy JSON files)
+        self.disk.clear()
         for cache_file in self.cache_dir.glob("*.json"):
             cache_file.unlink()
         
         print("🗑️ Cache cleared")
     
-    def stats(self) -> Dict[str, int]:
-        """Get cache statistics"""
-        disk_count = len(list(self.cache_dir.glob("*.json")))
-        memory_count = len(self.memory_cache)
+    def flush(self):
+        """Saves pending semantic tier changes and the disk tier's buffered hit/miss counts"""
+        if self.semantic is not None:
+            self.semantic.flush()
+        self.disk.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics (hit counters are per process)"""
+        disk = self.disk.stats()
+        memory = self.memory_cache
+        lookups = self.hits + self.misses
+        memory_lookups = memory.hits + memory.misses
         
         return {
-            'memory_entries': memory_count,
-            'disk_entries': disk_count,
-            'total_entries': disk_count
+            'memory_entries': len(memory),
+            'memory_bytes': memory.bytes,
+            'memory_max_entries': memory.max_entries,
+            'memory_max_bytes': memory.max_bytes,
+            'memory_policy': memory.policy,
+            'memory_hits': memory.hits,
+            'memory_hit_rate': memory.hits / memory_lookups if memory_lookups else 0.0,
+            'memory_evictions': memory.evictions,
+            'memory_rejections': memory.rejections,
+            'disk_entries': disk['entries'],
+            'disk_bytes': disk['bytes'],
+            'disk_expired': disk['evictions'],
+            'invalidated': disk['invalidated'],
+            'total_entries': disk['entries'],
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            'semantic_entries': len(self.semantic) if self.semantic is not None else 0,
+            'semantic_hits': self.semantic_hits
         }
 
 # Global cache instance
@@ -146,5 +923,41 @@ def get_cache() -> QueryCache:
     """Get global cache instance"""
     global _cache_instance
     if _cache_instance is None:
-        _cache_instance = QueryCache()
+        _cache_instance = QueryCache(
+            cache_dir=CACHE_DIR, max_age_hours=CACHE_MAX_AGE_HOURS,
+            semantic_threshold=SEMANTIC_CACHE_THRESHOLD,
+            semantic_max_entries=SEMANTIC_CACHE_MAX_ENTRIES if SEMANTIC_CACHE_ENABLED else 0,
+            memory_max_entries=CACHE_MEMORY_MAX_ENTRIES, memory_max_mb=CACHE_MEMORY_MAX_MB,
+            memory_policy=CACHE_MEMORY_POLICY, sweep_interval_seconds=CACHE_SWEEP_INTERVAL_SECONDS,
+            tagged_max_age_hours=CACHE_TAGGED_MAX_AGE_HOURS,
+            semantic_flush_every=SEMANTIC_CACHE_FLUSH_EVERY, semantic_flush_seconds=SEMANTIC_CACHE_FLUSH_SECONDS
+        )
     return _cache_instance
+
+def flush_cache():
+    """Saves the global cache's pending changes (registered with atexit)"""
+    if _cache_instance is not None:
+        _cache_instance.flush()
+
+atexit.register(flush_cache)
+
+def invalidate_documents(changed: Dict[str, Optional[str]]) -> int:
+    """
+    Called by ingestion when documents are indexed, re-indexed, renamed or removed:
+    invalidates the cached answers built from them ({source: new content hash, None = removed}).
+    Without a cache in this process only the disk tier is updated; processes holding
+    a cache pick the change up from the invalidation log.
+    """
+    if not ENABLE_CACHE or not changed:
+        return 0
+    try:
+        if _cache_instance is not None:
+            return _cache_instance.invalidate_sources(changed)
+        store = AnswerStore(Path(CACHE_DIR) / "answers.sqlite")
+        try:
+            return len(store.invalidate(changed))
+        finally:
+            store.close()
+    except Exception as e:
+        print(f"⚠️ Cache invalidation error: {e}")
+        return 0
@@ -1,6 +1,14 @@
 import re
 from config import CHUNK_SIZE, CHUNK_OVERLAP
 
+# Yapılandırılmış bölüm başlıkları: Madde X, 1., a) gibi yapılar
+SPLIT_PATTERN = re.compile(r'(Madde \d+|^\d+\.|^\s*[a-z]\))', re.MULTILINE | re.IGNORECASE)
+
+# Metnin sonunda, bir sonraki blokla birleşince başlığa dönüşebilecek kısım
+# ("...Madd" + "e 5", "...\n" + " a)") - bu kısım gelene kadar kesim yapılmaz
+_PENDING_HEADER = re.compile(r'(?:^(?:\s*|\d+|\s*[a-z])|m(?:a(?:d(?:d(?:e ?)?)?)?)?)\Z',
+                             re.MULTILINE | re.IGNORECASE)
+
 def chunk_text(text, max_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
     """
     Geliştirilmiş semantic chunking stratejisi:
@@ -11,49 +19,69 @@ def chunk_text(text, max_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
     if not text:
         return []
 
-    # Yapılandırılmış bölümleri yakala
-    # Pattern: Madde X, 1., a) gibi yapılar
-    split_pattern = r'(Madde \d+|^\d+\.|^\s*[a-z]\))'
-    
-    parts = re.split(split_pattern, text, flags=re.MULTILINE | re.IGNORECASE)
-    
-    chunks = []
-    current_chunk = ""
-    
-    # İlk kısım (preamble/başlangıç metni)
-    if parts:
-        current_chunk = parts[0]
-    
-    # Yapılandırılmış bölümleri işle
-    for i in range(1, len(parts), 2):
-        header = parts[i]
-        content = parts[i+1] if i+1 < len(parts) else ""
-        
-        full_section = header + content
-        
-        # Önceki chunk'ı kaydet
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
-        
-        # Büyük bölümler için semantic chunking kullan
-        if len(full_section) > max_size:
-            # Semantic-aware sliding window
-            sub_chunks = semantic_sliding_window(full_section, max_size, overlap)
-            chunks.extend(sub_chunks)
-            current_chunk = ""
-        else:
-            current_chunk = full_section
-                
-    # Kalan chunk'ı ekle
-    if current_chunk.strip():
-        # Eğer yapılandırılmamış veri çok büyükse semantic chunking uygula
-        if len(current_chunk) > max_size:
-            sub_chunks = semantic_sliding_window(current_chunk, max_size, overlap)
-            chunks.extend(sub_chunks)
-        else:
-            chunks.append(current_chunk.strip())
-        
-    return chunks
+    return list(iter_chunks([text], max_size, overlap))
+
+def iter_chunks(blocks, max_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    chunk_text'in streaming versiyonu: metin blokları (boşlukla birleştirilmiş kabul edilir)
+    geldikçe kesinleşen chunk'ları üretir. Bellekte sadece açık bölüm tutulur; max_size'ı
+    aşan bölümler metin gelmeye devam ederken sliding window ile kesilir.
+    list(iter_chunks(blocks)) == chunk_text(" ".join(blocks))
+
+    Her parça (başlangıç metni veya bir başlıkla başlayan bölüm) için:
+    - max_size'dan büyükse semantic_sliding_window ile bölünür
+    - değilse tek chunk olarak eklenir
+    """
+    buffer = ""        # Açık parça (ssw_start'tan önce en fazla 1 karakter bağlam)
+    search_from = 0    # Sonraki başlık bu indeksten itibaren aranır
+    ssw_start = None   # Parça max_size'ı aştıysa sliding window'un bulunduğu indeks
+    first = True
+
+    for block in blocks:
+        buffer = block if first else f"{buffer} {block}"
+        first = False
+
+        # Kapanan parçalar: sonraki başlık bulundukça
+        while True:
+            match = SPLIT_PATTERN.search(buffer, search_from)
+            if not match:
+                break
+            if ssw_start is None:
+                yield from _piece_chunks(buffer[:match.start()], max_size, overlap)
+            else:
+                yield from _sliding_window(buffer[:match.start()], ssw_start, max_size, overlap)
+            buffer = buffer[match.start():]
+            search_from = match.end() - match.start()
+            ssw_start = None
+
+        # Açık parça: başlık olabilecek son kısma kadar kesinleşmiş metin
+        pending = _PENDING_HEADER.search(buffer, max(search_from, len(buffer) - 64))
+        safe_end = pending.start() if pending else len(buffer)
+        search_from = max(search_from, safe_end)
+
+        if ssw_start is None and safe_end > max_size:
+            ssw_start = 0
+        if ssw_start is not None:
+            ssw_start = yield from _sliding_window(buffer, ssw_start, max_size, overlap, limit=safe_end)
+            if ssw_start > 1:
+                # Kesilen metni bırak (^ eşleşmeleri için 1 karakter bağlam kalır)
+                trim = ssw_start - 1
+                buffer = buffer[trim:]
+                search_from -= trim
+                ssw_start = 1
+
+    # Son parça
+    if ssw_start is None:
+        yield from _piece_chunks(buffer, max_size, overlap)
+    else:
+        yield from _sliding_window(buffer, ssw_start, max_size, overlap)
+
+def _piece_chunks(piece, max_size, overlap):
+    # Büyük bölümler için semantic chunking kullan
+    if len(piece) > max_size:
+        yield from _sliding_window(piece, 0, max_size, overlap)
+    elif piece.strip():
+        yield piece.strip()
 
 def semantic_sliding_window(text, chunk_size, overlap):
     """
@@ -65,11 +93,21 @@ def semantic_sliding_window(text, chunk_size, overlap):
     
     Bu sayede unstructured data için daha anlamlı chunk'lar oluşturulur.
     """
-    chunks = []
-    start = 0
+    return list(_sliding_window(text, 0, chunk_size, overlap))
+
+def _sliding_window(text, start, chunk_size, overlap, limit=None):
+    """
+    semantic_sliding_window'un adımları, text[start:]'tan itibaren.
+    limit verilirse (metnin devamı henüz gelmedi) sadece pencere limit'ten önce
+    bittiği sürece ilerler. Returns: kalınan start indeksi.
+    """
     text_len = len(text)
     
     while start < text_len:
+        # Devamı gelmeden bu pencere kesinleşmez
+        if limit is not None and start + chunk_size >= limit:
+            return start
+
         # Hedef bitiş noktası
         end = min(start + chunk_size, text_len)
         
@@ -77,8 +115,8 @@ def semantic_sliding_window(text, chunk_size, overlap):
         if end >= text_len:
             chunk = text[start:].strip()
             if chunk:
-                chunks.append(chunk)
-            break
+                yield chunk
+            return text_len
         
         # Akıllı kesim noktası bul (paragraf/cümle/kelime sınırı)
         cut_point = find_best_cut_point(text, start, end, chunk_size)
@@ -86,16 +124,14 @@ def semantic_sliding_window(text, chunk_size, overlap):
         # Chunk'ı ekle
         chunk = text[start:cut_point].strip()
         if chunk:
-            chunks.append(chunk)
+            yield chunk
         
         # Overlap ile ilerle (context korunması için)
-        start = cut_point - overlap
-        
-        # Sonsuz döngüyü önle
-        if start < cut_point - chunk_size:
-            start = cut_point
+        # Sonsuz döngüyü önle: kesim overlap'ten erken ise geri gitme
+        next_start = cut_point - overlap
+        start = next_start if next_start > start else cut_point
     
-    return chunks
+    return start
 
 def find_best_cut_point(text, start, end, chunk_size):
     """
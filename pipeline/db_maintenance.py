@@ -0,0 +1,128 @@
+"""
+Vector DB Maintenance
+Every append, delete and manifest update leaves new Lance fragments, deletion files and
+versions behind. This module watches the fragment count, the share of deleted rows still
+on disk and the version count, and when a threshold is passed compacts the tables,
+removes versions older than MAINTENANCE_KEEP_VERSIONS_HOURS and refreshes the indexes.
+The background MaintenanceThread only does so while the store is idle.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from config import (MAINTENANCE_CHECK_SECONDS, MAINTENANCE_IDLE_SECONDS, MAINTENANCE_MAX_FRAGMENTS,
+                    MAINTENANCE_MAX_DELETED_RATIO, MAINTENANCE_MAX_VERSIONS, MAINTENANCE_KEEP_VERSIONS_HOURS)
+from pipeline.vector_store import (get_store, get_writer, manifest_name, entity_index_name,
+                                   maybe_update_index, refresh_source_index, idle_seconds,
+                                   _update_lexical_index)
+
+def table_health(table_name="vectors"):
+    """
+    Storage state of a table (None if it does not exist):
+    {"table", "rows", "bytes", "fragments", "small_fragments", "deleted_ratio", "versions"}
+    deleted_ratio is estimated from the fragment lengths (deleted rows stay on disk
+    until compaction).
+    """
+    table = get_store().table(table_name)
+    if table is None:
+        return None
+
+    stats = table.stats()
+    fragments = stats["fragment_stats"]
+    physical_rows = fragments["lengths"]["mean"] * fragments["num_fragments"]
+    deleted_ratio = max(0.0, 1.0 - stats["num_rows"] / physical_rows) if physical_rows else 0.0
+    return {
+        "table": table_name,
+        "rows": stats["num_rows"],
+        "bytes": stats["total_bytes"],
+        "fragments": fragments["num_fragments"],
+        "small_fragments": fragments["num_small_fragments"],
+        "deleted_ratio": deleted_ratio,
+        "versions": len(table.list_versions())
+    }
+
+def maintenance_reasons(health):
+    """Thresholds a table's health passes (empty list: nothing to do)."""
+    if not health:
+        return []
+    reasons = []
+    if health["fragments"] > MAINTENANCE_MAX_FRAGMENTS:
+        reasons.append(f"{health['fragments']} fragments")
+    if health["deleted_ratio"] > MAINTENANCE_MAX_DELETED_RATIO:
+        reasons.append(f"{health['deleted_ratio']:.0%} deleted rows")
+    if health["versions"] > MAINTENANCE_MAX_VERSIONS:
+        reasons.append(f"{health['versions']} versions")
+    return reasons
+
+def optimize_tables(table_name="vectors", force=False, keep_hours=MAINTENANCE_KEEP_VERSIONS_HOURS):
+    """
+    Compacts fragments, drops versions older than keep_hours and folds new rows into
+    the indexes, for the vectors table, its manifest and its entity postings (under
+    the writer lock).
+    force=False: only tables that pass a maintenance threshold.
+    Returns: list of {"table", "reasons", "before", "after", "seconds"} for optimized tables
+    """
+    report = []
+    writer = get_writer()
+    with writer.lock:
+        writer.flush()
+        for name in (table_name, manifest_name(table_name), entity_index_name(table_name)):
+            before = table_health(name)
+            reasons = maintenance_reasons(before)
+            if before is None or not (force or reasons):
+                continue
+
+            print(f"🧹 Optimizing {name}" + (f" ({', '.join(reasons)})" if reasons else ""))
+            start = time.perf_counter()
+            if name == table_name:
+                # Compaction does not merge indexed and unindexed fragments together
+                refresh_source_index(table_name, force=True)
+            table = get_store().table(name)
+            before_version = table.version
+            table.optimize(cleanup_older_than=timedelta(hours=keep_hours))
+            # Compaction rewrites fragments, not rows: the lexical index only follows the version
+            _update_lexical_index(name, before_version)
+            report.append({"table": name, "reasons": reasons, "before": before,
+                           "after": table_health(name), "seconds": time.perf_counter() - start})
+
+        if report:
+            # Compaction keeps the indexes; rebuild the ANN index if it has drifted too far
+            maybe_update_index(table_name)
+    return report
+
+class MaintenanceThread:
+    """
+    Background maintenance: every check_seconds, if the vector store has been idle
+    (no search or write in this process) for idle_seconds, optimizes the tables that
+    pass a threshold.
+    """
+
+    def __init__(self, table_name="vectors", check_seconds=MAINTENANCE_CHECK_SECONDS,
+                 idle_seconds=MAINTENANCE_IDLE_SECONDS):
+        self.table_name = table_name
+        self.check_seconds = check_seconds
+        self.idle_seconds = idle_seconds
+        self.runs = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="db-maintenance", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._stop.wait(self.check_seconds):
+            if idle_seconds() < self.idle_seconds:
+                continue
+            try:
+                if optimize_tables(self.table_name):
+                    self.runs += 1
+            except Exception as e:
+                print(f"Error during DB maintenance: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
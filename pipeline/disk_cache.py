@@ -0,0 +1,318 @@
+"""
+Size-bounded persistent key-value cache (SQLite)
+Shared storage for caches that outlive the process (embeddings, OCR, ...).
+Values are raw bytes; least-recently-used entries are evicted past max_bytes.
+Hit/miss/eviction counters are persisted so the CLI can report hit rates.
+Lookups are plain SELECTs: access times and counters are kept in memory and written
+in batches (with the next write, every flush_every lookups or flush_seconds, and at
+close / exit), so concurrent readers do not queue for the SQLite writer lock.
+TieredLRUCache puts a size-bounded in-process LRU in front of such a persistent tier.
+"""
+
+import abc
+import atexit
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+
+# Open caches, flushed at exit
+_open_caches = weakref.WeakSet()
+
+class DiskLRUCache:
+    """SQLite-backed LRU cache: key (str) -> value (bytes)"""
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None, flush_every: int = 256,
+                 flush_seconds: float = 30):
+        """
+        Initialize cache
+
+        Args:
+            path: SQLite database file
+            max_bytes: Upper bound for stored value bytes (None = unbounded)
+            flush_every: Write buffered access times / counters after this many lookups
+            flush_seconds: ... or when this many seconds passed since the last write
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+        # Running total of stored bytes (re-synced by stats())
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+        # Session counters (persisted totals live in the counters table)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Not yet written: key -> last access time, counter deltas
+        self._touched: Dict[str, float] = {}
+        self._pending = {"hits": 0, "misses": 0}
+        self._lookups = 0
+        self._last_flush = time.time()
+        _open_caches.add(self)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Returns {key: value} for the keys that are cached and refreshes their LRU position"""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQL_BATCH):
+                batch = keys[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            now = time.time()
+            self._touched.update((key, now) for key in found)
+            hits, misses = len(found), len(keys) - len(found)
+            self.hits += hits
+            self.misses += misses
+            self._pending["hits"] += hits
+            self._pending["misses"] += misses
+            self._lookups += len(keys)
+            if self._lookups >= self.flush_every or now - self._last_flush >= self.flush_seconds:
+                self._write_pending()
+                self._conn.commit()
+        return found
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items: Iterable[Tuple[str, bytes]]):
+        """Stores values and evicts least-recently-used entries if over max_bytes"""
+        now = time.time()
+        rows = [(key, sqlite3.Binary(value), len(value), now) for key, value in items]
+        if not rows:
+            return
+        with self._lock:
+            self._write_pending()  # eviction must see the buffered access times
+            keys = [row[0] for row in rows]
+            for i in range(0, len(keys), _SQL_BATCH):
+                batch = keys[i:i + _SQL_BATCH]
+                self._bytes -= self._conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM entries WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._bytes += sum(row[2] for row in dict((row[0], row) for row in rows).values())
+            self._evict()
+            self._conn.commit()
+
+    def set(self, key: str, value: bytes):
+        self.set_many([(key, value)])
+
+    def delete_many(self, keys: Iterable[str]):
+        keys = list(keys)
+        with self._lock:
+            for i in range(0, len(keys), _SQL_BATCH):
+                batch = keys[i:i + _SQL_BATCH]
+                self._bytes -= sum(size for size, in self._conn.execute(
+                    f"DELETE FROM entries WHERE key IN ({','.join('?' * len(batch))}) RETURNING size", batch
+                ).fetchall())
+            self._conn.commit()
+
+    def _evict(self):
+        """Drops LRU entries until the cache is back under 90% of max_bytes (caller holds lock)"""
+        if not self.max_bytes or self._bytes <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if self._bytes <= target:
+                break
+            victims.append((key,))
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self.evictions += len(victims)
+        self._bump_counters(evictions=len(victims))
+
+    def _write_pending(self):
+        """Writes buffered access times and hit/miss counts (caller holds lock and commits)"""
+        if self._touched:
+            self._conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                   [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+        self._bump_counters(**self._pending)
+        self._pending = {"hits": 0, "misses": 0}
+        self._lookups = 0
+        self._last_flush = time.time()
+
+    def flush(self):
+        """Writes buffered access times and counters"""
+        with self._lock:
+            self._write_pending()
+            self._conn.commit()
+
+    def _bump_counters(self, **deltas):
+        for name, delta in deltas.items():
+            if delta:
+                self._conn.execute(
+                    "INSERT INTO counters (name, value) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, delta)
+                )
+
+    def clear(self):
+        """Removes all entries and resets counters"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM counters")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+            self.hits = self.misses = self.evictions = 0
+            self._touched.clear()
+            self._pending = {"hits": 0, "misses": 0}
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Entry count, stored bytes and (persisted + buffered) hit/miss/eviction totals"""
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            self._bytes = size  # other processes may have written too
+            totals = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            for name, delta in self._pending.items():
+                totals[name] = totals.get(name, 0) + delta
+        hits, misses = totals.get("hits", 0), totals.get("misses", 0)
+        lookups = hits + misses
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes or 0,
+            'hits': hits,
+            'misses': misses,
+            'evictions': totals.get("evictions", 0),
+            'hit_rate': hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._write_pending()
+            self._conn.commit()
+            self._conn.close()
+        _open_caches.discard(self)
+
+def flush_open_caches():
+    """Writes the buffered access times and counters of every open cache (registered with atexit)"""
+    for cache in list(_open_caches):
+        try:
+            cache.flush()
+        except Exception as e:
+            print(f"⚠️ Cache flush error ({cache.path.name}): {e}")
+
+atexit.register(flush_open_caches)
+
+class TieredLRUCache(abc.ABC):
+    """
+    Size-bounded in-process LRU, optionally backed by a persistent tier (memory misses are
+    looked up there). Subclasses build the keys and define the value conversions:
+    _to_memory / _from_memory (stored copy <-> returned value) and _load / _save
+    (persistent tier; they get the extra arguments passed to _get / _put).
+    """
+
+    def __init__(self, max_entries: int, persistent: Optional[Any] = None):
+        """
+        Initialize cache
+
+        Args:
+            max_entries: In-memory entry bound (least-recently-used entries are evicted)
+            persistent: Optional persistent tier
+        """
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self._entries = OrderedDict()  # key -> stored value
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _to_memory(self, value: Any) -> Any:
+        return value
+
+    def _from_memory(self, stored: Any) -> Any:
+        return stored
+
+    @abc.abstractmethod
+    def _load(self, key: Hashable, *args) -> Optional[Any]:
+        """Value from the persistent tier or None (only called when persistent is set)"""
+
+    @abc.abstractmethod
+    def _save(self, key: Hashable, value: Any, *args):
+        """Stores value in the persistent tier (only called when persistent is set)"""
+
+    def _get(self, key: Hashable, *args) -> Optional[Any]:
+        """Cached value (memory first, then the persistent tier) or None"""
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._from_memory(stored)
+
+        value = self._load(key, *args) if self.persistent is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            stored = self._remember(key, value)
+        return self._from_memory(stored)
+
+    def _put(self, key: Hashable, value: Any, *args):
+        with self._lock:
+            self._remember(key, value)
+        if self.persistent is not None:
+            self._save(key, value, *args)
+
+    def _remember(self, key: Hashable, value: Any) -> Any:
+        """Stores a copy and evicts past max_entries (caller holds lock); returns the copy"""
+        stored = self._entries[key] = self._to_memory(value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return stored
+
+    def stats(self):
+        """Session counters of the memory tier (+ persisted totals of the disk tier)"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'disk': self.persistent.stats() if self.persistent is not None else None
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+        if self.persistent is not None:
+            self.persistent.clear()
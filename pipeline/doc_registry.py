@@ -0,0 +1,117 @@
+"""
+Document Registry
+Records content hash, mtime, size and chunk count for every indexed PDF so that
+ingestion can skip unchanged files, re-index edited ones and re-link renamed copies.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional, Dict, Any
+
+from config import REGISTRY_PATH
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of the file contents"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class DocumentRegistry:
+    """JSON-backed registry: filename -> {sha256, size, mtime_ns, chunks, indexed_at}"""
+
+    def __init__(self, path: str = REGISTRY_PATH):
+        """
+        Initialize registry
+
+        Args:
+            path: JSON file holding the registry (kept next to the LanceDB data)
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.reload()
+
+    def reload(self):
+        """(Re)load the registry from disk"""
+        with self._lock:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.documents = json.load(f).get('documents', {})
+            except FileNotFoundError:
+                self.documents = {}
+            except Exception as e:
+                print(f"⚠️ Registry read error: {e}")
+                self.documents = {}
+
+    def _save(self):
+        """Atomically write the registry (temp file + rename)"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'documents': self.documents}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.documents.get(filename)
+
+    def is_unchanged(self, filename: str, st: os.stat_result) -> bool:
+        """True if the file's size and mtime match the registered entry (no hashing needed)"""
+        entry = self.get(filename)
+        return bool(entry) and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns
+
+    def find_by_hash(self, sha256: str, exclude: Optional[str] = None) -> Optional[str]:
+        """Filename of another registered document with the same content"""
+        with self._lock:
+            for filename, entry in self.documents.items():
+                if entry['sha256'] == sha256 and filename != exclude:
+                    return filename
+        return None
+
+    def register(self, filename: str, sha256: str, st: os.stat_result, chunks: int):
+        """Record (or update) an indexed document"""
+        with self._lock:
+            self.documents[filename] = {
+                'sha256': sha256,
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'chunks': chunks,
+                'indexed_at': time.time()
+            }
+            self._save()
+
+    def touch(self, filename: str, st: os.stat_result):
+        """Content unchanged but mtime/size metadata moved (e.g. file copied over itself)"""
+        with self._lock:
+            entry = self.documents.get(filename)
+            if entry:
+                entry['size'] = st.st_size
+                entry['mtime_ns'] = st.st_mtime_ns
+                self._save()
+
+    def remove(self, filename: str):
+        with self._lock:
+            if self.documents.pop(filename, None) is not None:
+                self._save()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'documents': len(self.documents),
+                'chunks': sum(e['chunks'] for e in self.documents.values())
+            }
+
+# Global registry instance
+_registry_instance = None
+
+def get_registry() -> DocumentRegistry:
+    """Get global registry instance"""
+    global _registry_instance
+    if _registry_instance is None:
+        _registry_instance = DocumentRegistry()
+    return _registry_instance
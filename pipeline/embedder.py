@@ -1,28 +1,90 @@
-import requests
-import time
-from config import OLLAMA_BASE_URL, EMBEDDING_MODEL, MAX_RETRIES, RETRY_DELAY
+import asyncio
+from config import OLLAMA_BASE_URL, EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE, OLLAMA_EMBED_TIMEOUT
+from pipeline.ollama_client import get_ollama_client, OllamaNotFoundError
 
 def get_embedding(text):
     """
     Generates embedding for the given text using Ollama.
-    Implements retry logic with backoff.
+    Implements retry logic with backoff (shared pooled client).
     """
     url = f"{OLLAMA_BASE_URL}/api/embeddings"
     payload = {
         "model": EMBEDDING_MODEL,
         "prompt": text
     }
-    
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            return data["embedding"]
-        except requests.exceptions.RequestException as e:
-            print(f"Embedding attempt {attempt+1}/{MAX_RETRIES} failed: {e}")
-            if attempt < MAX_RETRIES - 1:
-                time.sleep(RETRY_DELAY)
-            else:
-                print(f"Failed to generate embedding for chunk: {text[:30]}...")
-                return None
+
+    try:
+        return get_ollama_client().post_json(
+            url, payload, timeout=OLLAMA_EMBED_TIMEOUT,
+            parse=lambda data: data["embedding"], label="Embedding"
+        )
+    except Exception:
+        print(f"Failed to generate embedding for chunk: {text[:30]}...")
+        return None
+
+def get_embeddings(texts, batch_size=EMBEDDING_BATCH_SIZE):
+    """
+    Generates embeddings for many texts using Ollama's multi-input /api/embed endpoint.
+    Texts are sent in sub-batches of `batch_size`, up to OLLAMA_MAX_CONCURRENCY of them
+    at once over the shared connection pool; a failed sub-batch is retried on its own
+    without resending the ones that already succeeded.
+    Returns: list of embeddings in input order (None where a sub-batch kept failing).
+    """
+    batches = _split_batches(texts, batch_size)
+    return _merge_batches(get_ollama_client().map(_embed_batch, batches))
+
+async def aget_embeddings(texts, batch_size=EMBEDDING_BATCH_SIZE):
+    """
+    asyncio version of get_embeddings: sub-batches are awaited concurrently, each one a
+    blocking request on the Ollama client's worker threads (at most OLLAMA_MAX_CONCURRENCY
+    in flight, same as get_embeddings).
+    """
+    client = get_ollama_client()
+    batches = _split_batches(texts, batch_size)
+    return _merge_batches(await asyncio.gather(*(client.arun(_embed_batch, batch) for batch in batches)))
+
+async def aget_embedding(text):
+    """asyncio version of get_embedding (runs on the Ollama client's worker threads)."""
+    return await get_ollama_client().arun(get_embedding, text)
+
+def _split_batches(texts, batch_size):
+    texts = list(texts)
+    batch_size = max(1, int(batch_size))
+    return [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+
+def _merge_batches(batch_results):
+    """Flattens per-batch results; a failed batch (None) becomes None per text"""
+    embeddings = []
+    for batch, batch_embeddings in batch_results:
+        embeddings.extend(batch_embeddings if batch_embeddings is not None else [None] * len(batch))
+    return embeddings
+
+def _embed_batch(batch):
+    """
+    Embeds one sub-batch with retries. Falls back to the single-input
+    /api/embeddings endpoint when the server does not know /api/embed.
+    Returns: (batch, embeddings or None)
+    """
+    url = f"{OLLAMA_BASE_URL}/api/embed"
+    payload = {
+        "model": EMBEDDING_MODEL,
+        "input": batch
+    }
+
+    def parse(data):
+        batch_embeddings = data["embeddings"]
+        if len(batch_embeddings) != len(batch):
+            raise ValueError(f"expected {len(batch)} embeddings, got {len(batch_embeddings)}")
+        return batch_embeddings
+
+    try:
+        return batch, get_ollama_client().post_json(
+            url, payload, timeout=OLLAMA_EMBED_TIMEOUT, parse=parse,
+            label=f"Batch embedding ({len(batch)} texts)"
+        )
+    except OllamaNotFoundError:
+        # Older Ollama versions only expose /api/embeddings
+        return batch, [get_embedding(text) for text in batch]
+    except Exception:
+        print(f"Failed to generate embeddings for batch starting with: {batch[0][:30]}...")
+        return batch, None
@@ -0,0 +1,149 @@
+"""
+Persistent Chunk-Embedding Cache
+Keyed by (embedding model, hash of the normalized chunk text) so that re-indexing an
+edited document, or boilerplate paragraphs shared between yönerge files, never hit
+Ollama twice for the same text.
+
+QueryEmbeddingCache does the same for questions in retrieve_context: an in-process LRU
+in front of an optional persistent tier, so repeated or retried questions (even when
+their answer has to be regenerated) skip the embedding round trip.
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from config import EMBEDDING_MODEL, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_MB
+from config import (QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_PERSIST, QUERY_EMBEDDING_CACHE_PATH,
+                    QUERY_EMBEDDING_CACHE_MAX_MB)
+from pipeline.disk_cache import DiskLRUCache, TieredLRUCache
+
+def normalize_text(text: str) -> str:
+    """NFKC + collapsed whitespace, so formatting-only differences share a cache entry"""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip()
+
+class EmbeddingCache:
+    """Embedding cache on top of DiskLRUCache (vectors stored as float32 bytes)"""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, model: str = EMBEDDING_MODEL,
+                 max_mb: int = EMBEDDING_CACHE_MAX_MB):
+        """
+        Initialize cache
+
+        Args:
+            path: SQLite file for the cache
+            model: Embedding model name (part of every key)
+            max_mb: Size bound in megabytes (least-recently-used entries are evicted)
+        """
+        self.model = model
+        self.store = DiskLRUCache(path, max_bytes=max_mb * 1024 * 1024)
+
+    def _key(self, text: str) -> str:
+        normalized = normalize_text(text)
+        return hashlib.sha256(f"{self.model}\x00{normalized}".encode('utf-8')).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached embeddings in input order (None for misses)"""
+        keys = [self._key(t) for t in texts]
+        found = self.store.get_many(keys)
+        return [np.frombuffer(found[k], dtype=np.float32).tolist() if k in found else None for k in keys]
+
+    def put_many(self, texts: List[str], embeddings: List[Optional[List[float]]]):
+        """Stores embeddings (None entries are skipped)"""
+        self.store.set_many(
+            (self._key(t), np.asarray(e, dtype=np.float32).tobytes())
+            for t, e in zip(texts, embeddings) if e is not None
+        )
+
+    def get_or_compute(self, texts: List[str], compute: Callable[[List[str]], List]) -> List[Optional[List[float]]]:
+        """
+        Returns embeddings for texts, calling `compute` only for cache misses
+        (each distinct missing text is computed once).
+        """
+        embeddings = self.get_many(texts)
+        missing = list(dict.fromkeys(t for t, e in zip(texts, embeddings) if e is None))
+        if missing:
+            computed = dict(zip(missing, compute(missing)))
+            self.put_many(missing, [computed[t] for t in missing])
+            embeddings = [e if e is not None else computed[t] for t, e in zip(texts, embeddings)]
+        return embeddings
+
+    def stats(self):
+        return self.store.stats()
+
+    def clear(self):
+        self.store.clear()
+
+class QueryEmbeddingCache(TieredLRUCache):
+    """
+    Size-bounded LRU of query embeddings keyed by (embedding model, normalized query),
+    optionally backed by a persistent EmbeddingCache (memory misses are looked up there)
+    """
+
+    def __init__(self, max_entries: int = QUERY_EMBEDDING_CACHE_SIZE, model: str = EMBEDDING_MODEL,
+                 persistent: Optional[EmbeddingCache] = None):
+        """
+        Initialize cache
+
+        Args:
+            max_entries: In-memory entry bound (least-recently-used entries are evicted)
+            model: Embedding model name (part of every key)
+            persistent: Optional persistent tier (must use the same model)
+        """
+        super().__init__(max_entries, persistent)
+        self.model = model
+
+    def _key(self, query: str) -> tuple:
+        return self.model, normalize_text(query)
+
+    def _to_memory(self, embedding: List[float]) -> np.ndarray:
+        return np.asarray(embedding, dtype=np.float32)
+
+    def _from_memory(self, vector: np.ndarray) -> List[float]:
+        return vector.tolist()
+
+    def _load(self, key: tuple, query: str) -> Optional[List[float]]:
+        return self.persistent.get_many([query])[0]
+
+    def _save(self, key: tuple, embedding: List[float], query: str):
+        self.persistent.put_many([query], [embedding])
+
+    def get(self, query: str) -> Optional[List[float]]:
+        """Cached embedding of the query (memory first, then the persistent tier) or None"""
+        return self._get(self._key(query), query)
+
+    def put(self, query: str, embedding: List[float]):
+        self._put(self._key(query), embedding, query)
+
+    def get_or_compute(self, query: str, compute: Callable[[str], Optional[List[float]]]) -> Optional[List[float]]:
+        """Returns the query embedding, calling `compute` only on a miss (failures are not cached)"""
+        embedding = self.get(query)
+        if embedding is None:
+            embedding = compute(query)
+            if embedding:
+                self.put(query, embedding)
+        return embedding
+
+# Global cache instances
+_cache_instance = None
+_query_cache_instance = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get global embedding cache instance"""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = EmbeddingCache()
+    return _cache_instance
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """Get global query-embedding cache instance"""
+    global _query_cache_instance
+    if _query_cache_instance is None:
+        persistent = None
+        if QUERY_EMBEDDING_CACHE_PERSIST:
+            persistent = EmbeddingCache(QUERY_EMBEDDING_CACHE_PATH, max_mb=QUERY_EMBEDDING_CACHE_MAX_MB)
+        _query_cache_instance = QueryEmbeddingCache(persistent=persistent)
+    return _query_cache_instance
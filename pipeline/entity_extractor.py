@@ -1,11 +1,202 @@
 """
 Basit Entity Extractor - Türkçe Akademik Belgeler İçin
 Regex tabanlı entity extraction (NER olmadan)
+
+Kurallar bir kez derlenir (ENTITY_RULES). Her metin tek seferde taranır: sabit isimler
+(üniversite, yerleşke, enstitü, merkez adları...) ve sonekler (Fakültesi, Enstitüsü,
+Merkezi...) düz alt dizgi aramasıyla bulunur, regex'ler yalnız bu konumlarda çalışır.
+"N kelime + Sonek" kuralları ("Yapay Zeka Mühendisliği") metnin her konumunda değil,
+sonekten geriye en fazla N kelimelik pencerede denenir - sonuç eski findall döngüsüyle birebir aynıdır.
 """
 
 import re
+from bisect import bisect_right
 from typing import Dict, List
 
+from pipeline.text_cleaner import turkish_lower
+
+# Entity tipleri - vektör tablosunda her biri ayrı bir list<string> sütunu
+ENTITY_TYPES = [
+    "universities", "faculties", "departments", "programs", "courses",
+    "institutes", "research_centers", "dates", "locations", "madde_numbers"
+]
+
+def _names(names, word_bounded=False):
+    pattern = "(" + "|".join(re.escape(name) for name in names) + ")"
+    return r"\b" + pattern + r"\b" if word_bounded else pattern
+
+def _suffix(suffixes, max_words):
+    return r"((?:\w+\s+){0,%d}(?:%s))" % (max_words, "|".join(re.escape(s) for s in suffixes))
+
+def _name_rule(entity_type, names, flags=0, word_bounded=False):
+    return (entity_type, "keyword", _names(names, word_bounded), flags, names, 0)
+
+def _suffix_rule(entity_type, suffixes, max_words):
+    return (entity_type, "suffix", _suffix(suffixes, max_words), 0, suffixes, max_words)
+
+MONTHS = ["Ocak", "Şubat", "Mart", "Nisan", "Mayıs", "Haziran", "Temmuz", "Ağustos", "Eylül",
+          "Ekim", "Kasım", "Aralık"]
+
+# Kurallar - eski regex listesiyle aynı sıra ve aynı regex'ler. Her kural bir "çapa" ile
+# derlenir; regex yalnız çapanın gösterdiği konumlarda çalıştırılır:
+#   "keyword": eşleşme anahtar kelimelerden biriyle başlar (katlanmış metinde aranır)
+#   "suffix":  "(\w+\s+){0,N}" + sonek - sonekin geçtiği yerden en fazla N kelime geriye gidilir
+#   "digit":   eşleşme \b ile başlayan bir sayıdır
+# Satır: (entity tipi, çapa, regex, flags, anahtar kelimeler / sonekler, N)
+ENTITY_RULES = [
+    # 1. Üniversite isimleri
+    ("universities", "keyword", r'Hacettepe\s+Üniversitesi', re.IGNORECASE, ["Hacettepe"], 0),
+    _name_rule("universities", ["Hacettepe"], re.IGNORECASE),
+    _name_rule("universities", ["H.Ü."], re.IGNORECASE),
+    _name_rule("universities", ["HÜ"], re.IGNORECASE),
+    # 2. Fakülte isimleri
+    _suffix_rule("faculties", ["Fakültesi"], 3),
+    # 3. Bölüm isimleri
+    _suffix_rule("departments", ["Mühendisliği"], 3),
+    _suffix_rule("departments", ["Bölümü"], 3),
+    _suffix_rule("departments", ["Anabilim Dalı"], 3),
+    # 4. Tarihler: yıl (1900-2099), DD/MM/YYYY, uzun format
+    ("dates", "digit", r'\b(19\d{2}|20\d{2})\b', re.IGNORECASE, [], 0),
+    ("dates", "digit", r'\b(\d{1,2}[./]\d{1,2}[./]\d{2,4})\b', re.IGNORECASE, [], 0),
+    ("dates", "digit", r'\b(\d{1,2}\s+(?:%s)\s+\d{4})\b' % "|".join(MONTHS), re.IGNORECASE, [], 0),
+    # 5. Lokasyonlar (Hacettepe yerleşkeleri dahil)
+    _name_rule("locations", ["Ankara", "İstanbul", "İzmir", "Bursa", "Antalya"], re.IGNORECASE, True),
+    _name_rule("locations", ["Sıhhiye", "Beytepe", "Keçiören", "Polatlı"], re.IGNORECASE, True),
+    _name_rule("locations", ["Türkiye", "Turkey"], re.IGNORECASE, True),
+    _name_rule("locations", ["Kampüs", "Yerleşke"], re.IGNORECASE, True),
+    _name_rule("locations", ["Beytepe Yerleşkesi", "Sıhhiye Yerleşkesi", "Polatlı Yerleşkesi"], re.IGNORECASE),
+    # 6. Kişi isimleri - KALDIRILDI (Fakülte/Bölüm isimleriyle karışıyor)
+    # 7. Madde numaraları (Yönetmelikler için)
+    ("madde_numbers", "keyword", r'Madde\s+(\d+)', re.IGNORECASE, ["Madde"], 0),
+    # 8. Programlar
+    _suffix_rule("programs", ["Programı"], 4),
+    _suffix_rule("programs", ["Program"], 4),
+    _name_rule("programs", ["Lisans Programı", "Yüksek Lisans Programı", "Doktora Programı"]),
+    _name_rule("programs", ["Önlisans Programı", "Lisansüstü Program"]),
+    # 9. Dersler
+    _suffix_rule("courses", ["Dersi"], 4),
+    _suffix_rule("courses", ["Kursu"], 4),
+    # 10. Enstitüler
+    _suffix_rule("institutes", ["Enstitüsü"], 4),
+    _name_rule("institutes", ["Aşı Enstitüsü", "Bilişim Enstitüsü", "Kanser Enstitüsü",
+                              "Nükleer Bilimler Enstitüsü"]),
+    _name_rule("institutes", ["Nüfus Etütleri Enstitüsü", "Sağlık Bilimleri Enstitüsü",
+                              "Fen Bilimleri Enstitüsü"]),
+    _name_rule("institutes", ["Sosyal Bilimler Enstitüsü", "Eğitim Bilimleri Enstitüsü",
+                              "Türkiyat Araştırmaları Enstitüsü"]),
+    # 11. Araştırma Merkezleri: kısaltmalar, özel tam isimler, genel pattern (en sona)
+    _name_rule("research_centers", ["HATAM", "HÜNİTEK", "HÜNİKAL", "IONOLAB", "PDRMER"], word_bounded=True),
+    _name_rule("research_centers", ["İleri Teknolojiler Uygulama ve Araştırma Merkezi"]),
+    _name_rule("research_centers", ["HIV-AIDS Tedavi ve Araştırma Merkezi"]),
+    _name_rule("research_centers", ["İlaç ve Kozmetik Ar-Ge Laboratuvarı"]),
+    _name_rule("research_centers", ["Nörolojik ve Psikiyatrik Uygulama Merkezi"]),
+    _name_rule("research_centers", ["Hareket Analizi ve Podiatri Merkezi"]),
+    _suffix_rule("research_centers", ["Merkezi", "Uygulama ve Araştırma Merkezi", "Araştırma Merkezi"], 6),
+    _name_rule("research_centers", ["Teknokent", "Hacettepe Teknokent"]),
+    _suffix_rule("research_centers", ["Laboratuvarı"], 4),
+]
+
+# Bu tiplerde eşleşmeler kırpılır, 5 karakterden kısa olanlar atılır
+STRIPPED_TYPES = {"faculties", "departments", "programs", "courses", "institutes", "research_centers"}
+
+def _fold(text: str) -> str:
+    """
+    Anahtar kelime taraması için katlanmış metin: küçük harf, İ/I/ı -> i, ſ -> s.
+    Uzunluğu korur (konumlar metinle aynı) ve IGNORECASE eşleşen her yeri kapsar.
+    """
+    return text.replace("İ", "i").lower().replace("ı", "i").replace("ſ", "s")
+
+class _CompiledRules:
+    """Kural tablosunun derlenmiş hali: regex'ler ve anahtar kelime -> kural eşlemeleri."""
+
+    def __init__(self, rules):
+        self.rules = [(entity_type, anchor, re.compile(pattern, flags), max_words)
+                      for entity_type, anchor, pattern, flags, _, max_words in rules]
+        self.keywords = {}  # katlanmış anahtar kelime -> [kural no]
+        self.suffixes = {}  # sonek (büyük/küçük harf duyarlı) -> [kural no]
+        self.digit_rules = []
+        for number, (_, anchor, _, _, words, _) in enumerate(rules):
+            if anchor == "digit":
+                self.digit_rules.append(number)
+            for word in words:
+                table = self.suffixes if anchor == "suffix" else self.keywords
+                table.setdefault(word if anchor == "suffix" else _fold(word), []).append(number)
+        self.chain_back = {max_words: re.compile(r"\w*(?:\s+\w*){0,%d}" % max_words)
+                           for _, anchor, _, max_words in self.rules if anchor == "suffix"}
+
+_COMPILED = _CompiledRules(ENTITY_RULES)
+_DIGIT_RUN = re.compile(r"\d+")
+SEPARATOR = "\x00"  # toplu taramada metinler arası ayraç (hiçbir kurala uymaz)
+
+def _is_word(char: str) -> bool:
+    return char.isalnum() or char == "_"  # regex \w
+
+def _occurrences(text: str, word: str) -> List[int]:
+    """word'ün metindeki tüm (çakışanlar dahil) başlangıç konumları."""
+    positions = []
+    position = text.find(word)
+    while position != -1:
+        positions.append(position)
+        position = text.find(word, position + 1)
+    return positions
+
+def _scan(joined: str) -> Dict[int, List[int]]:
+    """
+    Tek tarama: kural no -> aday konumlar. Anahtar kelimeler katlanmış metinde, sonekler
+    metnin kendisinde aranır (her biri bir kez, onu kullanan bütün kurallar için);
+    sayı kurallarının adayları kelime başındaki sayılardır.
+    """
+    candidates = {}
+    folded = _fold(joined)
+    for table, text in ((_COMPILED.keywords, folded), (_COMPILED.suffixes, joined)):
+        for word, numbers in table.items():
+            positions = _occurrences(text, word)
+            if positions:
+                for number in numbers:
+                    candidates.setdefault(number, []).extend(positions)
+    digits = [m.start() for m in _DIGIT_RUN.finditer(joined)
+              if m.start() == 0 or not _is_word(joined[m.start() - 1])]
+    if digits:
+        for number in _COMPILED.digit_rules:
+            candidates[number] = digits
+    return candidates
+
+def _chain_start(text: str, end: int, max_words: int) -> int:
+    """
+    end'de biten kelime zincirinin (en fazla max_words kelime + boşluk) başlayabileceği
+    en küçük konum: geriye doğru yalnız kelime/boşluk karakterleri, en fazla max_words
+    boşluk grubu. Pencere ters çevrilip tek regex ile ölçülür.
+    """
+    pattern = _COMPILED.chain_back[max_words]
+    window = 128
+    while True:
+        low = max(0, end - window)
+        length = pattern.match(text[low:end][::-1]).end()
+        if low == 0 or length < end - low:
+            return end - length
+        window *= 4
+
+def _match_rule(text: str, anchor: str, pattern, max_words: int, positions: List[int]) -> List[str]:
+    """
+    pattern.findall(text) ile aynı sonuç, ama regex yalnız aday konumlarda denenir.
+    positions eşleşmenin başlayabileceği her konumu (suffix kuralında her sonek konumunu) içerir.
+    """
+    matches = []
+    end = 0
+    for position in positions:
+        if position < end:
+            continue
+        if anchor == "suffix":
+            # Sonekten önceki pencerede mutlaka bir eşleşme başlar (en geç sonekte)
+            match = pattern.search(text, max(end, _chain_start(text, position, max_words)))
+        else:
+            match = pattern.match(text, position)
+            if match is None:
+                continue
+        matches.append(match.group(1) if pattern.groups else match.group())
+        end = match.end()
+    return matches
+
 def extract_entities(text: str) -> Dict[str, List[str]]:
     """
     Metinden entity'leri çıkarır (regex tabanlı)
@@ -14,140 +205,67 @@ def extract_entities(text: str) -> Dict[str, List[str]]:
         text: Analiz edilecek metin
         
     Returns:
-        Entity dictionary:
+        Entity dictionary: ENTITY_TYPES tipi -> tekrarsız değer listesi
         {
             "universities": [...],
             "faculties": [...],
-            "departments": [...],
-            "dates": [...],
-            "locations": [...],
-            "people": [...]
+            ...
+            "madde_numbers": [...]
         }
     """
-    entities = {
-        "universities": [],
-        "faculties": [],
-        "departments": [],
-        "programs": [],          # YENİ: Akademik programlar
-        "courses": [],           # YENİ: Ders isimleri
-        "institutes": [],        # YENİ: Enstitüler
-        "research_centers": [],  # YENİ: Araştırma merkezleri
-        "dates": [],
-        "locations": [],
-        "madde_numbers": []
-    }
-    
-    # 1. Üniversite isimleri
-    uni_patterns = [
-        r'Hacettepe\s+Üniversitesi',
-        r'Hacettepe',
-        r'H\.Ü\.',
-        r'HÜ'
-    ]
-    for pattern in uni_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        entities["universities"].extend(matches)
-    
-    # 2. Fakülte isimleri
-    faculty_pattern = r'((?:\w+\s+){0,3}Fakültesi)'
-    faculties = re.findall(faculty_pattern, text)
-    entities["faculties"] = [f.strip() for f in faculties if len(f.strip()) > 5]
-    
-    # 3. Bölüm isimleri
-    dept_patterns = [
-        r'((?:\w+\s+){0,3}Mühendisliği)',
-        r'((?:\w+\s+){0,3}Bölümü)',
-        r'((?:\w+\s+){0,3}Anabilim Dalı)'
-    ]
-    for pattern in dept_patterns:
-        matches = re.findall(pattern, text)
-        entities["departments"].extend([m.strip() for m in matches if len(m.strip()) > 5])
-    
-    # 4. Tarihler
-    date_patterns = [
-        r'\b(19\d{2}|20\d{2})\b',  # Yıl (1900-2099)
-        r'\b(\d{1,2}[./]\d{1,2}[./]\d{2,4})\b',  # Tarih (DD/MM/YYYY)
-        r'\b(\d{1,2}\s+(?:Ocak|Şubat|Mart|Nisan|Mayıs|Haziran|Temmuz|Ağustos|Eylül|Ekim|Kasım|Aralık)\s+\d{4})\b'  # Uzun format
-    ]
-    for pattern in date_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        entities["dates"].extend(matches)
-    
-    # 5. Lokasyonlar (Geliştirilmiş - Hybrid RAG PDF önerisi)
-    location_patterns = [
-        r'\b(Ankara|İstanbul|İzmir|Bursa|Antalya)\b',
-        r'\b(Sıhhiye|Beytepe|Keçiören|Polatlı)\b',  # Hacettepe yerleşkeleri
-        r'\b(Türkiye|Turkey)\b',
-        r'\b(Kampüs|Yerleşke)\b',
-        r'(Beytepe Yerleşkesi|Sıhhiye Yerleşkesi|Polatlı Yerleşkesi)'
-    ]
-    for pattern in location_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        entities["locations"].extend(matches)
-    
-    # 6. Kişi isimleri - KALDIRILDI (Fakülte/Bölüm isimleriyle karışıyor)
-    
-    # 7. Madde numaraları (Yönetmelikler için)
-    madde_pattern = r'Madde\s+(\d+)'
-    madde_numbers = re.findall(madde_pattern, text, re.IGNORECASE)
-    entities["madde_numbers"] = madde_numbers
-    
-    # 8. Programlar (YENİ - Hybrid RAG PDF önerisi)
-    program_patterns = [
-        r'((?:\w+\s+){0,4}Programı)',
-        r'((?:\w+\s+){0,4}Program)',
-        r'(Lisans Programı|Yüksek Lisans Programı|Doktora Programı)',
-        r'(Önlisans Programı|Lisansüstü Program)'
-    ]
-    for pattern in program_patterns:
-        matches = re.findall(pattern, text)
-        entities["programs"].extend([m.strip() for m in matches if len(m.strip()) > 5])
-    
-    # 9. Dersler (YENİ)
-    course_patterns = [
-        r'((?:\w+\s+){0,4}Dersi)',
-        r'((?:\w+\s+){0,4}Kursu)'
-    ]
-    for pattern in course_patterns:
-        matches = re.findall(pattern, text)
-        entities["courses"].extend([m.strip() for m in matches if len(m.strip()) > 5])
-    
-    # 10. Enstitüler (YENİ - Hybrid RAG PDF önerisi)
-    institute_patterns = [
-        r'((?:\w+\s+){0,4}Enstitüsü)',
-        r'(Aşı Enstitüsü|Bilişim Enstitüsü|Kanser Enstitüsü|Nükleer Bilimler Enstitüsü)',
-        r'(Nüfus Etütleri Enstitüsü|Sağlık Bilimleri Enstitüsü|Fen Bilimleri Enstitüsü)',
-        r'(Sosyal Bilimler Enstitüsü|Eğitim Bilimleri Enstitüsü|Türkiyat Araştırmaları Enstitüsü)'
-    ]
-    for pattern in institute_patterns:
-        matches = re.findall(pattern, text)
-        entities["institutes"].extend([m.strip() for m in matches if len(m.strip()) > 5])
-    
-    # 11. Araştırma Merkezleri (YENİ - Hybrid RAG PDF önerisi)
-    center_patterns = [
-        # Kısaltmalar (PDF'de geçen önemli merkezler)
-        r'\b(HATAM|HÜNİTEK|HÜNİKAL|IONOLAB|PDRMER)\b',
-        # Özel tam isimler (önce spesifik olanlar)
-        r'(İleri Teknolojiler Uygulama ve Araştırma Merkezi)',
-        r'(HIV-AIDS Tedavi ve Araştırma Merkezi)',
-        r'(İlaç ve Kozmetik Ar-Ge Laboratuvarı)',
-        r'(Nörolojik ve Psikiyatrik Uygulama Merkezi)',
-        r'(Hareket Analizi ve Podiatri Merkezi)',
-        # Genel pattern (en sona)
-        r'((?:\w+\s+){0,6}(?:Merkezi|Uygulama ve Araştırma Merkezi|Araştırma Merkezi))',
-        r'(Teknokent|Hacettepe Teknokent)',
-        r'((?:\w+\s+){0,4}Laboratuvarı)'
-    ]
-    for pattern in center_patterns:
-        matches = re.findall(pattern, text)
-        entities["research_centers"].extend([m.strip() for m in matches if len(m.strip()) > 5])
+    return extract_entities_batch([text])[0]
 
-    
-    # Tekrarları kaldır ve küçük harf yap (case-insensitive comparison için)
-    for key in entities:
-        entities[key] = list(set(entities[key]))
-    
-    return entities
+def extract_entities_batch(texts: List[str]) -> List[Dict[str, List[str]]]:
+    """
+    Çok sayıda metnin (ör. bir belgenin chunk'ları) entity'leri - her metin için
+    extract_entities ile aynı sonuç. Anahtar kelime / sonek / sayı taraması tüm metinler
+    birleştirilerek bir kez yapılır; regex'ler yalnız bulunan konumlarda çalışır.
+    """
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text) + len(SEPARATOR)
+    # Kural no -> metin no -> yerel aday konumlar
+    per_text = {}
+    for number, positions in _scan(SEPARATOR.join(texts)).items():
+        by_text = per_text[number] = {}
+        for position in sorted(set(positions)):
+            index = bisect_right(starts, position) - 1
+            by_text.setdefault(index, []).append(position - starts[index])
+
+    results = []
+    for index, text in enumerate(texts):
+        entities = {entity_type: [] for entity_type in ENTITY_TYPES}
+        for number, (entity_type, anchor, pattern, max_words) in enumerate(_COMPILED.rules):
+            positions = per_text.get(number, {}).get(index)
+            if not positions:
+                continue
+            matches = _match_rule(text, anchor, pattern, max_words, positions)
+            if entity_type in STRIPPED_TYPES:
+                matches = [m.strip() for m in matches if len(m.strip()) > 5]
+            entities[entity_type].extend(matches)
+
+        # Tekrarları kaldır
+        for key in entities:
+            entities[key] = list(set(entities[key]))
+        results.append(entities)
+    return results
+
+def normalize_entity(value: str) -> str:
+    """Türkçe küçük harf (I -> ı, İ -> i) + boşluk temizliği"""
+    return " ".join(turkish_lower(value).split())
+
+def normalize_entities(entities: Dict) -> Dict[str, List[str]]:
+    """
+    Entity'leri saklama / karşılaştırma biçimine getirir:
+    her ENTITY_TYPES tipi için küçük harfli, tekrarsız ve sıralı liste
+    """
+    normalized = {}
+    for entity_type in ENTITY_TYPES:
+        values = {normalize_entity(v) for v in (entities or {}).get(entity_type) or []}
+        normalized[entity_type] = sorted(v for v in values if v)
+    return normalized
 
 def calculate_entity_overlap(query_entities: Dict, chunk_entities: Dict) -> float:
     """
@@ -155,7 +273,7 @@ def calculate_entity_overlap(query_entities: Dict, chunk_entities: Dict) -> floa
     
     Args:
         query_entities: Soru entity'leri
-        chunk_entities: Chunk entity'leri
+        chunk_entities: Chunk entity'leri (ör. arama sonucu satırı: tip -> liste)
         
     Returns:
         Overlap skoru (0.0 - 1.0)
@@ -178,8 +296,8 @@ def calculate_entity_overlap(query_entities: Dict, chunk_entities: Dict) -> floa
     }
     
     for entity_type in query_entities:
-        query_set = set([e.lower() for e in query_entities[entity_type]])
-        chunk_set = set([e.lower() for e in chunk_entities.get(entity_type, [])])
+        query_set = set([normalize_entity(e) for e in query_entities[entity_type]])
+        chunk_set = set([normalize_entity(e) for e in chunk_entities.get(entity_type) or []])
         
         if not query_set:
             continue
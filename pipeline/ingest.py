@@ -0,0 +1,439 @@
+"""
+Document ingestion stages.
+plan_document decides (via the document registry) whether a file must be indexed at all.
+stream_document runs a single document as a streaming pipeline
+(pages -> cleaned blocks -> chunks -> embedding batches -> Arrow writes) with bounded
+queues between the stages, so memory does not grow with the document size.
+prepare_document runs the CPU-bound stages (load, OCR, clean, chunk, entity extraction)
+in worker processes; its chunks then go through the same embedding/writer stages.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pytesseract
+
+from config import (ENABLE_HYBRID_RAG, OCR_WORKERS, EMBEDDING_CACHE_ENABLED,
+                    EMBEDDING_BATCH_SIZE)
+from pipeline.pdf_loader import load_pdf, iter_pdf_pages, log_error
+from pipeline.text_cleaner import clean_text, iter_clean_blocks
+from pipeline.chunker import chunk_text, iter_chunks
+from pipeline.embedder import get_embeddings
+from pipeline.embedding_cache import get_embedding_cache
+from pipeline.streaming import StreamPipeline
+from pipeline.vector_store import (make_record_batch, add_record_batch, delete_document_by_source,
+                                   is_file_indexed, count_source_rows, rename_source, copy_source,
+                                   get_writer, maybe_update_index)
+from pipeline.doc_registry import get_registry, file_sha256
+from pipeline.cache import invalidate_documents
+
+# Hybrid RAG için entity extractor
+if ENABLE_HYBRID_RAG:
+    from pipeline.entity_extractor import extract_entities, extract_entities_batch
+
+def prepare_document(file_path, ocr_workers=None):
+    """
+    Load -> Clean -> Chunk -> (Hybrid) Entity extraction.
+    Returns a picklable dict so it can be sent back from a worker process:
+    {"file_path", "filename", "chunks", "entities", "error", "seconds"}
+    ocr_workers: size of the OCR pool for scanned pages (default: OCR_WORKERS)
+    """
+    start = time.perf_counter()
+    prepared = {
+        "file_path": file_path,
+        "filename": os.path.basename(file_path),
+        "chunks": [],
+        "entities": [],
+        "error": None,
+        "seconds": 0.0
+    }
+
+    try:
+        # 1. Load
+        raw_text = load_pdf(file_path, ocr_workers=ocr_workers)
+        if not raw_text:
+            print(f"Skipping {file_path} (Empty or unreadable)")
+            return prepared
+
+        # 2. Clean
+        cleaned_text = clean_text(raw_text)
+
+        # 3. Chunk
+        chunks = chunk_text(cleaned_text)
+        print(f"Generated {len(chunks)} chunks from {prepared['filename']}")
+
+        # 4. Hybrid RAG: Entity extraction
+        entities = batch_entities(chunks)
+
+        prepared["chunks"] = chunks
+        prepared["entities"] = entities
+    except Exception as e:
+        prepared["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        prepared["seconds"] = time.perf_counter() - start
+
+    return prepared
+
+def chunk_entities(chunk):
+    """Hybrid RAG: entities of a chunk ({} when disabled; normalized by make_record_batch)."""
+    if ENABLE_HYBRID_RAG:
+        return extract_entities(chunk)
+    return {}
+
+def batch_entities(chunks):
+    """Hybrid RAG: entities of many chunks at once (one scan over the whole batch)."""
+    if ENABLE_HYBRID_RAG:
+        return extract_entities_batch(chunks)
+    return [{} for _ in chunks]
+
+def iter_chunk_records(chunks):
+    """Chunk stage: (chunk, entities) pairs."""
+    for chunk in chunks:
+        yield chunk, chunk_entities(chunk)
+
+def iter_embedded_batches(records, filename, batch_size=None):
+    """
+    Embedding stage: groups (chunk, entities) records into batches of batch_size
+    (default EMBEDDING_BATCH_SIZE) and yields (chunk count, Arrow record batch) -
+    chunks without an embedding are dropped.
+    """
+    batch_size = batch_size or EMBEDDING_BATCH_SIZE
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield _embed_records(batch, filename)
+            batch = []
+    if batch:
+        yield _embed_records(batch, filename)
+
+def _embed_records(records, filename):
+    embeddings = embed_chunks([chunk for chunk, _ in records])
+    kept = [(chunk, entities, emb) for (chunk, entities), emb in zip(records, embeddings) if emb]
+    if not kept:
+        return len(records), None
+    record_batch = make_record_batch(
+        [chunk for chunk, _, _ in kept],
+        [emb for _, _, emb in kept],
+        filename,
+        [entities for _, entities, _ in kept]
+    )
+    return len(records), record_batch
+
+def write_records(pipeline, records, filename, replace=False):
+    """
+    Embedding + writer stages (shared by stream_document and the worker-pool path).
+    Hands each record batch to the shared vector writer as soon as it is embedded
+    (small documents are buffered and written together). replace=True removes the
+    document's previous rows right before the first write; if a later stage fails,
+    the rows written so far are deleted again so no half-indexed document remains.
+    Returns: (chunks, stored vectors)
+    """
+    batches = pipeline.stage("embed", iter_embedded_batches(records, filename))
+    chunks = stored = 0
+    try:
+        for count, record_batch in batches:
+            chunks += count
+            if record_batch is None:
+                continue
+            if replace and stored == 0:
+                remove_document(filename)
+            add_record_batch(record_batch)
+            stored += record_batch.num_rows
+    except BaseException:
+        if stored:
+            delete_document_by_source(filename)
+        raise
+
+    if stored:
+        print(f"Stored {stored} vectors for {filename}")
+        if ENABLE_HYBRID_RAG:
+            print(f"  ✨ Hybrid RAG: Entities extracted and stored")
+    return chunks, stored
+
+def embed_chunks(chunks):
+    """
+    Embeds chunks, serving byte-identical (normalized) texts from the persistent
+    embedding cache and sending only the misses to Ollama.
+    """
+    if not EMBEDDING_CACHE_ENABLED:
+        return get_embeddings(chunks)
+
+    cache = get_embedding_cache()
+    hits_before = cache.store.hits
+    embeddings = cache.get_or_compute(chunks, get_embeddings)
+    hits = cache.store.hits - hits_before
+    if hits:
+        print(f"💾 Embedding cache: {hits}/{len(chunks)} chunks reused")
+    return embeddings
+
+def ingest_prepared(prepared, replace=False):
+    """
+    Writer stage: stores one prepared document and returns its per-file result:
+    {"file", "status", "chunks", "stored", "error", "seconds"}
+    status: "indexed" | "skipped" | "empty" | "error" | "relinked"
+    replace: the document was indexed before (its old rows are replaced)
+    """
+    result = {
+        "file": prepared["filename"],
+        "status": "indexed",
+        "chunks": len(prepared["chunks"]),
+        "stored": 0,
+        "error": prepared["error"],
+        "seconds": prepared["seconds"]
+    }
+
+    if prepared["error"]:
+        result["status"] = "error"
+        return result
+    if not prepared["chunks"]:
+        result["status"] = "empty"
+        return result
+
+    start = time.perf_counter()
+    try:
+        with StreamPipeline() as pipeline:
+            records = zip(prepared["chunks"], prepared["entities"])
+            _, result["stored"] = write_records(pipeline, records, prepared["filename"], replace)
+        if result["stored"] == 0:
+            result["status"] = "error"
+            result["error"] = "No valid embeddings generated"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] += time.perf_counter() - start
+    return result
+
+def stream_document(file_path, replace=False):
+    """
+    Streaming ingestion of one PDF in this process:
+    pages -> cleaned blocks -> chunks (+ entities) -> embedding batches -> Arrow writes.
+    Every stage runs in its own thread behind a bounded queue (STREAM_QUEUE_SIZE), so
+    only a few pages/chunks/batches are in memory at any time; per-stage throughput
+    and queue depth are printed at the end.
+    Returns: per-file result dict (see ingest_prepared).
+    """
+    filename = os.path.basename(file_path)
+    result = {"file": filename, "status": "indexed", "chunks": 0, "stored": 0, "error": None, "seconds": 0.0}
+    start = time.perf_counter()
+
+    try:
+        with StreamPipeline() as pipeline:
+            pages = pipeline.stage("pages", iter_pdf_pages(file_path))
+            blocks = pipeline.stage("clean", iter_clean_blocks(pages))
+            records = pipeline.stage("chunk", iter_chunk_records(iter_chunks(blocks)))
+            result["chunks"], result["stored"] = write_records(pipeline, records, filename, replace)
+
+        if result["chunks"]:
+            print(f"Generated {result['chunks']} chunks from {filename}")
+        if result["chunks"] == 0:
+            print(f"Skipping {file_path} (Empty or unreadable)")
+            result["status"] = "empty"
+        elif result["stored"] == 0:
+            print(f"No valid embeddings generated for {file_path}")
+            result["status"] = "error"
+            result["error"] = "No valid embeddings generated"
+        pipeline.report(filename)
+    except Exception as e:
+        if isinstance(e, pytesseract.TesseractNotFoundError):
+            error_msg = "Tesseract OCR not found/installed"
+        else:
+            error_msg = str(e)
+        log_error(file_path, error_msg)
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {error_msg}"
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def skipped_result(filename):
+    """Per-file result for a document that did not need indexing."""
+    return {"file": filename, "status": "skipped", "chunks": 0, "stored": 0, "error": None, "seconds": 0.0}
+
+def plan_document(file_path, registry):
+    """
+    Decides what ingestion has to do with a file, cheapest checks first:
+    1. size + mtime match the registry      -> "skip"   (one stat, no hashing, no DB query)
+    2. content hash matches the registry    -> "skip"   (mtime refreshed)
+    3. same content registered as another   -> "relink" (rename/copy rows, no re-embedding)
+    4. registered with different content    -> "reindex"
+    5. unknown                              -> "index"  (rows indexed before the registry
+                                                          existed are adopted and skipped)
+    Returns: {"action", "file_path", "filename", "stat", "sha256", "relink_from"}
+    """
+    filename = os.path.basename(file_path)
+    st = os.stat(file_path)
+    plan = {"action": "skip", "file_path": file_path, "filename": filename,
+            "stat": st, "sha256": None, "relink_from": None}
+
+    if registry.is_unchanged(filename, st):
+        return plan
+
+    plan["sha256"] = file_sha256(file_path)
+    entry = registry.get(filename)
+    if entry and entry["sha256"] == plan["sha256"]:
+        registry.touch(filename, st)
+        return plan
+
+    other = registry.find_by_hash(plan["sha256"], exclude=filename)
+    if other:
+        plan["action"] = "relink"
+        plan["relink_from"] = other
+    elif entry:
+        plan["action"] = "reindex"
+    elif is_file_indexed(filename):
+        # Indexed before the registry existed: adopt the current rows
+        registry.register(filename, plan["sha256"], st, count_source_rows(filename))
+    else:
+        plan["action"] = "index"
+    return plan
+
+def relink_document(plan, registry):
+    """
+    Same content already indexed under another name: if that file is gone the rows
+    are renamed (file was moved/renamed), otherwise they are copied (duplicate file).
+    """
+    filename, other = plan["filename"], plan["relink_from"]
+    start = time.perf_counter()
+
+    if registry.get(filename):
+        delete_document_by_source(filename)
+
+    changed = {filename: plan["sha256"]}
+    if os.path.exists(os.path.join(os.path.dirname(plan["file_path"]), other)):
+        stored = copy_source(other, filename)
+        print(f"🔗 {filename}: same content as {other}, copied {stored} vectors")
+    else:
+        stored = rename_source(other, filename)
+        registry.remove(other)
+        changed[other] = None
+        print(f"🔗 {filename}: renamed from {other}, re-linked {stored} vectors")
+
+    registry.register(filename, plan["sha256"], plan["stat"], stored)
+    invalidate_documents(changed)
+    return {"file": filename, "status": "relinked", "chunks": stored, "stored": stored,
+            "error": None, "seconds": time.perf_counter() - start}
+
+def register_indexed(indexed, registry):
+    """
+    Flushes the vector writer, then registers the indexed documents (and empties the
+    list). If the flush fails their buffered rows are dropped and they are reported
+    as errors instead, so the next scan indexes them again.
+    """
+    if not indexed:
+        return
+    writer = get_writer()
+    try:
+        writer.flush()
+    except Exception as e:
+        for plan, result in indexed:
+            writer.discard(source=plan["filename"])
+            result["status"] = "error"
+            result["error"] = f"{type(e).__name__}: {e}"
+            print(f"❌ {result['file']}: {result['error']}")
+    else:
+        for plan, result in indexed:
+            registry.register(plan["filename"], plan["sha256"], plan["stat"], result["stored"])
+        # Cached answers built from earlier versions of these documents are stale now
+        invalidate_documents({plan["filename"]: plan["sha256"] for plan, _ in indexed})
+    indexed.clear()
+
+def remove_document(filename):
+    """Deletes a document's vectors, its registry entry and the cached answers built from it."""
+    success = delete_document_by_source(filename)
+    get_registry().remove(filename)
+    invalidate_documents({filename: None})
+    return success
+
+def _prepare_parallel(file_paths, workers):
+    """
+    Runs prepare_document for every file in a process pool.
+    Yields prepared documents as they complete (errors included).
+    """
+    # Each document worker gets its share of the OCR workers to avoid oversubscription
+    ocr_workers = max(1, OCR_WORKERS // workers)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(prepare_document, path, ocr_workers): path for path in file_paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                yield future.result()
+            except Exception as e:
+                # Worker crashed (e.g. BrokenProcessPool) - report and keep going
+                yield {
+                    "file_path": path,
+                    "filename": os.path.basename(path),
+                    "chunks": [],
+                    "entities": [],
+                    "error": f"{type(e).__name__}: {e}",
+                    "seconds": 0.0
+                }
+
+def ingest_files(file_paths, workers=1):
+    """
+    Ingests files: plans each one against the registry, then indexes the ones that
+    need it. Each file is streamed through stream_document; workers > 1 instead runs
+    the CPU-bound stages in a process pool that feeds the embedding/writer stages
+    in this process. Indexed files are registered only once the writer has flushed
+    their rows; afterwards the ANN index is built / rebuilt if needed.
+    Returns: list of per-file result dicts (see ingest_prepared).
+    """
+    registry = get_registry()
+    writer = get_writer()
+    results = []
+    indexed = []  # indexed, rows possibly still buffered in the writer
+    plans = {}
+    hashes = set()
+    deferred = []  # same content as another file in this batch: re-link after it is indexed
+
+    for path in file_paths:
+        filename = os.path.basename(path)
+        try:
+            plan = plan_document(path, registry)
+        except OSError as e:
+            results.append({"file": filename, "status": "error", "chunks": 0, "stored": 0,
+                            "error": f"{type(e).__name__}: {e}", "seconds": 0.0})
+            continue
+
+        if plan["action"] == "skip":
+            print(f"Skipping {filename} (Already indexed)")
+            results.append(skipped_result(filename))
+        elif plan["action"] == "relink":
+            results.append(relink_document(plan, registry))
+        elif plan["sha256"] in hashes:
+            deferred.append(path)
+        else:
+            hashes.add(plan["sha256"])
+            plans[path] = plan
+
+    if workers > 1 and len(plans) > 1:
+        print(f"Processing {len(plans)} PDFs with {workers} workers...")
+        outcomes = ((plans[prepared["file_path"]], prepared) for prepared in _prepare_parallel(list(plans), workers))
+    else:
+        outcomes = ((plan, None) for plan in plans.values())
+
+    for plan, prepared in outcomes:
+        replace = plan["action"] == "reindex"
+        if replace:
+            print(f"♻️ {plan['filename']} changed, re-indexing")
+
+        if prepared is None:
+            result = stream_document(plan["file_path"], replace)
+        else:
+            result = ingest_prepared(prepared, replace)
+        if result["status"] == "indexed":
+            indexed.append((plan, result))
+        if result["error"]:
+            print(f"❌ {result['file']}: {result['error']}")
+        results.append(result)
+        if not writer.pending_rows:
+            register_indexed(indexed, registry)
+
+    register_indexed(indexed, registry)
+    if any(result["stored"] for result in results):
+        maybe_update_index()
+    if deferred:
+        results.extend(ingest_files(deferred))
+    return results
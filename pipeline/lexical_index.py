@@ -0,0 +1,183 @@
+"""
+Lexical (BM25) Index
+Compact in-memory full-text index over chunk texts - the lexical retrieval channel that
+catches exact wording (article numbers, program names, abbreviations like HÜNİTEK or
+ÇAP) the embedding search misses.
+
+Tokenization is Turkish-aware: Turkish lower-casing (I -> ı, İ -> i), Turkish letters
+folded to ASCII (so "hunitek" finds "HÜNİTEK") and words cut to their first
+LEXICAL_PREFIX_LENGTH letters - a fixed-prefix stem that suits agglutinative Turkish
+("enstitüsü", "enstitüsünde" -> "ensti"). Numbers are kept whole.
+
+Chunks are tokenized and turned into postings with Arrow / numpy kernels over whole
+batches (tokenize_texts); queries use the equivalent pure-Python tokenize, which is
+cheaper for one short string. Postings are typed arrays (chunk number + term
+frequency) scored with numpy, so a query costs a few array operations per query term.
+"""
+
+import math
+import re
+import threading
+from array import array
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config import LEXICAL_PREFIX_LENGTH, BM25_K1, BM25_B
+from pipeline.text_cleaner import turkish_lower
+
+# Turkish lower-casing first (utf8_lower maps I -> i and İ -> i + combining dot)
+TURKISH_CASE = [("I", "ı"), ("İ", "i")]
+ASCII_FOLD = [("ç", "c"), ("ğ", "g"), ("ı", "i"), ("ö", "o"), ("ş", "s"), ("ü", "u"),
+              ("â", "a"), ("î", "i"), ("û", "u")]
+ASCII_FOLD_TABLE = str.maketrans(dict(ASCII_FOLD))
+WORD_PATTERN = re.compile(r"[^\W_]+")  # letters and digits (same as [\p{L}\p{N}]+ below)
+
+def tokenize_texts(texts, prefix_length=LEXICAL_PREFIX_LENGTH):
+    """Index terms of many texts at once: Arrow list<string> array, one list per text."""
+    array = pc.fill_null(pa.array(texts, type=pa.string()), "")
+    for before, after in TURKISH_CASE:
+        array = pc.replace_substring(array, before, after)
+    array = pc.utf8_lower(array)
+    for before, after in ASCII_FOLD:
+        array = pc.replace_substring(array, before, after)
+
+    tokens = pc.split_pattern_regex(array, r"[^\p{L}\p{N}]+")
+    parents = pc.list_parent_indices(tokens)
+    flat = pc.list_flatten(tokens)
+    flat = pc.if_else(pc.match_substring_regex(flat, r"^\p{Nd}+$"), flat,
+                      pc.utf8_slice_codeunits(flat, 0, prefix_length))
+    keep = pc.greater(pc.utf8_length(flat), 0)  # splitting leaves "" at the edges
+    counts = np.bincount(pc.filter(parents, keep).to_numpy(), minlength=len(array))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int32)
+    return pa.ListArray.from_arrays(pa.array(offsets), pc.filter(flat, keep))
+
+def tokenize(text, prefix_length=LEXICAL_PREFIX_LENGTH):
+    """Turkish-aware index terms of one text (see module docstring), same as tokenize_texts."""
+    words = WORD_PATTERN.findall(turkish_lower(text or "").translate(ASCII_FOLD_TABLE))
+    return [word if word.isdecimal() else word[:prefix_length] for word in words]
+
+class LexicalIndex:
+    """
+    BM25 index: term -> (chunk numbers, term frequencies). Deleted chunks are masked
+    and dropped from the postings once they outnumber the live ones.
+    version: table version the index reflects (maintained by the owner)
+    """
+
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.version = None
+        self._terms = {}    # term -> (array("i") chunk numbers, array("H") frequencies)
+        self._ids = []      # chunk number -> chunk id
+        self._sources = {}  # source -> [chunk numbers]
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._live = np.zeros(0, dtype=bool)
+        self._total_length = 0
+        self.live_chunks = 0
+        self._lock = threading.Lock()
+
+    def add(self, ids, sources, texts):
+        """Indexes chunks (parallel lists of chunk id, source, text)."""
+        count = len(ids)
+        if not count:
+            return
+        tokens = tokenize_texts(texts)
+        terms = pc.dictionary_encode(pc.list_flatten(tokens))
+        vocabulary = terms.dictionary.to_pylist()
+        # One key per (term, chunk) pair: unique keys give the term frequencies,
+        # sorted by term so each term's postings are one slice
+        keys = terms.indices.to_numpy().astype(np.int64) * count + pc.list_parent_indices(tokens).to_numpy()
+        keys, tfs = np.unique(keys, return_counts=True)
+        term_of_key = keys // count
+        starts = np.flatnonzero(np.diff(term_of_key)) + 1
+        lengths = np.diff(tokens.offsets.to_numpy())
+
+        with self._lock:
+            first = len(self._ids)
+            self._reserve(first + count)
+            self._ids.extend(ids)
+            self._lengths[first:first + count] = lengths
+            self._live[first:first + count] = True
+            self._total_length += int(lengths.sum())
+            self.live_chunks += count
+            for offset, source in enumerate(sources):
+                self._sources.setdefault(source, []).append(first + offset)
+
+            numbers = (keys % count + first).astype(np.int32)
+            tfs = np.minimum(tfs, 65535).astype(np.uint16)
+            for start, end in zip(np.concatenate([[0], starts]), np.concatenate([starts, [len(keys)]])):
+                term = vocabulary[term_of_key[start]]
+                posting = self._terms.get(term)
+                if posting is None:
+                    posting = self._terms[term] = (array("i"), array("H"))
+                posting[0].frombytes(numbers[start:end].tobytes())
+                posting[1].frombytes(tfs[start:end].tobytes())
+
+    def _reserve(self, size):
+        if size > len(self._lengths):
+            capacity = max(size, 2 * len(self._lengths), 1024)
+            self._lengths = np.resize(self._lengths, capacity)
+            self._live = np.concatenate([self._live, np.zeros(capacity - len(self._live), dtype=bool)])
+
+    def remove_source(self, source):
+        with self._lock:
+            for number in self._sources.pop(source, []):
+                if self._live[number]:
+                    self._live[number] = False
+                    self._total_length -= int(self._lengths[number])
+                    self.live_chunks -= 1
+            if len(self._ids) - self.live_chunks > self.live_chunks:
+                self._compact()
+
+    def rename_source(self, old_source, new_source):
+        with self._lock:
+            numbers = self._sources.pop(old_source, None)
+            if numbers:
+                self._sources.setdefault(new_source, []).extend(numbers)
+
+    def _compact(self):
+        """Renumbers the live chunks and drops deleted ones from the postings."""
+        live = self._live[:len(self._ids)]
+        remap = (np.cumsum(live) - 1).astype(np.int32)
+        terms = {}
+        for term, (numbers, tfs) in self._terms.items():
+            numbers = np.array(numbers, dtype=np.int32)
+            keep = live[numbers]
+            if keep.any():
+                terms[term] = (array("i", remap[numbers[keep]].tobytes()),
+                               array("H", np.array(tfs, dtype=np.uint16)[keep].tobytes()))
+        self._terms = terms
+        self._ids = [chunk_id for chunk_id, alive in zip(self._ids, live) if alive]
+        self._sources = {source: [int(remap[n]) for n in numbers] for source, numbers in self._sources.items()}
+        self._lengths = self._lengths[:len(live)][live].copy()
+        self._live = np.ones(len(self._ids), dtype=bool)
+
+    def search(self, query, limit=10):
+        """Top chunks for a query by BM25: [(chunk id, score)], best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self.live_chunks:
+                return []
+            count = len(self._ids)
+            avg_length = self._total_length / self.live_chunks
+            scores = np.zeros(count, dtype=np.float32)
+            for term in terms:
+                posting = self._terms.get(term)
+                if posting is None:
+                    continue
+                numbers = np.array(posting[0], dtype=np.int32)
+                tfs = np.array(posting[1], dtype=np.float32)
+                idf = math.log(1 + (self.live_chunks - len(numbers) + 0.5) / (len(numbers) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[numbers] / avg_length)
+                scores[numbers] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+            scores[~self._live[:count]] = 0
+
+            limit = min(limit, count)
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self._ids[n], float(scores[n])) for n in top if scores[n] > 0]
+
+    def __len__(self):
+        return self.live_chunks
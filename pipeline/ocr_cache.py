@@ -0,0 +1,54 @@
+"""
+Persistent Page-OCR Cache
+Keyed by a hash of the rendered page pixels plus OCR language and DPI, so re-indexing
+a scanned PDF (edited registry entry, manage_db delete + add, new chunker or entity
+settings) never runs Tesseract twice on the same page.
+"""
+
+import hashlib
+from typing import Optional
+
+from config import OCR_CACHE_PATH, OCR_CACHE_MAX_MB
+from pipeline.disk_cache import DiskLRUCache
+
+def ocr_cache_key(width, height, stride, samples, lang, dpi) -> str:
+    """sha256 over (lang, dpi, geometry, raw pixels) of a rendered page"""
+    digest = hashlib.sha256(f"{lang}\x00{dpi}\x00{width}x{height}:{stride}\x00".encode('utf-8'))
+    digest.update(samples)
+    return digest.hexdigest()
+
+class OCRCache:
+    """Page OCR text cache on top of DiskLRUCache (text stored as UTF-8)"""
+
+    def __init__(self, path: str = OCR_CACHE_PATH, max_mb: int = OCR_CACHE_MAX_MB):
+        """
+        Initialize cache
+
+        Args:
+            path: SQLite file for the cache
+            max_mb: Size bound in megabytes (least-recently-used pages are evicted)
+        """
+        self.store = DiskLRUCache(path, max_bytes=max_mb * 1024 * 1024)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.store.get(key)
+        return value.decode('utf-8') if value is not None else None
+
+    def put(self, key: str, text: str):
+        self.store.set(key, text.encode('utf-8'))
+
+    def stats(self):
+        return self.store.stats()
+
+    def clear(self):
+        self.store.clear()
+
+# Global cache instance
+_cache_instance = None
+
+def get_ocr_cache() -> OCRCache:
+    """Get global OCR cache instance"""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = OCRCache()
+    return _cache_instance
@@ -0,0 +1,126 @@
+"""
+Shared Ollama HTTP client
+One keep-alive connection pool for every Ollama call (embeddings during ingestion,
+query embeddings and generation during chat), with a concurrency limit, per-call
+timeouts and exponential backoff with jitter between retries.
+Sync API: post_json / submit; asyncio API: arun / apost_json.
+The asyncio API is a thin facade over the same blocking requests: each awaited call
+runs on the client's worker threads (run_in_executor), so it does not block the event
+loop but concurrency is still capped at max_concurrency threads - it is not native
+non-blocking I/O.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (OLLAMA_MAX_CONCURRENCY, OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT,
+                    MAX_RETRIES, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX)
+
+class OllamaNotFoundError(requests.exceptions.HTTPError):
+    """404 from Ollama (unknown endpoint or model) - not retried"""
+
+class OllamaClient:
+    """Pooled, concurrency-limited HTTP client for the Ollama API"""
+
+    def __init__(self, max_concurrency=OLLAMA_MAX_CONCURRENCY, connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+                 read_timeout=OLLAMA_READ_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff_base=RETRY_BACKOFF_BASE, backoff_max=RETRY_BACKOFF_MAX):
+        """
+        Initialize client
+
+        Args:
+            max_concurrency: Requests in flight at once (also the keep-alive pool size)
+            connect_timeout: Seconds to establish a connection
+            read_timeout: Default seconds to wait for a response (per call: timeout=)
+            max_retries: Attempts per call
+            backoff_base: First retry waits up to this many seconds, doubling each attempt
+            backoff_max: Upper bound for a single wait
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max(1, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="ollama")
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff: uniform(0, min(max, base * 2^attempt))"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post_json(self, url, payload, timeout=None, parse=None, label="Ollama request"):
+        """
+        POSTs JSON and returns the decoded response (or parse(response_json)).
+        Connection errors, timeouts, non-404 HTTP errors and parse errors
+        (KeyError/ValueError) are retried with backoff; the last error is raised.
+        A 404 raises OllamaNotFoundError immediately.
+        """
+        timeout = (self.connect_timeout, timeout or self.read_timeout)
+        for attempt in range(self.max_retries):
+            try:
+                with self._slots:
+                    response = self.session.post(url, json=payload, timeout=timeout)
+                if response.status_code == 404:
+                    raise OllamaNotFoundError(f"404 Not Found: {url}", response=response)
+                response.raise_for_status()
+                data = response.json()
+                return parse(data) if parse else data
+            except OllamaNotFoundError:
+                raise
+            except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+                print(f"{label} attempt {attempt+1}/{self.max_retries} failed: {e}")
+                if attempt == self.max_retries - 1:
+                    raise
+                time.sleep(self.backoff_delay(attempt))
+
+    def submit(self, fn, *args, **kwargs):
+        """Runs fn on the client's worker threads (bounded by max_concurrency). Returns a Future."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def map(self, fn, items):
+        """Concurrent map over the client's worker threads, results in input order"""
+        items = list(items)
+        if len(items) <= 1 or self.max_concurrency == 1:
+            return [fn(item) for item in items]
+        return list(self._executor.map(fn, items))
+
+    async def arun(self, fn, *args):
+        """asyncio: awaits fn(*args) run on the client's worker threads (at most max_concurrency at once)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def apost_json(self, url, payload, timeout=None, parse=None, label="Ollama request"):
+        """asyncio version of post_json: the blocking call on a worker thread (same pool, limit and retry policy)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, lambda: self.post_json(url, payload, timeout=timeout, parse=parse, label=label)
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+# Global client instance
+_client_instance = None
+_client_lock = threading.Lock()
+
+def get_ollama_client() -> OllamaClient:
+    """Get global Ollama client instance"""
+    global _client_instance
+    with _client_lock:
+        if _client_instance is None:
+            _client_instance = OllamaClient()
+        return _client_instance
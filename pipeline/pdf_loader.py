@@ -1,34 +1,30 @@
 import fitz  # pymupdf
 import pytesseract
 from PIL import Image
-import io
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from config import OCR_WORKERS, OCR_DPI, OCR_LANG, OCR_MIN_TEXT_CHARS, OCR_CACHE_ENABLED
+from pipeline.ocr_cache import get_ocr_cache, ocr_cache_key
 
-def load_pdf(file_path):
+# Persistent OCR worker pool (created lazily, reused across documents)
+_ocr_pool = None
+_ocr_pool_key = None
+_ocr_pool_lock = threading.Lock()
+
+def load_pdf(file_path, ocr_workers=None, dpi=None, stats=None):
     """
     Reads a PDF file and extracts text.
     Uses PyMuPDF first. If text is sparse/empty, falls back to OCR via pytesseract.
+    Sparse pages are OCR'd in parallel by a persistent worker pool; page order is kept.
+    If a `stats` dict is given it is filled with per-page OCR timings.
     Returns: full text string.
     """
-    text_content = []
     try:
-        doc = fitz.open(file_path)
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            text = page.get_text("text")
-
-            # Check if page is mostly image/scanned by checking text length
-            # Threshold is arbitrary, but < 50 chars usually implies scan or empty
-            if len(text.strip()) < 50:
-                # Fallback to OCR
-                pix = page.get_pixmap()
-                img_data = pix.tobytes("png")
-                image = Image.open(io.BytesIO(img_data))
-                # Tesseract OCR
-                text = pytesseract.image_to_string(image, lang='tur+eng') # assumig turkish/english content
-            
-            text_content.append(text)
-        
-        return "\n".join(text_content)
+        return "\n".join(iter_pdf_pages(file_path, ocr_workers, dpi, stats))
     
     except pytesseract.TesseractNotFoundError:
         error_msg = "Tesseract OCR not found/installed"
@@ -41,6 +37,155 @@ def load_pdf(file_path):
         log_error(file_path, error_msg)
         return None
 
+def iter_pdf_pages(file_path, ocr_workers=None, dpi=None, stats=None):
+    """
+    Streaming version of load_pdf: yields page texts in page order.
+    Sparse pages are scheduled on the persistent OCR pool with a bounded look-ahead:
+    at most 2 * workers pages in flight on the pool and at most 4 * workers pages
+    (OCR'd or text) waiting to be yielded; text pages queue behind them so order is
+    kept. A lone sparse page is OCR'd in-process (no pool start-up for one page).
+    OCR results are cached per rendered page (pixels + language + DPI), so a page
+    is never OCR'd twice.
+    Raises on errors (unreadable PDF, TesseractNotFoundError) - see load_pdf.
+    """
+    ocr_workers = OCR_WORKERS if ocr_workers is None else ocr_workers
+    dpi = OCR_DPI if dpi is None else dpi
+    max_pending = 4 * max(1, ocr_workers)
+    timings = {}
+    cached_pages = []
+    cache = None
+
+    def resolve(value, page_num, key=None):
+        if isinstance(value, str):
+            return value
+        if isinstance(value, Future):
+            text, seconds = value.result()
+        else:
+            # Rendered page that was never sent to the pool
+            text, seconds = ocr_image(*value)
+        if text is None:
+            raise pytesseract.TesseractNotFoundError()
+        timings[page_num] = seconds
+        if key is not None:
+            cache.put(key, text)
+        return text
+
+    def is_ready(value):
+        return isinstance(value, str) or (isinstance(value, Future) and value.done())
+
+    doc = fitz.open(file_path)
+    try:
+        total_pages = len(doc)
+        pending = deque()  # [page_num, text | Future | rendered pixels, cache key], in page order
+        in_flight = 0
+
+        for page_num in range(total_pages):
+            page = doc.load_page(page_num)
+            text = page.get_text("text")
+
+            # Check if page is mostly image/scanned by checking text length
+            # Threshold is arbitrary, but < 50 chars usually implies scan or empty
+            if len(text.strip()) < OCR_MIN_TEXT_CHARS:
+                # Fallback to OCR
+                pixels = render_page(page, dpi)
+                key, text = None, None
+                if OCR_CACHE_ENABLED:
+                    cache = cache or get_ocr_cache()
+                    key = ocr_cache_key(*pixels, OCR_LANG, dpi)
+                    text = cache.get(key)
+                    if text is not None:
+                        cached_pages.append(page_num)
+
+                if text is None and ocr_workers <= 1:
+                    text = resolve(pixels, page_num, key)
+                elif text is None:
+                    pending.append([page_num, pixels, key])
+                    unscheduled = [slot for slot in pending if isinstance(slot[1], tuple)]
+                    if len(unscheduled) > 1 or in_flight:
+                        pool = get_ocr_pool(ocr_workers)
+                        for slot in unscheduled:
+                            slot[1] = pool.submit(ocr_image, *slot[1])
+                            in_flight += 1
+            if text is not None:
+                pending.append([page_num, text, None])
+
+            # Hand out finished pages; block on the oldest one when the window is full
+            while pending and (is_ready(pending[0][1]) or len(pending) > max_pending
+                               or in_flight >= 2 * ocr_workers):
+                slot_num, value, key = pending.popleft()
+                if isinstance(value, Future):
+                    in_flight -= 1
+                yield resolve(value, slot_num, key)
+
+        while pending:
+            slot_num, value, key = pending.popleft()
+            yield resolve(value, slot_num, key)
+    finally:
+        doc.close()
+
+    report_ocr_timings(file_path, total_pages, timings, cached_pages)
+    if stats is not None and (timings or cached_pages):
+        stats["pages"] = total_pages
+        stats["ocr_timings"] = timings
+        stats["ocr_seconds"] = sum(timings.values())
+        stats["ocr_cached_pages"] = cached_pages
+
+def render_page(page, dpi):
+    """
+    Renders a page to raw RGB pixels for OCR (same image as the PNG path, without
+    the PNG encode/decode).
+    Returns: (width, height, stride, samples) - picklable for worker processes.
+    """
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+    return pix.width, pix.height, pix.stride, pix.samples
+
+def ocr_image(width, height, stride, samples, lang=OCR_LANG):
+    """
+    OCR worker: wraps raw pixels in a PIL image and runs Tesseract.
+    Returns: (text, seconds). text is None when Tesseract is not installed
+    (TesseractNotFoundError cannot be pickled back to the parent).
+    """
+    start = time.perf_counter()
+    image = Image.frombytes("RGB", (width, height), samples, "raw", "RGB", stride)
+    try:
+        text = pytesseract.image_to_string(image, lang=lang)
+    except pytesseract.TesseractNotFoundError:
+        text = None
+    return text, time.perf_counter() - start
+
+def get_ocr_pool(workers):
+    """Returns the persistent OCR pool, (re)creating it for a new size or after fork."""
+    global _ocr_pool, _ocr_pool_key
+    key = (os.getpid(), workers)
+    with _ocr_pool_lock:
+        if _ocr_pool is None or _ocr_pool_key != key:
+            if _ocr_pool is not None and _ocr_pool_key[0] == os.getpid():
+                _ocr_pool.shutdown(wait=False)
+            _ocr_pool = ProcessPoolExecutor(max_workers=workers)
+            _ocr_pool_key = key
+        return _ocr_pool
+
+def shutdown_ocr_pool():
+    global _ocr_pool, _ocr_pool_key
+    if _ocr_pool is not None and _ocr_pool_key[0] == os.getpid():
+        _ocr_pool.shutdown(wait=True)
+    _ocr_pool = None
+    _ocr_pool_key = None
+
+atexit.register(shutdown_ocr_pool)
+
+def report_ocr_timings(file_path, total_pages, timings, cached_pages=()):
+    """Prints per-page OCR timings for a document."""
+    if cached_pages:
+        print(f"💾 OCR cache {os.path.basename(file_path)}: {len(cached_pages)} pages reused")
+    if not timings:
+        return
+    total = sum(timings.values())
+    print(f"🔎 OCR {os.path.basename(file_path)}: {len(timings)}/{total_pages} pages, "
+          f"{total:.2f}s CPU ({total / len(timings):.2f}s/page)")
+    for page_num in sorted(timings):
+        print(f"   page {page_num + 1}: {timings[page_num]:.2f}s")
+
 def log_error(file_path, error_message):
     """Logs errors to a file for later review."""
     import datetime
@@ -1,58 +1,132 @@
-import requests
-import json
-from pipeline.vector_store import search_vectors
+from pipeline.vector_store import (search_vectors, search_entity_candidates, search_lexical, search_ids,
+                                   table_version, fetch_chunks)
 from pipeline.embedder import get_embedding
-from config import TOP_K, OLLAMA_BASE_URL, LLM_MODEL, MIN_SCORE_THRESHOLD, SYSTEM_PROMPT
-from config import ENABLE_HYBRID_RAG, VECTOR_WEIGHT, ENTITY_WEIGHT
-from config import ENABLE_CACHE, CACHE_DIR, CACHE_MAX_AGE_HOURS
+from pipeline.embedding_cache import get_query_embedding_cache
+from pipeline.retrieval_cache import get_retrieval_cache
+from pipeline.ollama_client import get_ollama_client
+from pipeline.doc_registry import get_registry
+from config import TOP_K, OLLAMA_BASE_URL, LLM_MODEL, MIN_SCORE_THRESHOLD, SYSTEM_PROMPT, OLLAMA_GENERATE_TIMEOUT
+from config import ENABLE_HYBRID_RAG, VECTOR_WEIGHT, ENTITY_WEIGHT, ENTITY_INDEX_CANDIDATES, ENTITY_INDEX_MAX_IDS
+from config import LEXICAL_SEARCH_ENABLED, LEXICAL_TOP_K, LEXICAL_PREFIX_LENGTH, BM25_K1, BM25_B, RRF_K
+from config import VECTOR_NPROBES, VECTOR_REFINE_FACTOR
+from config import ENABLE_CACHE, QUERY_EMBEDDING_CACHE_SIZE, SEMANTIC_CACHE_ENABLED
+from config import EMBEDDING_MODEL, RETRIEVAL_CACHE_SIZE
 
 # Hybrid RAG için entity extractor
 if ENABLE_HYBRID_RAG:
-    from pipeline.entity_extractor import extract_entities, calculate_entity_overlap
+    from pipeline.entity_extractor import ENTITY_TYPES, extract_entities, normalize_entities, calculate_entity_overlap
 
-# Cache
+# Cache (built on first use, not at import)
 if ENABLE_CACHE:
-    from pipeline.cache import QueryCache
-    _query_cache = QueryCache(cache_dir=CACHE_DIR, max_age_hours=CACHE_MAX_AGE_HOURS)
+    from pipeline.cache import get_cache
 
-def retrieve_context(query):
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Reciprocal Rank Fusion: rankings (lists of ids, best first) -> {id: sum of 1 / (k + rank)}"""
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, 1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return scores
+
+def _fuse_lexical(items, lexical_hits):
+    """Re-orders items (ranked by the vector / hybrid score) by RRF with the BM25 ranking."""
+    fused = reciprocal_rank_fusion([[item["id"] for item in items], list(lexical_hits)])
+    for item in items:
+        item["lexical_score"] = lexical_hits.get(item["id"], 0.0)
+        item["score"] = fused[item["id"]]
+    items.sort(key=lambda x: x["score"], reverse=True)
+
+def source_versions(chunks):
+    """{source: registered content hash} of the documents an answer was built from (cache tags)."""
+    registry = get_registry()
+    return {c["source"]: (registry.get(c["source"]) or {}).get("sha256") for c in chunks}
+
+def embed_query(query):
+    """Query embedding, served from the query-embedding cache when the question was seen before."""
+    if QUERY_EMBEDDING_CACHE_SIZE > 0:
+        return get_query_embedding_cache().get_or_compute(query, get_embedding)
+    return get_embedding(query)
+
+def retrieval_settings():
+    """
+    Settings the ranking of retrieve_context depends on (part of the retrieval cache key):
+    everything _rank_context and the searches it calls read from config.
+    """
+    return [EMBEDDING_MODEL, TOP_K,
+            VECTOR_NPROBES, VECTOR_REFINE_FACTOR,
+            ENABLE_HYBRID_RAG, VECTOR_WEIGHT, ENTITY_WEIGHT, ENTITY_INDEX_CANDIDATES, ENTITY_INDEX_MAX_IDS,
+            LEXICAL_SEARCH_ENABLED, LEXICAL_TOP_K, LEXICAL_PREFIX_LENGTH, BM25_K1, BM25_B, RRF_K]
+
+def retrieve_context(query, query_embedding=None):
     """
     Retrieves relevant chunks from LanceDB based on query.
-    Supports Hybrid RAG with entity-based re-ranking.
+    Supports Hybrid RAG with entity-based re-ranking and a lexical (BM25) channel.
+    query_embedding: already computed embedding of the query (skips step 1)
     
-    1. Embed query
+    0. Retrieval cache: ranking of the same question at the same table version
+       (chunk texts are read back by id; steps 1-6 are skipped)
+    1. Embed query (query-embedding cache)
     2. Search vector DB
-    3. (Hybrid) Extract entities from query and chunks
-    4. (Hybrid) Re-rank based on vector + entity scores
+    3. (Hybrid) Extract entities from query, add entity-index candidates
+    4. (Lexical) BM25 search over chunk texts, add its hits
+    5. (Hybrid) Re-rank based on vector + entity scores
+    6. (Lexical) Fuse that ranking with the BM25 ranking (RRF)
     """
-    query_embedding = get_embedding(query)
+    if RETRIEVAL_CACHE_SIZE <= 0:
+        return _rank_context(query, query_embedding)
+    
+    version, settings = table_version(), retrieval_settings()
+    ranking = get_retrieval_cache().get(query, version, settings)
+    if ranking is not None:
+        rows = fetch_chunks([item["id"] for item in ranking])
+        if len(rows) == len(ranking):
+            print(f"💾 Retrieval cache HIT: {query[:50]}...")
+            return [{"id": row["id"], "text": row["text"], "source": row["source"], **item}
+                    for row, item in zip(rows, ranking)]
+    
+    context_items = _rank_context(query, query_embedding)
+    if context_items:
+        get_retrieval_cache().put(query, version, settings, [
+            {key: value for key, value in item.items() if key not in ("text", "source")} for item in context_items
+        ])
+    return context_items
+
+def _rank_context(query, query_embedding=None):
+    """Steps 1-6 of retrieve_context (no retrieval cache)."""
+    query_embedding = query_embedding or embed_query(query)
     if not query_embedding:
         return []
     
-    # Vector search - get more results for re-ranking
+    # Vector search - get more results for re-ranking (entity columns instead of the embedding)
     search_limit = TOP_K * 2 if ENABLE_HYBRID_RAG else TOP_K
-    results = search_vectors(query_embedding, limit=search_limit)
+    columns = ["id", "text", "source"] + (ENTITY_TYPES if ENABLE_HYBRID_RAG else [])
+    results = search_vectors(query_embedding, limit=search_limit, columns=columns)
+    
+    if ENABLE_HYBRID_RAG:
+        # Extract entities from query
+        query_entities = normalize_entities(extract_entities(query))
+        
+        # Entity index: exact entity matches outside the vector top-k are candidates too
+        results = results + search_entity_candidates(
+            query_embedding, query_entities, exclude_ids=[r["id"] for r in results], columns=columns)
+    
+    # Lexical channel: exact wording (article numbers, abbreviations) the embeddings miss
+    lexical_hits = {}
+    if LEXICAL_SEARCH_ENABLED:
+        lexical_hits = dict(search_lexical(query))  # chunk id -> BM25 score, best first
+        found = {r["id"] for r in results}
+        results = results + search_ids(query_embedding, [i for i in lexical_hits if i not in found], columns=columns)
     
     if not results:
         return []
     
     # Hybrid RAG: Entity-based re-ranking
     if ENABLE_HYBRID_RAG:
-        # Extract entities from query
-        query_entities = extract_entities(query)
-        
         # Score each result
         scored_results = []
         for r in results:
             text = r.get("text") or r["text"]
             source = r.get("source") or r["source"]
-            metadata_str = r.get("metadata", "{}")
-            
-            # Parse metadata
-            try:
-                chunk_entities = json.loads(metadata_str) if metadata_str else {}
-            except Exception as e:
-                chunk_entities = {}
             
             # Vector similarity score (distance -> similarity)
             # LanceDB returns _distance (lower is better)
@@ -70,12 +144,14 @@ def retrieve_context(query):
                 vector_score = max(0.0, min(1.0, 1.0 - (distance / 2.0)))
             
             # Entity overlap score
-            entity_score = calculate_entity_overlap(query_entities, chunk_entities)
+            # (the result row holds one list column per entity type)
+            entity_score = calculate_entity_overlap(query_entities, r)
             
             # Combined score
             final_score = (VECTOR_WEIGHT * vector_score) + (ENTITY_WEIGHT * entity_score)
             
             scored_results.append({
+                "id": r["id"],
                 "text": text,
                 "source": source,
                 "score": final_score,
@@ -86,49 +162,82 @@ def retrieve_context(query):
         
         # Sort by final score (descending)
         scored_results.sort(key=lambda x: x["score"], reverse=True)
+        if lexical_hits:
+            for item in scored_results:
+                item["hybrid_score"] = item["score"]
+            _fuse_lexical(scored_results, lexical_hits)
         
         # Take top K
         context_items = scored_results[:TOP_K]
         
         # Debug info
         print(f"\n🔍 Hybrid RAG Search Results:")
-        print(f"   Query entities: {list(query_entities.keys())}")
+        print(f"   Query entities: {[t for t, values in query_entities.items() if values]}")
         for i, item in enumerate(context_items[:3], 1):
             dist_str = f"{item['_distance']:.4f}" if item['_distance'] is not None else "N/A"
-            print(f"  [{i}] Score: {item['score']:.3f} (V:{item['vector_score']:.3f} + E:{item['entity_score']:.3f})")
+            if lexical_hits:
+                print(f"  [{i}] RRF: {item['score']:.4f} (Hybrid: {item['hybrid_score']:.3f} = V:{item['vector_score']:.3f} + E:{item['entity_score']:.3f} | BM25: {item['lexical_score']:.2f})")
+            else:
+                print(f"  [{i}] Score: {item['score']:.3f} (V:{item['vector_score']:.3f} + E:{item['entity_score']:.3f})")
             print(f"      Distance: {dist_str} | Source: {item['source']}")
             print(f"      Text preview: {item['text'][:80]}...")
         
     else:
-        # Standard Vector RAG
+        # Standard Vector RAG (lexical hits fused in by RRF)
+        results.sort(key=lambda r: r["_distance"])
         context_items = []
         for r in results:
             text = r.get("text") or r["text"]
             source = r.get("source") or r["source"]
             
             context_items.append({
+                "id": r["id"],
                 "text": text,
                 "source": source
             })
+        if lexical_hits:
+            _fuse_lexical(context_items, lexical_hits)
+        context_items = context_items[:TOP_K]
         
     return context_items
 
+def cache_stats():
+    """Hit statistics of every cache layer (answers, retrieval results, query embeddings)."""
+    return {
+        "answers": get_cache().stats() if ENABLE_CACHE else None,
+        "retrieval": get_retrieval_cache().stats() if RETRIEVAL_CACHE_SIZE > 0 else None,
+        "query_embeddings": get_query_embedding_cache().stats() if QUERY_EMBEDDING_CACHE_SIZE > 0 else None
+    }
+
 def generate_answer(query):
     """
     RAG Pipeline with Caching:
-    0. Check cache
+    0. Check cache (exact question, then a semantically similar cached question)
     1. Retrieve context
     2. Build Prompt
     3. Call LLM
     4. Cache result
     """
     # Check cache first
-    if ENABLE_CACHE:
-        cached_answer = _query_cache.get(query)
+    query_embedding = None
+    query_cache = get_cache() if ENABLE_CACHE else None
+    if query_cache is not None:
+        cached_answer = query_cache.get(query)
         if cached_answer:
             return cached_answer
+        
+        # Semantic tier: paraphrase of a cached question (the embedding is reused for retrieval)
+        if SEMANTIC_CACHE_ENABLED:
+            query_embedding = embed_query(query)
+            cached_answer = query_cache.get_similar(query, query_embedding)
+            if cached_answer:
+                return cached_answer
     
-    context_chunks = retrieve_context(query)
+    # Snapshot of the documents the answer is built from, taken with the context: a document
+    # re-indexed while the LLM runs makes set() skip the answer instead of caching it stale
+    since = query_cache.invalidation_mark() if query_cache is not None else None
+    context_chunks = retrieve_context(query, query_embedding)
+    versions = source_versions(context_chunks)
     
     if not context_chunks:
         # Fallback if no context found (or empty DB)
@@ -162,9 +271,10 @@ def generate_answer(query):
     }
     
     try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        final_answer = response.json()["response"]
+        final_answer = get_ollama_client().post_json(
+            url, payload, timeout=OLLAMA_GENERATE_TIMEOUT,
+            parse=lambda data: data["response"], label="Generate"
+        )
         
         # Append sources to the final answer
         if sources_text and sources_text != "None":
@@ -181,17 +291,18 @@ def generate_answer(query):
             final_result = f"{final_answer}{sources_section}{chunks_section}"
             
             # Cache the result
-            if ENABLE_CACHE:
-                _query_cache.set(query, final_result, metadata={
+            if query_cache is not None:
+                query_cache.set(query, final_result, metadata={
                     "sources": sources_text,
                     "num_chunks": len(context_chunks)
-                })
+                }, embedding=query_embedding, sources=versions, since=since)
             
             return final_result
         
         # Cache simple answer too
-        if ENABLE_CACHE:
-            _query_cache.set(query, final_answer)
+        if query_cache is not None:
+            query_cache.set(query, final_answer, embedding=query_embedding,
+                            sources=versions, since=since)
         
         return final_answer
     except Exception as e:
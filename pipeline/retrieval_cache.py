@@ -0,0 +1,72 @@
+"""
+Retrieval-Result Cache
+Ranked chunk ids and scores of retrieve_context, keyed by (vectors table + version,
+retrieval settings, normalized query). Chunk texts are not stored; they are read back
+by id. Regenerating an answer (expired answer, new LLM_MODEL or SYSTEM_PROMPT) thus
+skips the query embedding, vector / entity / BM25 search and re-ranking. Every write
+to the table moves its version, so a ranking is never served for a changed corpus.
+
+Same layout as QueryEmbeddingCache (both are TieredLRUCache): an in-process LRU in
+front of an optional persistent DiskLRUCache tier.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from config import RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_PERSIST, RETRIEVAL_CACHE_PATH, RETRIEVAL_CACHE_MAX_MB
+from pipeline.disk_cache import DiskLRUCache, TieredLRUCache
+from pipeline.embedding_cache import normalize_text
+
+class RetrievalCache(TieredLRUCache):
+    """
+    Size-bounded LRU of rankings ([{"id", scores...}], best first), optionally backed by
+    a persistent DiskLRUCache (memory misses are looked up there)
+    """
+
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_SIZE, persistent: Optional[DiskLRUCache] = None):
+        """
+        Initialize cache
+
+        Args:
+            max_entries: In-memory entry bound (least-recently-used entries are evicted)
+            persistent: Optional persistent tier
+        """
+        super().__init__(max_entries, persistent)
+
+    def _key(self, query: str, version: Any, settings: Any) -> str:
+        """version: table identity + version; settings: everything else the ranking depends on"""
+        key = json.dumps([version, settings, normalize_text(query)], ensure_ascii=False, default=str)
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _to_memory(self, ranking: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [dict(item) for item in ranking]
+
+    _from_memory = _to_memory  # callers get their own copies
+
+    def _load(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        value = self.persistent.get(key)
+        return json.loads(value.decode('utf-8')) if value is not None else None
+
+    def _save(self, key: str, ranking: List[Dict[str, Any]]):
+        self.persistent.set(key, json.dumps(ranking).encode('utf-8'))
+
+    def get(self, query: str, version: Any, settings: Any) -> Optional[List[Dict[str, Any]]]:
+        """Cached ranking (memory first, then the persistent tier) or None"""
+        return self._get(self._key(query, version, settings))
+
+    def put(self, query: str, version: Any, settings: Any, ranking: List[Dict[str, Any]]):
+        self._put(self._key(query, version, settings), ranking)
+
+# Global cache instance
+_cache_instance = None
+
+def get_retrieval_cache() -> RetrievalCache:
+    """Get global retrieval cache instance"""
+    global _cache_instance
+    if _cache_instance is None:
+        persistent = None
+        if RETRIEVAL_CACHE_PERSIST:
+            persistent = DiskLRUCache(RETRIEVAL_CACHE_PATH, max_bytes=RETRIEVAL_CACHE_MAX_MB * 1024 * 1024)
+        _cache_instance = RetrievalCache(persistent=persistent)
+    return _cache_instance
@@ -0,0 +1,125 @@
+"""
+Streaming pipeline stages.
+Each stage runs a generator in its own thread and hands its items to the next stage
+through a bounded queue: a slow consumer blocks the producer (back-pressure), so
+memory stays proportional to the queue sizes instead of the document size.
+"""
+
+import queue
+import threading
+import time
+
+from config import STREAM_QUEUE_SIZE
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+class StreamStage:
+    """One pipeline stage: iterates `items` in a worker thread into a bounded queue"""
+
+    def __init__(self, name, items, maxsize=STREAM_QUEUE_SIZE):
+        """
+        Args:
+            name: Stage name (for stats)
+            items: Iterable/generator producing the stage output (usually wraps the
+                   previous stage, e.g. iter_clean_blocks(pages_stage))
+            maxsize: Queue capacity between this stage and its consumer
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.items = 0
+        self.max_depth = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._closed = threading.Event()
+        self._started = time.perf_counter()
+        self._finished = None
+        self._thread = threading.Thread(target=self._run, args=(items,), name=f"stream-{name}", daemon=True)
+        self._thread.start()
+
+    def _run(self, items):
+        try:
+            for item in items:
+                if not self._put(item):
+                    return
+                self.items += 1
+        except BaseException as e:
+            # Re-raised in the consumer thread
+            self.error = e
+        finally:
+            self._finished = time.perf_counter()
+            self._put(_DONE)
+
+    def _put(self, item):
+        """Blocks while the queue is full; gives up once the stage is closed"""
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=_POLL_SECONDS)
+            except queue.Full:
+                continue
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+            return True
+        return False
+
+    def __iter__(self):
+        while not self._closed.is_set():
+            try:
+                item = self._queue.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+
+    def close(self):
+        """Stops the stage (its producer and consumer return at the next poll)"""
+        self._closed.set()
+
+    def stats(self):
+        """Items produced, throughput, current and maximum queue depth"""
+        seconds = (self._finished or time.perf_counter()) - self._started
+        return {
+            'stage': self.name,
+            'items': self.items,
+            'seconds': seconds,
+            'items_per_sec': self.items / seconds if seconds > 0 else 0.0,
+            'depth': self._queue.qsize(),
+            'max_depth': self.max_depth,
+            'maxsize': self.maxsize
+        }
+
+class StreamPipeline:
+    """Chain of StreamStages; the caller consumes the last one"""
+
+    def __init__(self, maxsize=STREAM_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.stages = []
+
+    def stage(self, name, items):
+        """Adds a stage and returns it (iterate it, or wrap it in the next stage)"""
+        stage = StreamStage(name, items, self.maxsize)
+        self.stages.append(stage)
+        return stage
+
+    def close(self):
+        for stage in self.stages:
+            stage.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def stats(self):
+        return [stage.stats() for stage in self.stages]
+
+    def report(self, label):
+        """Prints one line per stage: items, throughput, queue depth"""
+        print(f"📊 Stream stats for {label}:")
+        for s in self.stats():
+            print(f"   {s['stage']:<6} {s['items']:>5} items  {s['items_per_sec']:8.1f}/s  "
+                  f"queue max {s['max_depth']}/{s['maxsize']}")
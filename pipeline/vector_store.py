@@ -1,80 +1,1035 @@
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
 import lancedb
+import numpy as np
 import pyarrow as pa
-from config import LANCEDB_URI
+import pyarrow.compute as pc
+from lancedb.index import BTree, IvfPq
+from config import (LANCEDB_URI, EMBEDDING_DIM, VECTOR_READ_CONSISTENCY_SECONDS,
+                    VECTOR_WRITE_BATCH_ROWS, VECTOR_WRITE_BATCH_MB,
+                    VECTOR_INDEX_MIN_ROWS, VECTOR_INDEX_REBUILD_RATIO, VECTOR_INDEX_PARTITIONS,
+                    VECTOR_INDEX_SUB_VECTORS, VECTOR_NPROBES, VECTOR_REFINE_FACTOR,
+                    ENTITY_INDEX_CANDIDATES, ENTITY_INDEX_MAX_IDS, LEXICAL_TOP_K)
+from pipeline.entity_extractor import ENTITY_TYPES, normalize_entities
+from pipeline.lexical_index import LexicalIndex
+
+# Schema metadata marking a table whose embeddings are L2-normalized (searched with "dot")
+NORMALIZED_KEY = b"embedding_norm"
+
+# Per-document manifest kept next to each vectors table (<table>_manifest)
+MANIFEST_SCHEMA = pa.schema([
+    pa.field("source", pa.string()),
+    pa.field("chunks", pa.int64()),
+    pa.field("ingested_at", pa.float64()),  # epoch seconds of the last write (None: backfilled)
+])
+
+# Inverted entity index kept next to each vectors table (<table>_entities):
+# one posting per (entity type, normalized value, chunk id)
+ENTITY_INDEX_SCHEMA = pa.schema([
+    pa.field("entity_type", pa.string()),
+    pa.field("value", pa.string()),
+    pa.field("id", pa.string()),
+    pa.field("source", pa.string()),
+])
+
+def _sql_string(value):
+    """SQL string literal (single quotes escaped)"""
+    return "'" + value.replace("'", "''") + "'"
+
+def _source_filter(filename):
+    """SQL filter for a source name"""
+    return f"source = {_sql_string(filename)}"
+
+def entity_filter(entities):
+    """
+    SQL filter (evaluated inside LanceDB) matching chunks that share at least one
+    entity with `entities` ({type: [values]}, normalized here). None if there is none.
+    """
+    clauses = []
+    for entity_type, values in normalize_entities(entities).items():
+        if values:
+            clauses.append(f"array_has_any({entity_type}, [{', '.join(_sql_string(v) for v in values)}])")
+    return " OR ".join(clauses) or None
+
+class VectorStore:
+    """
+    Process-wide LanceDB connection and open table handles, shared by the watcher /
+    ingestion threads and the chat loop (no connect / open_table / table listing per
+    call). Writes of this process go through these handles, so they always see the
+    latest version; versions committed by other processes (e.g. manage_db while the
+    app runs) are picked up within VECTOR_READ_CONSISTENCY_SECONDS.
+    """
+
+    def __init__(self, uri=LANCEDB_URI, consistency_seconds=VECTOR_READ_CONSISTENCY_SECONDS):
+        """
+        Initialize store
+
+        Args:
+            uri: LanceDB directory
+            consistency_seconds: How often open tables check for newer versions
+        """
+        self.uri = uri
+        self.db = lancedb.connect(uri, read_consistency_interval=timedelta(seconds=consistency_seconds))
+        self.schema_checked = set()  # tables whose schema was verified (see ensure_vector_schema)
+        self.manifests = {}          # table -> (manifest table version, {source: entry})
+        self.entity_indexes = {}     # table -> (postings table version, EntityIndex)
+        self.lexical_indexes = {}    # table -> LexicalIndex (in memory only)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, name="vectors"):
+        """Cached handle of a table, or None if it does not exist (yet)."""
+        table = self._tables.get(name)
+        if table is not None:
+            return table
+        with self._lock:
+            table = self._tables.get(name)
+            if table is None:
+                try:
+                    table = self.db.open_table(name)
+                except ValueError:
+                    return None
+                self._tables[name] = table
+            return table
+
+    def create_table(self, name, data=None, schema=None, mode="create"):
+        """Creates (or with mode="overwrite" replaces) a table and caches its handle."""
+        with self._lock:
+            table = self.db.create_table(name, data=data, schema=schema, mode=mode)
+            self._tables[name] = table
+            return table
+
+    def version(self, name="vectors"):
+        """Current version of a table (0 if it does not exist)."""
+        table = self.table(name)
+        return table.version if table is not None else 0
+
+    def refresh(self):
+        """Moves every open handle to the latest committed version right away."""
+        with self._lock:
+            tables = list(self._tables.values())
+        for table in tables:
+            table.checkout_latest()
+
+# Global store instance
+_store_instance = None
+_store_lock = threading.Lock()
+
+def get_store() -> VectorStore:
+    """Get global vector store instance (re-created if LANCEDB_URI changes)"""
+    global _store_instance
+    with _store_lock:
+        if _store_instance is None or _store_instance.uri != LANCEDB_URI:
+            _store_instance = VectorStore(LANCEDB_URI)
+        return _store_instance
 
 def get_db_connection():
-    return lancedb.connect(LANCEDB_URI)
-
-def create_table_if_not_exists(table_name="vectors"):
-    db = get_db_connection()
-    
-    # Define Schema
-    # id: string, text: string, embedding: vector, source: string, metadata: string (json string)
-    # LanceDB infers vector size from data, but we can be explicit if needed.
-    # For simplicity, we'll let it auto-create on first add OR define minimal schema.
-    # But usually, it's better to pass a list of dicts and let LanceDB infer.
-    
-    # We will just verify connection here. Table creation happens on 'add'.
-    return db
+    return get_store().db
+
+# Last search / write of this process (monotonic), used to find idle periods for maintenance
+_last_activity = time.monotonic()
+
+def mark_activity():
+    global _last_activity
+    _last_activity = time.monotonic()
+
+def idle_seconds():
+    """Seconds since this process last searched or wrote the vector store."""
+    return time.monotonic() - _last_activity
+
+def vector_schema(dim=EMBEDDING_DIM):
+    """
+    Arrow schema of the vectors table.
+    embedding: fixed_size_list<float32, dim>, L2-normalized (marked in the schema metadata)
+    one list<string> column per ENTITY_TYPES entry (Hybrid RAG entities, lower-cased,
+    deduplicated; empty list when a chunk has none)
+    """
+    return pa.schema([
+        pa.field("id", pa.string()),
+        pa.field("text", pa.string()),
+        pa.field("embedding", pa.list_(pa.float32(), dim)),
+        pa.field("source", pa.string()),
+    ] + [pa.field(entity_type, pa.list_(pa.string())) for entity_type in ENTITY_TYPES],
+        metadata={NORMALIZED_KEY: b"l2"})
+
+def create_table_if_not_exists(table_name="vectors", dim=EMBEDDING_DIM):
+    """Creates the (empty) table with the explicit schema, or migrates an existing one."""
+    store = get_store()
+    with get_writer().lock:
+        if store.table(table_name) is None:
+            _ensure_source_index(store.create_table(table_name, schema=vector_schema(dim)))
+            store.schema_checked.add(table_name)
+        else:
+            ensure_vector_schema(table_name)
+    return store.db
+
+def normalize_embeddings(matrix):
+    """L2-normalizes the rows of a float32 matrix in place (all-zero rows stay zero)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+def _is_current_schema(schema):
+    field = schema.field("embedding") if "embedding" in schema.names else None
+    return (field is not None
+            and pa.types.is_fixed_size_list(field.type)
+            and field.type.value_type == pa.float32()
+            and (schema.metadata or {}).get(NORMALIZED_KEY) == b"l2"
+            and "metadata" not in schema.names
+            and all(entity_type in schema.names for entity_type in ENTITY_TYPES))
+
+def ensure_vector_schema(table_name="vectors"):
+    """
+    Migrates a table created by older versions (inferred list<double> or
+    unnormalized float32 embeddings, entities as a JSON `metadata` string) in place:
+    vectors are cast to fixed_size_list<float32> and L2-normalized, the JSON is parsed
+    once into the entity columns, then the table is overwritten as a new version.
+    Checked once per process.
+    Returns: True if the table was migrated
+    """
+    store = get_store()
+    if table_name in store.schema_checked:
+        return False
+
+    with get_writer().lock:
+        if table_name in store.schema_checked:
+            return False
+        table = store.table(table_name)
+        if table is None:
+            return False
+        if _is_current_schema(table.schema):
+            _ensure_source_index(table)
+            store.schema_checked.add(table_name)
+            return False
+
+        data = table.to_arrow()
+        print(f"🔄 Migrating {table_name}: float32 L2-normalized embeddings, entity columns ({data.num_rows} rows)")
+        embeddings = data.column("embedding").combine_chunks()
+        dim = len(embeddings[0]) if len(embeddings) else EMBEDDING_DIM
+        matrix = np.array(embeddings.flatten().to_numpy(zero_copy_only=False), dtype=np.float32).reshape(-1, dim)
+        column = pa.FixedSizeListArray.from_arrays(pa.array(normalize_embeddings(matrix).reshape(-1)), dim)
+
+        schema = vector_schema(dim)
+        data = data.set_column(data.schema.get_field_index("embedding"), schema.field("embedding"), column)
+        if not all(entity_type in data.column_names for entity_type in ENTITY_TYPES):
+            metadata = data.column("metadata").to_pylist() if "metadata" in data.column_names else [None] * data.num_rows
+            for entity_type, array in zip(ENTITY_TYPES, entity_arrays([_parse_metadata(m) for m in metadata])):
+                data = data.append_column(schema.field(entity_type), array)
+        data = data.select(schema.names).cast(schema)
+        _ensure_source_index(store.create_table(table_name, data=data, schema=schema, mode="overwrite"))
+        store.schema_checked.add(table_name)
+        return True
+
+def _parse_metadata(value):
+    """Entities of a legacy row / document: JSON string, dict or None -> dict"""
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return {}
+
+def entity_arrays(entities):
+    """Per-row entity dicts -> one list<string> Arrow array per ENTITY_TYPES entry (normalized)."""
+    rows = [normalize_entities(e) for e in entities]
+    return [pa.array([row[entity_type] for row in rows], type=pa.list_(pa.string()))
+            for entity_type in ENTITY_TYPES]
+
+def _ensure_source_index(table):
+    """Scalar (BTREE) index on `source`: per-document filters do not scan the whole table."""
+    if not any(list(index.columns) == ["source"] for index in table.list_indices()):
+        table.create_index("source", config=BTree(), replace=True)
+
+def manifest_name(table_name="vectors"):
+    return f"{table_name}_manifest"
+
+def get_manifest(table_name="vectors"):
+    """
+    Stored documents of a table: {source: {"chunks", "ingested_at"}}.
+    Served from memory; reloaded only when the manifest table has a new version
+    (e.g. written by another process). Built from the vectors table if missing.
+    """
+    store = get_store()
+    manifest = store.table(manifest_name(table_name))
+    if manifest is None:
+        return rebuild_manifest(table_name) if store.table(table_name) is not None else {}
+
+    cached = store.manifests.get(table_name)
+    version = manifest.version
+    if cached and cached[0] == version:
+        return cached[1]
+    entries = {row["source"]: {"chunks": row["chunks"], "ingested_at": row["ingested_at"]}
+               for row in manifest.to_arrow().to_pylist()}
+    store.manifests[table_name] = (version, entries)
+    return entries
+
+def rebuild_manifest(table_name="vectors"):
+    """Recomputes the manifest from the vectors table (reads only the source column)."""
+    store = get_store()
+    with get_writer().lock:
+        table = store.table(table_name)
+        previous = {}
+        cached = store.manifests.pop(table_name, None)
+        if cached:
+            previous = cached[1]
+
+        entries = {}
+        if table is not None:
+            sources = table.search().select(["source"]).limit(None).to_arrow().column("source")
+            for item in pc.value_counts(sources).to_pylist():
+                old = previous.get(item["values"], {})
+                entries[item["values"]] = {"chunks": item["counts"], "ingested_at": old.get("ingested_at")}
+
+        rows = [{"source": source, **entry} for source, entry in entries.items()]
+        manifest = store.create_table(manifest_name(table_name), data=pa.Table.from_pylist(rows, schema=MANIFEST_SCHEMA),
+                                      schema=MANIFEST_SCHEMA, mode="overwrite")
+        store.manifests[table_name] = (manifest.version, entries)
+        return entries
+
+def _update_manifest(table_name, before, added=None, removed=()):
+    """
+    Applies a write to the manifest (caller holds the writer lock).
+    before: manifest read before the vectors were written
+    added: {source: rows appended}; removed: sources whose rows were all deleted
+    On failure the manifest is rebuilt from the vectors table.
+    """
+    mark_activity()
+    added = added or {}
+    store = get_store()
+    now = time.time()
+    entries = dict(before)
+    for source in removed:
+        entries.pop(source, None)
+    upserts = []
+    for source, count in added.items():
+        chunks = entries.get(source, {}).get("chunks", 0) + count
+        entries[source] = {"chunks": chunks, "ingested_at": now}
+        upserts.append({"source": source, "chunks": chunks, "ingested_at": now})
+
+    try:
+        manifest = store.table(manifest_name(table_name))
+        if manifest is None:
+            manifest = store.create_table(manifest_name(table_name), schema=MANIFEST_SCHEMA)
+        removed = [source for source in removed if source not in added]
+        if removed:
+            manifest.delete(" OR ".join(_source_filter(source) for source in removed))
+        if upserts:
+            manifest.merge_insert("source").when_matched_update_all().when_not_matched_insert_all() \
+                .execute(pa.Table.from_pylist(upserts, schema=MANIFEST_SCHEMA))
+        store.manifests[table_name] = (manifest.version, entries)
+    except Exception as e:
+        print(f"Error updating manifest, rebuilding it: {e}")
+        rebuild_manifest(table_name)
+
+def entity_index_name(table_name="vectors"):
+    return f"{table_name}_entities"
+
+class EntityIndex:
+    """
+    In-memory form of a table's entity postings: (entity type, value) -> chunk ids,
+    plus the postings of each source for deletes and renames. A lookup is a few
+    dict / set reads, independent of the table size.
+    """
+
+    def __init__(self, postings=None):
+        self._ids = {}      # (entity_type, value) -> {chunk id}
+        self._sources = {}  # source -> [(key, chunk id)]
+        self._lock = threading.Lock()
+        if postings is not None:
+            self.add(postings)
+
+    def add(self, postings):
+        """postings: Arrow table in ENTITY_INDEX_SCHEMA"""
+        columns = [postings.column(name).to_pylist() for name in ENTITY_INDEX_SCHEMA.names]
+        with self._lock:
+            for entity_type, value, chunk_id, source in zip(*columns):
+                key = (entity_type, value)
+                self._ids.setdefault(key, set()).add(chunk_id)
+                self._sources.setdefault(source, []).append((key, chunk_id))
+
+    def remove_source(self, source):
+        with self._lock:
+            for key, chunk_id in self._sources.pop(source, []):
+                ids = self._ids.get(key)
+                if ids is not None:
+                    ids.discard(chunk_id)
+                    if not ids:
+                        del self._ids[key]
+
+    def rename_source(self, old_source, new_source):
+        with self._lock:
+            postings = self._sources.pop(old_source, None)
+            if postings:
+                self._sources.setdefault(new_source, []).extend(postings)
+
+    def lookup(self, entities, max_ids=None):
+        """
+        Chunks sharing values with `entities` ({type: [normalized values]}), most
+        matching values first: [(chunk id, matches)]
+        """
+        counts = Counter()
+        with self._lock:
+            for entity_type, values in entities.items():
+                for value in values:
+                    counts.update(self._ids.get((entity_type, value), ()))
+        return counts.most_common(max_ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+def entity_postings(data):
+    """Postings (ENTITY_INDEX_SCHEMA) of an Arrow table with id, source and entity columns"""
+    ids = data.column("id").combine_chunks()
+    sources = data.column("source").combine_chunks()
+    parts = []
+    for entity_type in ENTITY_TYPES:
+        column = data.column(entity_type).combine_chunks()
+        values = pc.list_flatten(column)
+        if len(values) == 0:
+            continue
+        rows = pc.list_parent_indices(column)
+        parts.append(pa.Table.from_arrays(
+            [pa.array([entity_type] * len(values), type=pa.string()), values,
+             pc.take(ids, rows), pc.take(sources, rows)],
+            schema=ENTITY_INDEX_SCHEMA))
+    return pa.concat_tables(parts) if parts else ENTITY_INDEX_SCHEMA.empty_table()
+
+def get_entity_index(table_name="vectors"):
+    """
+    Inverted entity index of a table (EntityIndex). Served from memory; reloaded only
+    when the postings table has a new version (e.g. written by another process).
+    Built from the entity columns if missing.
+    """
+    store = get_store()
+    postings = store.table(entity_index_name(table_name))
+    if postings is None:
+        return rebuild_entity_index(table_name) if store.table(table_name) is not None else EntityIndex()
+
+    cached = store.entity_indexes.get(table_name)
+    version = postings.version
+    if cached and cached[0] == version:
+        return cached[1]
+    index = EntityIndex(postings.to_arrow())
+    store.entity_indexes[table_name] = (version, index)
+    return index
+
+def rebuild_entity_index(table_name="vectors"):
+    """Recomputes the postings from the entity columns of the vectors table."""
+    store = get_store()
+    with get_writer().lock:
+        ensure_vector_schema(table_name)
+        table = store.table(table_name)
+        postings = ENTITY_INDEX_SCHEMA.empty_table()
+        if table is not None:
+            postings = entity_postings(table.search().select(["id", "source"] + ENTITY_TYPES).limit(None).to_arrow())
+
+        created = store.create_table(entity_index_name(table_name), data=postings,
+                                     schema=ENTITY_INDEX_SCHEMA, mode="overwrite")
+        index = EntityIndex(postings)
+        store.entity_indexes[table_name] = (created.version, index)
+        return index
+
+def _update_entity_index(table_name, added=None, removed=(), renamed=None):
+    """
+    Applies a write to the entity postings (caller holds the writer lock).
+    added: Arrow table of appended rows; removed: sources whose rows were all deleted;
+    renamed: (old source, new source). On failure the index is rebuilt.
+    """
+    store = get_store()
+    try:
+        postings = store.table(entity_index_name(table_name))
+        if postings is None:
+            rebuild_entity_index(table_name)  # built from the table, this write included
+            return
+
+        index = get_entity_index(table_name)
+        if removed:
+            postings.delete(" OR ".join(_source_filter(source) for source in removed))
+            for source in removed:
+                index.remove_source(source)
+        if renamed:
+            postings.update(where=_source_filter(renamed[0]), values={"source": renamed[1]})
+            index.rename_source(*renamed)
+        if added is not None:
+            new_postings = entity_postings(added)
+            if new_postings.num_rows:
+                postings.add(new_postings)
+                index.add(new_postings)
+        store.entity_indexes[table_name] = (postings.version, index)
+    except Exception as e:
+        print(f"Error updating entity index, rebuilding it: {e}")
+        rebuild_entity_index(table_name)
+
+def get_lexical_index(table_name="vectors"):
+    """
+    BM25 index over the text column (LexicalIndex). Built in memory on first use and
+    kept current by this process's writes; rebuilt when the table has a version the
+    index did not follow (rows written by another process, compaction).
+    """
+    store = get_store()
+    table = store.table(table_name)
+    if table is None:
+        return LexicalIndex()
+    index = store.lexical_indexes.get(table_name)
+    if index is not None and index.version == table.version:
+        return index
+
+    with get_writer().lock:
+        ensure_vector_schema(table_name)
+        table = store.table(table_name)
+        version = table.version
+        data = table.search().select(["id", "source", "text"]).limit(None).to_arrow()
+        index = LexicalIndex()
+        index.add(data.column("id").to_pylist(), data.column("source").to_pylist(), data.column("text").to_pylist())
+        index.version = version
+        store.lexical_indexes[table_name] = index
+        return index
+
+def _update_lexical_index(table_name, before_version, added=None, removed=(), renamed=None):
+    """
+    Applies a write of this process to the in-memory lexical index (caller holds the
+    writer lock); with no changes it only follows a new version (index builds).
+    An index that was not current before the write is left to be rebuilt.
+    """
+    store = get_store()
+    index = store.lexical_indexes.get(table_name)
+    if index is None or index.version != before_version:
+        return
+    for source in removed:
+        index.remove_source(source)
+    if renamed:
+        index.rename_source(*renamed)
+    if added is not None:
+        index.add(added.column("id").to_pylist(), added.column("source").to_pylist(),
+                  added.column("text").to_pylist())
+    index.version = store.version(table_name)
 
 def add_documents(documents, table_name="vectors", vector_dim=1024):
     """
     documents: list of dicts 
     [
-        {"id": "...", "text": "...", "embedding": [...], "source": "...", "metadata": {...}}
+        {"id": "...", "text": "...", "embedding": [...], "source": "...", "entities": {...}}
     ]
+    (a legacy "metadata" JSON string / dict is accepted in place of "entities")
+    Converted to one Arrow record batch and written through the shared writer
+    (flushed immediately).
     """
     if not documents:
         return
 
-    db = get_db_connection()
-    if table_name in db.table_names():
-        table = db.open_table(table_name)
-        table.add(documents)
+    writer = get_writer()
+    writer.write(documents_to_record_batch(documents), table_name)
+    writer.flush(table_name)
+
+def documents_to_record_batch(documents):
+    """Document dicts (see add_documents) -> Arrow record batch in the table layout"""
+    return make_record_batch(
+        [doc["text"] for doc in documents],
+        [doc["embedding"] for doc in documents],
+        [doc["source"] for doc in documents],
+        [doc.get("entities") or _parse_metadata(doc.get("metadata")) for doc in documents],
+        ids=[doc.get("id") or str(uuid.uuid4()) for doc in documents]
+    )
+
+def make_record_batch(texts, embeddings, source, entities=None, ids=None):
+    """
+    Builds an Arrow record batch in the table layout (vector_schema) from parallel lists.
+    The embeddings are packed into one contiguous float32 matrix, L2-normalized in
+    place, that backs the fixed_size_list<float32> column without another copy.
+    source: one filename for every row, or a list (one per row)
+    entities: one {type: [values]} dict per row (default: none), see entity_arrays
+    ids: row ids (default: fresh uuid per row)
+    """
+    matrix = np.array(embeddings, dtype=np.float32, order="C")
+    if matrix.ndim != 2 or matrix.shape[0] != len(texts):
+        raise ValueError(f"expected {len(texts)} embeddings of equal size, got shape {matrix.shape}")
+    normalize_embeddings(matrix)
+    sources = [source] * len(texts) if isinstance(source, str) else source
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(ids if ids is not None else [str(uuid.uuid4()) for _ in texts], type=pa.string()),
+            pa.array(texts, type=pa.string()),
+            pa.FixedSizeListArray.from_arrays(pa.array(matrix.reshape(-1)), matrix.shape[1]),
+            pa.array(sources, type=pa.string()),
+        ] + entity_arrays(entities if entities is not None else [{}] * len(texts)),
+        schema=vector_schema(matrix.shape[1])
+    )
+
+def add_record_batch(batch, table_name="vectors"):
+    """Queues an Arrow record batch (see make_record_batch) on the shared writer."""
+    get_writer().write(batch, table_name)
+
+def _append_table(data, table_name):
+    """Appends an Arrow table, creating the LanceDB table on first write."""
+    store = get_store()
+    before = get_manifest(table_name)
+    before_version = store.version(table_name)
+    if store.table(table_name) is not None:
+        ensure_vector_schema(table_name)
+        store.table(table_name).add(data)
     else:
-        # Table doesn't exist, create it
-        db.create_table(table_name, data=documents)
+        _ensure_source_index(store.create_table(table_name, data=data))
+        store.schema_checked.add(table_name)
+    added = pc.value_counts(data.column("source")).to_pylist()
+    _update_manifest(table_name, before, added={item["values"]: item["counts"] for item in added})
+    _update_entity_index(table_name, added=data)
+    _update_lexical_index(table_name, before_version, added=data)
+
+class VectorWriter:
+    """
+    Process-wide buffered writer. Every write to the vector tables (appends, deletes,
+    renames) goes through its lock, so ingestion threads, the watcher and manage_db
+    commands never write concurrently. Appended record batches are buffered and
+    written as one Arrow table - one LanceDB fragment instead of one per document or
+    embedding batch - once max_rows / max_bytes are reached or flush() is called.
+    """
+
+    def __init__(self, max_rows=VECTOR_WRITE_BATCH_ROWS, max_bytes=VECTOR_WRITE_BATCH_MB * 1024 * 1024):
+        """
+        Initialize writer
+
+        Args:
+            max_rows: Buffered rows that trigger a flush
+            max_bytes: Buffered Arrow bytes that trigger a flush
+        """
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.lock = threading.RLock()
+        self._pending = {}  # table_name -> [RecordBatch]
+        self.pending_rows = 0
+        self.pending_bytes = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    def write(self, batch, table_name="vectors"):
+        """Buffers a record batch; flushes when the buffer is full."""
+        if batch.num_rows == 0:
+            return
+        mark_activity()
+        with self.lock:
+            self._pending.setdefault(table_name, []).append(batch)
+            self.pending_rows += batch.num_rows
+            self.pending_bytes += batch.nbytes
+            if self.pending_rows >= self.max_rows or self.pending_bytes >= self.max_bytes:
+                self.flush()
+
+    def flush(self, table_name=None):
+        """
+        Writes buffered batches (of one table, or all) - one append per table.
+        If an append fails its batches stay buffered and the error is raised.
+        """
+        with self.lock:
+            names = [table_name] if table_name is not None else list(self._pending)
+            for name in names:
+                batches = self._pending.get(name)
+                if not batches:
+                    continue
+                data = pa.Table.from_batches(batches)
+                _append_table(data, name)
+                del self._pending[name]
+                self.flushes += 1
+                self.rows_written += data.num_rows
+            self._recount()
+
+    def discard(self, table_name="vectors", source=None):
+        """Drops buffered rows of a table (only those of `source` if given)."""
+        with self.lock:
+            batches = self._pending.pop(table_name, [])
+            if source is not None:
+                kept = [b.filter(pc.not_equal(b.column("source"), source)) for b in batches]
+                kept = [b for b in kept if b.num_rows]
+                if kept:
+                    self._pending[table_name] = kept
+            self._recount()
+
+    def _recount(self):
+        batches = [b for table_batches in self._pending.values() for b in table_batches]
+        self.pending_rows = sum(b.num_rows for b in batches)
+        self.pending_bytes = sum(b.nbytes for b in batches)
+
+# Global writer instance
+_writer_instance = None
+_writer_lock = threading.Lock()
+
+def get_writer() -> VectorWriter:
+    """Get global vector writer instance"""
+    global _writer_instance
+    with _writer_lock:
+        if _writer_instance is None:
+            _writer_instance = VectorWriter()
+        return _writer_instance
+
+def flush_writes():
+    """Writes everything buffered by this process."""
+    get_writer().flush()
+
+def _read_your_writes(table_name):
+    """Rows buffered by this process become visible before a read."""
+    writer = get_writer()
+    if not writer.pending_rows:
+        return
+    try:
+        writer.flush(table_name)
+    except Exception as e:
+        print(f"Error flushing pending vectors: {e}")
 
-def search_vectors(query_embedding, table_name="vectors", limit=5):
+def search_vectors(query_embedding, table_name="vectors", limit=5, nprobes=None, refine_factor=None,
+                   where=None, columns=None):
     """
-    Search for similar vectors using cosine distance.
-    Cosine distance range: 0-2 (0 = identical, 2 = opposite)
+    Search for similar vectors. Stored embeddings are L2-normalized, so the query is
+    normalized too and the dot metric gives the cosine distance without per-row norms.
+    Uses the IVF_PQ index when one exists (nprobes / refine_factor, defaults
+    VECTOR_NPROBES / VECTOR_REFINE_FACTOR), otherwise a flat scan.
+    where: SQL filter applied before the vector search (e.g. entity_filter(...))
+    columns: columns to return (default: all)
+    Distance range: 0-2 (0 = identical, 2 = opposite)
     """
-    db = get_db_connection()
+    mark_activity()
+    _read_your_writes(table_name)
     try:
-        table = db.open_table(table_name)
-        # CRITICAL FIX: Use cosine metric for normalized distances
-        # L2 distance can be very large for non-normalized vectors
-        results = table.search(query_embedding).metric("cosine").limit(limit).to_list()
-        return results
+        ensure_vector_schema(table_name)
+        table = get_store().table(table_name)
+        if table is None:
+            return []
+        query = _vector_query(table, query_embedding, limit, nprobes, refine_factor)
+        if where:
+            query = query.where(where, prefilter=True)
+        if columns:
+            query = query.select(columns)
+        return query.to_list()
     except Exception as e:
         print(f"Error searching vectors: {e}")
         return []
 
+def search_entity_candidates(query_embedding, entities, table_name="vectors", limit=ENTITY_INDEX_CANDIDATES,
+                             max_ids=ENTITY_INDEX_MAX_IDS, exclude_ids=(), columns=None):
+    """
+    Candidate generation from the inverted entity index: of the (at most max_ids)
+    chunks sharing the most entity values with `entities`, the `limit` nearest to the
+    query by exact distance (same result format as search_vectors).
+    exclude_ids: chunks already found (e.g. by search_vectors)
+    """
+    _read_your_writes(table_name)
+    try:
+        exclude = set(exclude_ids)
+        hits = get_entity_index(table_name).lookup(normalize_entities(entities), max_ids + len(exclude))
+        ids = [chunk_id for chunk_id, _ in hits if chunk_id not in exclude][:max_ids]
+        return _search_ids(table_name, query_embedding, ids, limit, columns)
+    except Exception as e:
+        print(f"Error searching entity candidates: {e}")
+        return []
+
+def search_lexical(query, table_name="vectors", limit=LEXICAL_TOP_K):
+    """BM25 search over the chunk texts (see pipeline/lexical_index.py): [(chunk id, score)]"""
+    _read_your_writes(table_name)
+    try:
+        return get_lexical_index(table_name).search(query, limit)
+    except Exception as e:
+        print(f"Error in lexical search: {e}")
+        return []
+
+def table_version(table_name="vectors"):
+    """(LanceDB URI, table, version) after this process's buffered writes - changes with every write."""
+    _read_your_writes(table_name)
+    store = get_store()
+    return store.uri, table_name, store.version(table_name)
+
+def fetch_chunks(ids, table_name="vectors", columns=("id", "text", "source")):
+    """Rows of the given chunk ids, in the order of `ids` (missing ids are left out)."""
+    table = get_store().table(table_name)
+    if not ids or table is None:
+        return []
+    try:
+        rows = table.search().where(f"id IN ({', '.join(_sql_string(chunk_id) for chunk_id in ids)})") \
+            .select(list(columns)).limit(None).to_list()
+    except Exception as e:
+        print(f"Error fetching chunks: {e}")
+        return []
+    by_id = {row["id"]: row for row in rows}
+    return [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+
+def search_ids(query_embedding, ids, table_name="vectors", columns=None):
+    """Rows of the given chunk ids with their exact distance to the query (search_vectors format)."""
+    try:
+        return _search_ids(table_name, query_embedding, ids, len(ids), columns)
+    except Exception as e:
+        print(f"Error fetching chunks: {e}")
+        return []
+
+def _search_ids(table_name, query_embedding, ids, limit, columns=None):
+    """
+    The `limit` rows of `ids` nearest to the query. A filtered read plus one dot product
+    (same distance as the dot metric) - a prefiltered vector query scans far more.
+    """
+    table = get_store().table(table_name)
+    if not ids or table is None:
+        return []
+    columns = list(columns or table.schema.names)
+    rows = table.search().where(f"id IN ({', '.join(_sql_string(chunk_id) for chunk_id in ids)})") \
+        .select(list(dict.fromkeys(columns + ["embedding"]))).limit(None).to_arrow()
+    if rows.num_rows == 0:
+        return []
+
+    embeddings = rows.column("embedding").combine_chunks()
+    matrix = embeddings.flatten().to_numpy().reshape(-1, embeddings.type.list_size)
+    query = normalize_embeddings(np.array([query_embedding], dtype=np.float32))[0]
+    distances = 1.0 - matrix @ query
+    order = np.argsort(distances, kind="stable")[:limit]
+    results = rows.select(columns).take(pa.array(order)).to_pylist()
+    for result, distance in zip(results, distances[order]):
+        result["_distance"] = float(distance)
+    return results
+
+def _vector_query(table, query_embedding, limit, nprobes=None, refine_factor=None, flat=False):
+    query = normalize_embeddings(np.array([query_embedding], dtype=np.float32))[0]
+    builder = table.search(query).metric("dot").limit(limit)
+    if flat:
+        return builder.bypass_vector_index()
+    builder = builder.nprobes(nprobes or VECTOR_NPROBES)
+    refine_factor = refine_factor if refine_factor is not None else VECTOR_REFINE_FACTOR
+    if refine_factor:
+        builder = builder.refine_factor(refine_factor)
+    return builder
+
+def index_status(table_name="vectors"):
+    """
+    ANN index state of a table:
+    {"rows", "indexed", "name", "index_type", "num_indexed_rows", "num_unindexed_rows"}
+    """
+    _read_your_writes(table_name)
+    status = {"rows": 0, "indexed": False, "name": None, "index_type": None,
+              "num_indexed_rows": 0, "num_unindexed_rows": 0}
+    table = get_store().table(table_name)
+    if table is None:
+        return status
+
+    status["rows"] = status["num_unindexed_rows"] = table.count_rows()
+    for index in table.list_indices():
+        if list(index.columns) == ["embedding"]:
+            stats = table.index_stats(index.name)
+            status.update(indexed=True, name=index.name, index_type=stats.index_type,
+                          num_indexed_rows=stats.num_indexed_rows,
+                          num_unindexed_rows=stats.num_unindexed_rows)
+    return status
+
+def build_vector_index(table_name="vectors", num_partitions=None, num_sub_vectors=None):
+    """
+    (Re)builds the IVF_PQ index on the embedding column (dot metric).
+    num_partitions: default VECTOR_INDEX_PARTITIONS or sqrt(rows)
+    num_sub_vectors: default VECTOR_INDEX_SUB_VECTORS or dim / 16 (a divisor of dim)
+    Returns: index_status after the build
+    """
+    writer = get_writer()
+    with writer.lock:
+        writer.flush(table_name)
+        ensure_vector_schema(table_name)
+        table = get_store().table(table_name)
+        rows = table.count_rows()
+        dim = table.schema.field("embedding").type.list_size
+
+        num_partitions = num_partitions or VECTOR_INDEX_PARTITIONS or max(1, int(math.sqrt(rows)))
+        num_sub_vectors = num_sub_vectors or VECTOR_INDEX_SUB_VECTORS or max(1, dim // 16)
+        while dim % num_sub_vectors:
+            num_sub_vectors -= 1
+
+        print(f"🧭 Building IVF_PQ index on {table_name} ({rows} rows, {num_partitions} partitions, {num_sub_vectors} sub-vectors)...")
+        start = time.perf_counter()
+        before_version = table.version
+        table.create_index("embedding", config=IvfPq(distance_type="dot", num_partitions=num_partitions,
+                                                     num_sub_vectors=num_sub_vectors), replace=True)
+        _update_lexical_index(table_name, before_version)
+        print(f"🧭 Index built in {time.perf_counter() - start:.1f}s")
+    return index_status(table_name)
+
+def refresh_source_index(table_name="vectors", force=False):
+    """Rebuilds the source scalar index when its unindexed rows pass VECTOR_INDEX_REBUILD_RATIO."""
+    with get_writer().lock:
+        table = get_store().table(table_name)
+        if table is None:
+            return False
+        for index in ([] if force else table.list_indices()):
+            if list(index.columns) == ["source"]:
+                stats = table.index_stats(index.name)
+                if stats.num_unindexed_rows <= VECTOR_INDEX_REBUILD_RATIO * stats.num_indexed_rows:
+                    return False
+        before_version = table.version
+        table.create_index("source", config=BTree(), replace=True)
+        _update_lexical_index(table_name, before_version)
+        return True
+
+def maybe_update_index(table_name="vectors"):
+    """
+    Index lifecycle, called after ingestion: builds the index once the table reaches
+    VECTOR_INDEX_MIN_ROWS rows and rebuilds it when unindexed rows (searched by flat
+    scan on top of the index) exceed VECTOR_INDEX_REBUILD_RATIO of the indexed ones.
+    The source scalar index follows the same ratio at any table size.
+    Returns: "built" | "rebuilt" | None
+    """
+    try:
+        refresh_source_index(table_name)
+        status = index_status(table_name)
+        if status["rows"] < VECTOR_INDEX_MIN_ROWS:
+            return None
+        if not status["indexed"]:
+            build_vector_index(table_name)
+            return "built"
+        if status["num_unindexed_rows"] > VECTOR_INDEX_REBUILD_RATIO * status["num_indexed_rows"]:
+            build_vector_index(table_name)
+            return "rebuilt"
+    except Exception as e:
+        print(f"Error updating vector index: {e}")
+    return None
+
+def measure_recall(table_name="vectors", samples=50, k=10, nprobes=None, refine_factor=None, seed=None):
+    """
+    Recall@k of the index against a flat scan, using `samples` random stored vectors
+    as queries. Returns: {"samples", "k", "recall", "index_ms", "flat_ms", "indexed"}
+    """
+    _read_your_writes(table_name)
+    ensure_vector_schema(table_name)
+    table = get_store().table(table_name)
+    rows = table.count_rows() if table is not None else 0
+    offsets = random.Random(seed).sample(range(rows), min(samples, rows))
+    queries = table.take_offsets(offsets).select(["embedding"]).to_arrow().column("embedding").to_pylist()
+
+    hits = total = 0
+    index_seconds = flat_seconds = 0.0
+    for query in queries:
+        start = time.perf_counter()
+        approx = _vector_query(table, query, k, nprobes, refine_factor).select(["id"]).to_list()
+        index_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        exact = _vector_query(table, query, k, flat=True).select(["id"]).to_list()
+        flat_seconds += time.perf_counter() - start
+
+        hits += len({r["id"] for r in approx} & {r["id"] for r in exact})
+        total += len(exact)
+
+    n = max(1, len(queries))
+    return {
+        "samples": len(queries),
+        "k": k,
+        "recall": hits / total if total else 1.0,
+        "index_ms": index_seconds * 1000 / n,
+        "flat_ms": flat_seconds * 1000 / n,
+        "indexed": index_status(table_name)["indexed"]
+    }
+
+def entity_values(entity_type, table_name="vectors"):
+    """Distinct values of one entity column with their chunk counts: {value: chunks}"""
+    _read_your_writes(table_name)
+    ensure_vector_schema(table_name)
+    table = get_store().table(table_name)
+    if table is None:
+        return {}
+    column = table.search().select([entity_type]).limit(None).to_arrow().column(entity_type)
+    counts = pc.value_counts(pc.list_flatten(column)).to_pylist()
+    return {item["values"]: item["counts"] for item in counts}
+
 def is_file_indexed(filename, table_name="vectors"):
-    db = get_db_connection()
-    if table_name not in db.table_names():
-        return False
-    
+    """Answered from the manifest (no vector scan)."""
+    _read_your_writes(table_name)
     try:
-        table = db.open_table(table_name)
-        # Assuming we can filter or search.
-        # LanceDB SQL-like filter: "source = 'filename'"
-        results = table.search().where(f"source = '{filename}'").limit(1).to_list()
-        return len(results) > 0
+        return filename in get_manifest(table_name)
     except Exception as e:
         print(f"Error checking index for {filename}: {e}")
         return False
 
 def delete_document_by_source(filename, table_name="vectors"):
-    db = get_db_connection()
-    if table_name not in db.table_names():
-        return False
-    
+    """
+    Deletes a source's rows, including rows still buffered in the writer.
+    Sources missing from the manifest are not looked up in the vectors table.
+    Returns: True if stored rows were deleted
+    """
+    writer = get_writer()
+    with writer.lock:
+        writer.discard(table_name, source=filename)
+        table = get_store().table(table_name)
+        if table is None:
+            return False
+
+        try:
+            before = get_manifest(table_name)
+            if filename not in before:
+                return False
+            before_version = table.version
+            table.delete(_source_filter(filename))
+            _update_manifest(table_name, before, removed=[filename])
+            _update_entity_index(table_name, removed=[filename])
+            _update_lexical_index(table_name, before_version, removed=[filename])
+            return True
+        except Exception as e:
+            print(f"Error deleting document {filename}: {e}")
+            return False
+
+def count_source_rows(filename, table_name="vectors"):
+    """Number of chunks stored for a source (from the manifest)."""
+    _read_your_writes(table_name)
     try:
-        table = db.open_table(table_name)
-        table.delete(f"source = '{filename}'")
-        return True
+        entry = get_manifest(table_name).get(filename)
+        return entry["chunks"] if entry else 0
     except Exception as e:
-        print(f"Error deleting document {filename}: {e}")
-        return False
+        print(f"Error counting rows for {filename}: {e}")
+        return 0
+
+def rename_source(old_filename, new_filename, table_name="vectors"):
+    """Re-points all chunks of a source to a new filename (renamed file, no re-embedding)."""
+    writer = get_writer()
+    with writer.lock:
+        writer.flush(table_name)
+        table = get_store().table(table_name)
+        if table is None:
+            return 0
+
+        try:
+            before = get_manifest(table_name)
+            if old_filename not in before:
+                return 0
+            before_version = table.version
+            result = table.update(where=_source_filter(old_filename), values={"source": new_filename})
+            _update_manifest(table_name, before, added={new_filename: result.rows_updated}, removed=[old_filename])
+            _update_entity_index(table_name, renamed=(old_filename, new_filename))
+            _update_lexical_index(table_name, before_version, renamed=(old_filename, new_filename))
+            return result.rows_updated
+        except Exception as e:
+            print(f"Error renaming {old_filename} -> {new_filename}: {e}")
+            return 0
+
+def copy_source(old_filename, new_filename, table_name="vectors"):
+    """Duplicates all chunks of a source under a new filename (copied file, no re-embedding)."""
+    writer = get_writer()
+    with writer.lock:
+        writer.flush(table_name)
+        table = get_store().table(table_name)
+        if table is None:
+            return 0
+
+        try:
+            before = get_manifest(table_name)
+            if old_filename not in before:
+                return 0
+            rows = table.search().where(_source_filter(old_filename)).limit(None).to_arrow()
+            if rows.num_rows == 0:
+                return 0
+            rows = rows.set_column(rows.schema.get_field_index("id"), "id",
+                                   pa.array([str(uuid.uuid4()) for _ in range(rows.num_rows)]))
+            rows = rows.set_column(rows.schema.get_field_index("source"), "source",
+                                   pa.array([new_filename] * rows.num_rows))
+            before_version = table.version
+            table.add(rows)
+            _update_manifest(table_name, before, added={new_filename: rows.num_rows})
+            _update_entity_index(table_name, added=rows)
+            _update_lexical_index(table_name, before_version, added=rows)
+            return rows.num_rows
+        except Exception as e:
+            print(f"Error copying {old_filename} -> {new_filename}: {e}")
+            return 0
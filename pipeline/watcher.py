@@ -0,0 +1,266 @@
+"""
+Document Watcher
+Filesystem events are coalesced per path and acted on only after the path has been
+quiet for WATCH_DEBOUNCE_SECONDS and its size/mtime stopped changing, so half-copied
+PDFs are never read. Ready paths go to a prioritized queue served by WATCH_WORKERS
+threads (removals and moves first, then smaller files first); creations and edits
+are (re-)indexed, deletions remove the document's rows.
+"""
+
+import itertools
+import os
+import queue
+import threading
+import time
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+from config import DOCS_DIR, WATCH_DEBOUNCE_SECONDS, WATCH_WORKERS
+from pipeline.ingest import ingest_files, remove_document
+from pipeline.vector_store import is_file_indexed
+from pipeline.doc_registry import get_registry
+
+UPSERT = "upsert"   # created or modified: index / re-index
+MOVE = "move"       # renamed inside the folder: re-link rows to the new name
+REMOVE = "remove"   # deleted or moved away: drop rows
+
+def is_pdf(path):
+    return path.lower().endswith(".pdf")
+
+def file_signature(path):
+    """(size, mtime_ns) of a file, None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+def make_job(action, path, src_path=None, size=0):
+    """Queue entry; removals/moves outrank ingestion, small files go before big ones"""
+    priority = (0, 0) if action in (REMOVE, MOVE) else (1, size)
+    return {"action": action, "path": path, "src_path": src_path, "priority": priority}
+
+def run_job(job):
+    """Default queue handler: applies one job to the index."""
+    action, path = job["action"], job["path"]
+    filename = os.path.basename(path)
+
+    if action == REMOVE:
+        if os.path.exists(path):
+            # Re-created before we got to it
+            return ingest_files([path])[0]
+        if get_registry().get(filename) or is_file_indexed(filename):
+            remove_document(filename)
+            print(f"🗑️ {filename} deleted, vectors removed")
+        return None
+
+    if not os.path.exists(path):
+        return None
+
+    print(f"Processing file: {path}")
+    # Registry decides: skip / re-index / re-link / index
+    result = ingest_files([path])[0]
+    if action == MOVE:
+        # Same content -> rows were renamed by the re-link; otherwise drop the old name
+        old_filename = os.path.basename(job["src_path"])
+        if not os.path.exists(job["src_path"]) and get_registry().get(old_filename):
+            remove_document(old_filename)
+    return result
+
+class IngestQueue:
+    """Priority queue of jobs served by worker threads (one job per path at a time)"""
+
+    def __init__(self, workers=WATCH_WORKERS, handler=run_job):
+        """
+        Args:
+            workers: Number of worker threads
+            handler: Called with each job (default: run_job)
+        """
+        self.handler = handler
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._queued = {}    # path -> latest job (older entries in the heap are stale)
+        self._active = set()  # paths being processed
+        self._waiting = {}   # path -> job that arrived while the path was being processed
+        self.processed = 0
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"ingest-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def put(self, job):
+        """Queues a job; a newer job for the same path replaces the pending one"""
+        with self._cond:
+            path = job["path"]
+            if path in self._active:
+                self._waiting[path] = job
+                return
+            self._queued[path] = job
+            self._queue.put((job["priority"], next(self._seq), job))
+
+    def pending(self):
+        with self._cond:
+            return len(self._queued) + len(self._waiting)
+
+    def _worker(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+
+            with self._cond:
+                if self._queued.get(job["path"]) is not job:
+                    continue  # superseded by a newer event for the same path
+                del self._queued[job["path"]]
+                self._active.add(job["path"])
+
+            try:
+                self.handler(job)
+            except Exception as e:
+                print(f"❌ Watcher job failed for {job['path']}: {type(e).__name__}: {e}")
+            finally:
+                with self._cond:
+                    self._active.discard(job["path"])
+                    self.processed += 1
+                    waiting = self._waiting.pop(job["path"], None)
+                    if waiting:
+                        self._queued[waiting["path"]] = waiting
+                        self._queue.put((waiting["priority"], next(self._seq), waiting))
+                    self._cond.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """Blocks until no job is queued or running. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not (self._queued or self._active or self._waiting), timeout)
+
+    def stop(self):
+        """Stops the workers after their current job (queued jobs are dropped)"""
+        with self._cond:
+            self._queued.clear()
+            self._waiting.clear()
+        for _ in self._threads:
+            self._queue.put(((float("inf"),), next(self._seq), None))
+        for t in self._threads:
+            t.join()
+
+class PDFHandler(FileSystemEventHandler):
+    """Coalesces watchdog events per PDF path and queues them once the file is stable"""
+
+    def __init__(self, ingest_queue, debounce=WATCH_DEBOUNCE_SECONDS):
+        """
+        Args:
+            ingest_queue: Receives ready jobs (IngestQueue or anything with put(job))
+            debounce: Seconds a path must stay quiet with an unchanged size/mtime
+        """
+        self.ingest_queue = ingest_queue
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._pending = {}  # path -> {"action", "src_path", "last_event", "signature"}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._debounce_loop, name="watch-debounce", daemon=True)
+        self._thread.start()
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._record(event.src_path, UPSERT)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._record(event.src_path, UPSERT)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self._record(event.src_path, REMOVE)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            return
+        src, dest = event.src_path, event.dest_path
+        if is_pdf(src) and is_pdf(dest):
+            with self._lock:
+                self._pending.pop(src, None)
+            self._record(dest, MOVE, src_path=src)
+        elif is_pdf(dest):
+            # e.g. "belge.pdf.part" -> "belge.pdf" at the end of a download
+            self._record(dest, UPSERT)
+        elif is_pdf(src):
+            self._record(src, REMOVE)
+
+    def _record(self, path, action, src_path=None):
+        if not is_pdf(path):
+            return
+        with self._lock:
+            entry = self._pending.get(path)
+            if entry and entry["action"] == MOVE and action == UPSERT:
+                # Writes to a just-moved file: still a move
+                action, src_path = MOVE, entry["src_path"]
+            self._pending[path] = {
+                "action": action,
+                "src_path": src_path,
+                "last_event": time.monotonic(),
+                "signature": None if action == REMOVE else file_signature(path)
+            }
+
+    def _debounce_loop(self):
+        interval = max(0.05, self.debounce / 4)
+        while not self._stop.wait(interval):
+            for job in self._collect_ready():
+                self.ingest_queue.put(job)
+
+    def _collect_ready(self):
+        """Pops the paths that have been quiet long enough and whose size/mtime is stable"""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, entry in list(self._pending.items()):
+                if now - entry["last_event"] < self.debounce:
+                    continue
+                if entry["action"] == REMOVE:
+                    del self._pending[path]
+                    ready.append(make_job(REMOVE, path))
+                    continue
+
+                signature = file_signature(path)
+                if signature is None:
+                    # Gone again before it settled
+                    del self._pending[path]
+                    if entry["action"] == MOVE:
+                        ready.append(make_job(REMOVE, entry["src_path"]))
+                elif signature == entry["signature"]:
+                    del self._pending[path]
+                    ready.append(make_job(entry["action"], path, entry["src_path"], size=signature[0]))
+                else:
+                    # Still being written: wait another quiet period
+                    entry["signature"] = signature
+                    entry["last_event"] = now
+        return ready
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+class DocumentWatcher:
+    """Observer + debouncing handler + ingestion queue for DOCS_DIR"""
+
+    def __init__(self, path=DOCS_DIR, workers=WATCH_WORKERS, debounce=WATCH_DEBOUNCE_SECONDS):
+        self.path = path
+        self.queue = IngestQueue(workers=workers)
+        self.handler = PDFHandler(self.queue, debounce=debounce)
+        self.observer = Observer()
+        self.observer.schedule(self.handler, path=path, recursive=False)
+
+    def start(self):
+        self.observer.start()
+        return self
+
+    def stop(self):
+        self.observer.stop()
+        self.handler.stop()
+        self.queue.stop()
+
+    def join(self):
+        self.observer.join()
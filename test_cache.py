@@ -4,14 +4,16 @@ Test query-answer caching functionality
 """
 
 from pipeline.cache import QueryCache
+import tempfile
 import time
 
 print("=" * 80)
 print("CACHE TEST")
 print("=" * 80)
 
-# Create cache instance
-cache = QueryCache(cache_dir="test_cache", max_age_hours=1)
+# Create cache instance (in a temporary directory, so no cache files are left in the repository)
+cache_dir = tempfile.mkdtemp()
+cache = QueryCache(cache_dir=cache_dir, max_age_hours=1)
 
 # Test 1: Basic cache operations
 print("\n1️⃣ Basic Cache Operations")
@@ -119,4 +121,4 @@ print("=" * 80)
 
 # Cleanup
 import shutil
-shutil.rmtree("test_cache", ignore_errors=True)
+shutil.rmtree(cache_dir, ignore_errors=True)
@@ -1,4 +1,4 @@
-from pipeline.chunker import chunk_text
+from pipeline.chunker import chunk_text, iter_chunks, semantic_sliding_window
 from config import CHUNK_SIZE
 
 def test_dynamic_chunking():
@@ -35,5 +35,15 @@ def test_dynamic_chunking():
     if len(chunks_huge) > 1:
         print(f"Chunk 2 len: {len(chunks_huge[1])}")
 
+def test_window_advances_when_overlap_does_not():
+    # The window starting at 112 finds the same cut point (162) as the one before it;
+    # cut point - overlap would start it at 112 again (an endless loop before), so the
+    # next window starts at the cut point instead
+    text = "b" * 150 + " " + "c" * 10 + " " + "d" * 300
+    chunks = semantic_sliding_window(text, 100, 50)
+    assert chunks[2:5] == ["b" * 50 + " " + "c" * 10, "b" * 38 + " " + "c" * 10, "d" * 100]
+    assert len(chunks) == 9
+    assert list(iter_chunks([text], 100, 50)) == chunk_text(text, 100, 50)
+
 if __name__ == "__main__":
     test_dynamic_chunking()
@@ -0,0 +1,101 @@
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+import pipeline.vector_store as vector_store
+import pipeline.db_maintenance as db_maintenance
+from pipeline.vector_store import make_record_batch
+from pipeline.db_maintenance import table_health, maintenance_reasons, optimize_tables, MaintenanceThread
+from tests.isolation import IsolatedTestCase
+
+def add_documents(count, rows=3, start=0, flush_each=True):
+    for i in range(start, start + count):
+        vectors = np.random.default_rng(i).normal(size=(rows, 4))
+        vector_store.add_record_batch(make_record_batch(
+            [f"doc{i} {j}" for j in range(rows)], vectors, f"doc{i}.pdf"))
+        if flush_each:
+            vector_store.flush_writes()
+    vector_store.flush_writes()
+
+class TestDBMaintenance(IsolatedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.start_patches(
+            patch.object(db_maintenance, "MAINTENANCE_MAX_FRAGMENTS", 5),
+            patch.object(db_maintenance, "MAINTENANCE_MAX_DELETED_RATIO", 0.2),
+            patch.object(db_maintenance, "MAINTENANCE_MAX_VERSIONS", 1000),
+        )
+
+    def test_health_and_thresholds(self):
+        self.assertIsNone(table_health())
+        add_documents(3)
+        health = table_health()
+        self.assertEqual((health["rows"], health["fragments"]), (9, 3))
+        self.assertEqual(maintenance_reasons(health), [])
+        self.assertEqual(optimize_tables(), [])
+
+        add_documents(4, start=3)
+        add_documents(4, start=7, flush_each=False)  # one fragment
+        for i in range(7, 10):
+            vector_store.delete_document_by_source(f"doc{i}.pdf")
+        health = table_health()
+        self.assertEqual((health["rows"], health["fragments"]), (24, 8))
+        self.assertGreater(health["deleted_ratio"], 0.2)
+        self.assertEqual(len(maintenance_reasons(health)), 2)
+
+    def test_optimize_compacts_and_cleans_up(self):
+        add_documents(8)
+        vector_store.delete_document_by_source("doc0.pdf")
+        before = table_health()
+
+        report = optimize_tables(keep_hours=0)
+        tables = [entry["table"] for entry in report]
+        self.assertEqual(tables[0], "vectors")
+        after = table_health()
+        self.assertEqual(after["fragments"], 1)
+        self.assertEqual(after["deleted_ratio"], 0.0)
+        self.assertLess(after["versions"], before["versions"])
+        self.assertEqual(after["rows"], 21)
+
+        # Data, manifest and the source index survive compaction
+        self.assertEqual(vector_store.count_source_rows("doc3.pdf"), 3)
+        self.assertFalse(vector_store.is_file_indexed("doc0.pdf"))
+        self.assertEqual(len(vector_store.search_vectors([1.0, 0.0, 0.0, 0.0], limit=30)), 21)
+        self.assertTrue(vector_store.delete_document_by_source("doc3.pdf"))
+        self.assertEqual(table_health()["rows"], 18)
+
+    def test_optimize_keeps_lexical_index(self):
+        add_documents(8)
+        vector_store.delete_document_by_source("doc0.pdf")
+        index = vector_store.get_lexical_index()
+
+        optimize_tables(force=True, keep_hours=0)
+        with patch.object(vector_store, "LexicalIndex", side_effect=AssertionError("rebuilt")):
+            self.assertIs(vector_store.get_lexical_index(), index)
+            self.assertTrue(vector_store.search_lexical("doc3"))
+        self.assertEqual(vector_store.search_lexical("doc0"), [])
+
+    def test_background_thread_waits_for_idle(self):
+        add_documents(8)
+        maintenance = MaintenanceThread(check_seconds=0.05, idle_seconds=0.5).start()
+        try:
+            deadline = time.monotonic() + 0.4
+            while time.monotonic() < deadline:
+                vector_store.search_vectors([1.0, 0.0, 0.0, 0.0])  # keeps the store busy
+                time.sleep(0.05)
+            self.assertEqual(maintenance.runs, 0)
+
+            deadline = time.monotonic() + 5
+            while maintenance.runs == 0 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(maintenance.runs, 1)
+            self.assertEqual(table_health()["fragments"], 1)
+        finally:
+            maintenance.stop()
+            maintenance.join(2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+import os
+import shutil
+import unittest
+from unittest.mock import MagicMock, patch
+
+import fitz
+
+import pipeline.ingest as ingest
+import pipeline.vector_store as vector_store
+import pipeline.cache as query_cache
+import pipeline.rag_engine as rag_engine
+from pipeline.ingest import ingest_files, remove_document
+from tests.isolation import IngestTestCase
+
+def make_pdf(path, text):
+    doc = fitz.open()
+    page = doc.new_page()
+    # Long enough to have a text layer (no OCR fallback)
+    page.insert_text((50, 72), text + " Hacettepe Üniversitesi yönerge metni.")
+    doc.save(path)
+    doc.close()
+
+class TestContentHashIngestion(IngestTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.docs = os.path.join(self.tmp, "belgeler")
+        os.makedirs(self.docs)
+        self.answers = query_cache.QueryCache(cache_dir=os.path.join(self.tmp, "cache"), semantic_max_entries=0)
+        self.start_patches(
+            patch.object(query_cache, "_cache_instance", self.answers),
+            patch.object(query_cache, "ENABLE_CACHE", True),
+        )
+
+    def pdf(self, name, text):
+        path = os.path.join(self.docs, name)
+        make_pdf(path, text)
+        return path
+
+    def status(self, path):
+        return ingest_files([path])[0]["status"]
+
+    def embed_requests(self):
+        return sum(1 for p, _ in self.server.requests if p == "/api/embed")
+
+    def test_unchanged_file_costs_no_hash_and_no_query(self):
+        path = self.pdf("a.pdf", "Madde 1 - Birinci metin.")
+        self.assertEqual(self.status(path), "indexed")
+
+        with patch.object(ingest, "file_sha256") as mock_hash, \
+             patch.object(ingest, "is_file_indexed") as mock_query:
+            self.assertEqual(self.status(path), "skipped")
+            mock_hash.assert_not_called()
+            mock_query.assert_not_called()
+
+    def test_edited_file_is_reindexed(self):
+        path = self.pdf("a.pdf", "Madde 1 - Birinci metin.")
+        ingest_files([path])
+
+        make_pdf(path, "Madde 1 - Değiştirilmiş metin. Madde 2 - Yeni madde.")
+        os.utime(path, ns=(1, 1))  # guarantee a different mtime
+        self.assertEqual(self.status(path), "indexed")
+
+        self.assertEqual(vector_store.count_source_rows("a.pdf"), 2)
+        self.assertEqual(self.registry.get("a.pdf")["chunks"], 2)
+
+    def test_reindex_only_embeds_changed_chunks(self):
+        path = self.pdf("a.pdf", "Madde 1 - Değişmeyen madde. Madde 2 - Eski metin.")
+        ingest_files([path])
+
+        make_pdf(path, "Madde 1 - Değişmeyen madde. Madde 2 - Yeni metin.")
+        os.utime(path, ns=(1, 1))
+        ingest_files([path])
+
+        self.assertEqual(self.server.requests[-1], ("/api/embed", 1))
+        self.assertEqual(vector_store.count_source_rows("a.pdf"), 2)
+
+    def test_touched_but_identical_file_is_skipped(self):
+        path = self.pdf("a.pdf", "Madde 1 - Birinci metin.")
+        ingest_files([path])
+        os.utime(path, ns=(5, 5))
+
+        self.assertEqual(self.status(path), "skipped")
+        self.assertEqual(self.registry.get("a.pdf")["mtime_ns"], 5)
+
+    def test_renamed_file_is_relinked_without_embedding(self):
+        path = self.pdf("old.pdf", "Madde 1 - Taşınan belge.")
+        ingest_files([path])
+        requests_before = self.embed_requests()
+
+        new_path = os.path.join(self.docs, "new.pdf")
+        os.rename(path, new_path)
+        self.assertEqual(self.status(new_path), "relinked")
+
+        self.assertEqual(self.embed_requests(), requests_before)
+        self.assertEqual(vector_store.count_source_rows("new.pdf"), 1)
+        self.assertEqual(vector_store.count_source_rows("old.pdf"), 0)
+        self.assertIsNone(self.registry.get("old.pdf"))
+
+    def test_copied_file_is_relinked_as_copy(self):
+        path = self.pdf("a.pdf", "Madde 1 - Kopyalanan belge.")
+        ingest_files([path])
+        requests_before = self.embed_requests()
+
+        copy_path = os.path.join(self.docs, "a_kopya.pdf")
+        shutil.copy(path, copy_path)
+        self.assertEqual(self.status(copy_path), "relinked")
+
+        self.assertEqual(self.embed_requests(), requests_before)
+        self.assertEqual(vector_store.count_source_rows("a.pdf"), 1)
+        self.assertEqual(vector_store.count_source_rows("a_kopya.pdf"), 1)
+
+    def test_copy_outside_docs_dir_is_relinked_as_copy(self):
+        outside = os.path.join(self.tmp, "indirilenler")
+        os.makedirs(outside)
+        path = os.path.join(outside, "a.pdf")
+        make_pdf(path, "Madde 1 - Klasör dışındaki belge.")
+        ingest_files([path])
+
+        copy_path = os.path.join(outside, "a_kopya.pdf")
+        shutil.copy(path, copy_path)
+        self.assertEqual(self.status(copy_path), "relinked")
+
+        self.assertEqual(vector_store.count_source_rows("a.pdf"), 1)
+        self.assertEqual(vector_store.count_source_rows("a_kopya.pdf"), 1)
+        self.assertIsNotNone(self.registry.get("a.pdf"))
+
+    def test_duplicates_in_one_batch_are_embedded_once(self):
+        path = self.pdf("a.pdf", "Madde 1 - Aynı içerik.")
+        copy_path = os.path.join(self.docs, "b.pdf")
+        shutil.copy(path, copy_path)
+
+        results = ingest_files([path, copy_path])
+
+        self.assertEqual([r["status"] for r in results], ["indexed", "relinked"])
+        self.assertEqual(self.embed_requests(), 1)
+
+    def test_remove_document_forgets_registry_entry(self):
+        path = self.pdf("a.pdf", "Madde 1 - Silinecek belge.")
+        ingest_files([path])
+
+        remove_document("a.pdf")
+        self.assertIsNone(self.registry.get("a.pdf"))
+        self.assertEqual(self.status(path), "indexed")
+
+    def test_cached_answers_follow_document_changes(self):
+        a, b = self.pdf("a.pdf", "Madde 1 - Birinci metin."), self.pdf("b.pdf", "Madde 2 - İkinci metin.")
+        ingest_files([a, b])
+        version = lambda name: self.registry.get(name)["sha256"]
+        self.answers.set("a sorusu", "A", sources={"a.pdf": version("a.pdf")})
+        self.answers.set("b sorusu", "B", sources={"b.pdf": version("b.pdf")})
+        self.answers.set("ab sorusu", "AB", sources={"a.pdf": version("a.pdf"), "b.pdf": version("b.pdf")})
+        self.answers.set("bağlamsız soru", "Yok", sources={})
+
+        make_pdf(a, "Madde 1 - Değiştirilmiş metin.")
+        os.utime(a, ns=(1, 1))
+        ingest_files([a])
+        self.assertEqual([self.answers.get(q) for q in ["a sorusu", "ab sorusu", "bağlamsız soru"]], [None] * 3)
+        self.assertEqual(self.answers.get("b sorusu"), "B")
+
+        os.rename(b, os.path.join(self.docs, "c.pdf"))
+        ingest_files([os.path.join(self.docs, "c.pdf")])
+        self.assertIsNone(self.answers.get("b sorusu"))
+        self.answers.set("c sorusu", "C", sources={"c.pdf": version("c.pdf")})
+        self.assertEqual(ingest_files([a])[0]["status"], "skipped")
+        self.assertEqual(self.answers.get("c sorusu"), "C")
+        remove_document("c.pdf")
+        self.assertIsNone(self.answers.get("c sorusu"))
+
+    def test_answer_is_not_cached_when_its_document_changes_during_generation(self):
+        path = self.pdf("a.pdf", "Madde 1 - Birinci metin.")
+        ingest_files([path])
+
+        def reindex_while_generating(*args, **kwargs):
+            make_pdf(path, "Madde 1 - Değiştirilmiş metin.")
+            os.utime(path, ns=(1, 1))
+            ingest_files([path])
+            return "Birinci metin."
+
+        client = MagicMock()
+        client.post_json.side_effect = reindex_while_generating
+        with patch.object(rag_engine, "ENABLE_CACHE", True), \
+             patch.object(rag_engine, "get_ollama_client", return_value=client):
+            self.assertIn("a.pdf", rag_engine.generate_answer("Madde 1 nedir?"))
+            self.assertIsNone(self.answers.get("Madde 1 nedir?"))
+
+            client.post_json.side_effect = None
+            client.post_json.return_value = "Değiştirilmiş metin."
+            rag_engine.generate_answer("Madde 1 nedir?")
+            self.assertIn("Değiştirilmiş metin.", self.answers.get("Madde 1 nedir?"))
+
+    def test_answer_is_not_cached_when_the_registry_moved_on(self):
+        path = self.pdf("a.pdf", "Madde 1 - Birinci metin.")
+        ingest_files([path])
+        snapshot = {"a.pdf": self.registry.get("a.pdf")["sha256"]}
+        since = self.answers.invalidation_mark()
+
+        self.registry.register("a.pdf", "yeni-hash", os.stat(path), 1)  # not invalidated yet
+        self.answers.set("a sorusu", "A", sources=snapshot, since=since)
+        self.assertIsNone(self.answers.get("a sorusu"))
+
+    def test_rows_indexed_before_registry_are_adopted(self):
+        path = self.pdf("legacy.pdf", "Madde 1 - Eski belge.")
+        ingest_files([path])
+        self.registry.remove("legacy.pdf")
+        requests_before = self.embed_requests()
+
+        self.assertEqual(self.status(path), "skipped")
+        self.assertEqual(self.embed_requests(), requests_before)
+        self.assertEqual(self.registry.get("legacy.pdf")["chunks"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
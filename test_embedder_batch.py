@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import patch
+
+import pipeline.embedder as embedder
+import pipeline.ollama_client as ollama_client
+from mock_ollama import MockOllamaServer, fake_embedding
+
+class TestBatchedEmbeddings(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockOllamaServer(dim=8)
+        self.server.start()
+        self.patches = [
+            patch.object(embedder, "OLLAMA_BASE_URL", self.server.base_url),
+            # Serial client without backoff waits: deterministic request order
+            patch.object(ollama_client, "_client_instance", ollama_client.OllamaClient(max_concurrency=1, backoff_base=0)),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.server.stop()
+
+    def test_order_and_batching(self):
+        """Embeddings come back in input order, one request per sub-batch."""
+        texts = [f"chunk {i}" for i in range(10)]
+        result = embedder.get_embeddings(texts, batch_size=4)
+
+        self.assertEqual(result, [fake_embedding(t, 8) for t in texts])
+        self.assertEqual(self.server.requests, [("/api/embed", 4), ("/api/embed", 4), ("/api/embed", 2)])
+
+    def test_only_failed_batch_is_retried(self):
+        """A failing sub-batch is resent alone; finished batches are not repeated."""
+        texts = [f"chunk {i}" for i in range(6)]
+        self.server.fail_next["/api/embed"] = 1
+        result = embedder.get_embeddings(texts, batch_size=3)
+
+        self.assertEqual(result, [fake_embedding(t, 8) for t in texts])
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_exhausted_retries_leave_gaps(self):
+        """After MAX_RETRIES failures the batch positions are None, the rest are kept."""
+        texts = [f"chunk {i}" for i in range(4)]
+        self.server.fail_next["/api/embed"] = ollama_client.MAX_RETRIES
+        result = embedder.get_embeddings(texts, batch_size=2)
+
+        self.assertEqual(result[:2], [None, None])
+        self.assertEqual(result[2:], [fake_embedding(t, 8) for t in texts[2:]])
+
+    def test_legacy_endpoint_fallback(self):
+        """Servers without /api/embed fall back to /api/embeddings."""
+        self.server.legacy_only = True
+        texts = ["a", "b"]
+        result = embedder.get_embeddings(texts, batch_size=8)
+
+        self.assertEqual(result, [fake_embedding(t, 8) for t in texts])
+
+if __name__ == '__main__':
+    unittest.main()
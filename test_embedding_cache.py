@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pipeline.rag_engine as rag_engine
+from pipeline.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from tests.isolation import IsolatedTestCase
+
+def fake_embed(texts):
+    return [[float(len(t)), 0.5, -1.0] for t in texts]
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "emb.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_only_misses_are_computed(self):
+        cache = EmbeddingCache(self.path, model="m")
+        compute = MagicMock(side_effect=fake_embed)
+
+        first = cache.get_or_compute(["a", "bb", "a"], compute)
+        compute.assert_called_once_with(["a", "bb"])
+
+        compute.reset_mock()
+        second = cache.get_or_compute(["bb", "ccc", "a"], compute)
+        compute.assert_called_once_with(["ccc"])
+
+        self.assertEqual(first, fake_embed(["a", "bb", "a"]))
+        self.assertEqual(second, fake_embed(["bb", "ccc", "a"]))
+
+    def test_normalized_text_shares_entry(self):
+        cache = EmbeddingCache(self.path, model="m")
+        cache.put_many(["Madde 1  -  Amaç\n"], [[1.0, 2.0]])
+        self.assertEqual(cache.get_many(["Madde 1 - Amaç"]), [[1.0, 2.0]])
+
+    def test_model_is_part_of_key(self):
+        EmbeddingCache(self.path, model="m1").put_many(["metin"], [[1.0]])
+        self.assertEqual(EmbeddingCache(self.path, model="m2").get_many(["metin"]), [None])
+
+    def test_persistent_hit_rate_stats(self):
+        cache = EmbeddingCache(self.path, model="m")
+        cache.get_or_compute(["a", "b"], fake_embed)
+        cache.get_or_compute(["a", "b", "c"], fake_embed)
+
+        stats = EmbeddingCache(self.path, model="m").stats()
+        self.assertEqual(stats['entries'], 3)
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 3)
+        self.assertAlmostEqual(stats['hit_rate'], 0.4)
+
+    def test_size_bound_evicts_least_recently_used(self):
+        cache = EmbeddingCache(self.path, model="m", max_mb=1)
+        vector = [0.0] * 1024  # 4 KB per entry -> ~256 entries per MB
+        texts = [f"chunk {i}" for i in range(300)]
+        cache.put_many(texts[:10], [vector] * 10)
+        for start in range(10, 300, 10):
+            time.sleep(0.002)
+            cache.get_many(texts[:5])  # keep the first five hot
+            cache.put_many(texts[start:start + 10], [vector] * 10)
+
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], 1024 * 1024)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertNotIn(None, cache.get_many(texts[:5]))
+        self.assertIn(None, cache.get_many(texts[5:10]))
+
+    def test_reads_are_buffered_until_flush(self):
+        cache = EmbeddingCache(self.path, model="m")
+        cache.put_many(["a"], [[1.0]])
+        changes = cache.store._conn.total_changes
+        cache.get_many(["a", "b"])
+        self.assertEqual(cache.store._conn.total_changes, changes)
+        self.assertEqual(cache.stats()['hits'], 1)  # buffered counts are reported
+
+        cache.store.close()
+        stats = EmbeddingCache(self.path, model="m").stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+class TestQueryEmbeddingCache(IsolatedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp, "queries.sqlite")
+
+    def test_lru_bound_and_counters(self):
+        cache = QueryEmbeddingCache(max_entries=2, model="m")
+        compute = MagicMock(side_effect=lambda q: [float(len(q)), 1.0])
+
+        self.assertEqual(cache.get_or_compute("Hacettepe ne zaman kuruldu?", compute), [27.0, 1.0])
+        self.assertEqual(cache.get_or_compute("  Hacettepe ne   zaman kuruldu? ", compute), [27.0, 1.0])
+        cache.get_or_compute("ÇAP", compute)
+        cache.get_or_compute("Hacettepe ne zaman kuruldu?", compute)  # refreshes its LRU position
+        cache.get_or_compute("Yandal", compute)                        # evicts "ÇAP"
+        self.assertEqual(compute.call_count, 3)
+        self.assertIsNone(cache.get("ÇAP"))
+
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses'], stats['evictions']), (2, 2, 4, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 6)
+
+    def test_failures_are_not_cached(self):
+        cache = QueryEmbeddingCache(model="m")
+        compute = MagicMock(return_value=None)
+        self.assertIsNone(cache.get_or_compute("soru", compute))
+        self.assertIsNone(cache.get_or_compute("soru", compute))
+        self.assertEqual(compute.call_count, 2)
+
+    def test_persistent_tier_survives_restart(self):
+        QueryEmbeddingCache(model="m", persistent=EmbeddingCache(self.path, model="m")).put("soru", [0.5, 0.25])
+
+        cache = QueryEmbeddingCache(model="m", persistent=EmbeddingCache(self.path, model="m"))
+        self.assertEqual(cache.get_or_compute("soru", MagicMock(side_effect=AssertionError)), [0.5, 0.25])
+        self.assertEqual(cache.get("soru"), [0.5, 0.25])
+        stats = cache.stats()
+        self.assertEqual((stats['disk_hits'], stats['hits'], stats['disk']['entries']), (1, 1, 1))
+        self.assertIsNone(QueryEmbeddingCache(model="m2", persistent=EmbeddingCache(self.path, model="m2")).get("soru"))
+
+    def test_retrieve_context_embeds_repeated_query_once(self):
+        with patch.object(rag_engine, "get_embedding", return_value=[1.0, 0.0]) as get_embedding:
+            rag_engine.retrieve_context("Tıp Fakültesi nerede?")
+            rag_engine.retrieve_context("tıp fakültesi  nerede?")
+            rag_engine.retrieve_context("Tıp Fakültesi nerede?")
+        self.assertEqual(get_embedding.call_count, 2)  # normalization keeps case
+
+if __name__ == '__main__':
+    unittest.main()
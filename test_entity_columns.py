@@ -0,0 +1,51 @@
+import json
+import unittest
+from unittest.mock import patch
+
+import pipeline.vector_store as vector_store
+import pipeline.rag_engine as rag_engine
+from pipeline.vector_store import make_record_batch, entity_filter
+from pipeline.entity_extractor import ENTITY_TYPES, extract_entities, normalize_entities
+from tests.isolation import IsolatedTestCase
+
+CHUNKS = [
+    ("Aşı Enstitüsü 2018 yılında kurulmuştur.", [1.0, 0.0]),
+    ("Tıp Fakültesi Sıhhiye Yerleşkesi'nde yer alır. TIP FAKÜLTESİ hastaneleri", [0.9, 0.1]),
+    ("Madde 12 - Sınavlar Beytepe'de yapılır.", [0.0, 1.0]),
+]
+
+class TestEntityColumns(IsolatedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        texts = [text for text, _ in CHUNKS]
+        vector_store.add_record_batch(make_record_batch(
+            texts, [vector for _, vector in CHUNKS], "doc.pdf", [extract_entities(t) for t in texts]))
+        vector_store.flush_writes()
+
+    def test_normalized_list_columns(self):
+        table = vector_store.get_store().table("vectors")
+        self.assertNotIn("metadata", table.schema.names)
+        rows = table.search().select(["faculties", "locations"]).to_list()
+        self.assertEqual(rows[1]["faculties"], ["tıp fakültesi"])
+        self.assertEqual(rows[0]["faculties"], [])
+        self.assertEqual(normalize_entities({"institutes": ["AŞI Enstitüsü", "Aşı  Enstitüsü"]})["institutes"],
+                         ["aşı enstitüsü"])
+        self.assertEqual(vector_store.entity_values("faculties"), {"tıp fakültesi": 1})
+
+    def test_entity_filter_runs_in_lancedb(self):
+        where = entity_filter({"madde_numbers": ["12"], "institutes": ["AŞI ENSTİTÜSÜ"]})
+        results = vector_store.search_vectors([1.0, 0.0], limit=5, where=where, columns=["text"])
+        self.assertEqual([r["text"] for r in results], [CHUNKS[0][0], CHUNKS[2][0]])
+        self.assertIsNone(entity_filter({"faculties": []}))
+        self.assertEqual(len(vector_store.search_vectors([1.0, 0.0], where=entity_filter({"dates": ["O'Neil"]}))), 0)
+
+    def test_rerank_reads_columns(self):
+        with patch.object(rag_engine, "get_embedding", return_value=[0.95, 0.05]), \
+             patch.object(json, "loads", side_effect=AssertionError("json parsing")):
+            items = rag_engine.retrieve_context("Tıp Fakültesi nerede?")
+        self.assertEqual(items[0]["text"], CHUNKS[1][0])
+        self.assertGreater(items[0]["entity_score"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
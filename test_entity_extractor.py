@@ -0,0 +1,92 @@
+import random
+import re
+import unittest
+
+from pipeline.chunker import chunk_text
+from pipeline.entity_extractor import ENTITY_TYPES, extract_entities, extract_entities_batch
+
+# Eski extract_entities: her pattern için metnin tamamında re.findall (golden referans)
+REFERENCE = [
+    ("universities", [r'Hacettepe\s+Üniversitesi', r'Hacettepe', r'H\.Ü\.', r'HÜ'], re.IGNORECASE, False),
+    ("faculties", [r'((?:\w+\s+){0,3}Fakültesi)'], 0, True),
+    ("departments", [r'((?:\w+\s+){0,3}Mühendisliği)', r'((?:\w+\s+){0,3}Bölümü)',
+                     r'((?:\w+\s+){0,3}Anabilim Dalı)'], 0, True),
+    ("dates", [r'\b(19\d{2}|20\d{2})\b', r'\b(\d{1,2}[./]\d{1,2}[./]\d{2,4})\b',
+               r'\b(\d{1,2}\s+(?:Ocak|Şubat|Mart|Nisan|Mayıs|Haziran|Temmuz|Ağustos|Eylül|Ekim|Kasım|Aralık)\s+\d{4})\b'],
+     re.IGNORECASE, False),
+    ("locations", [r'\b(Ankara|İstanbul|İzmir|Bursa|Antalya)\b', r'\b(Sıhhiye|Beytepe|Keçiören|Polatlı)\b',
+                   r'\b(Türkiye|Turkey)\b', r'\b(Kampüs|Yerleşke)\b',
+                   r'(Beytepe Yerleşkesi|Sıhhiye Yerleşkesi|Polatlı Yerleşkesi)'], re.IGNORECASE, False),
+    ("madde_numbers", [r'Madde\s+(\d+)'], re.IGNORECASE, False),
+    ("programs", [r'((?:\w+\s+){0,4}Programı)', r'((?:\w+\s+){0,4}Program)',
+                  r'(Lisans Programı|Yüksek Lisans Programı|Doktora Programı)',
+                  r'(Önlisans Programı|Lisansüstü Program)'], 0, True),
+    ("courses", [r'((?:\w+\s+){0,4}Dersi)', r'((?:\w+\s+){0,4}Kursu)'], 0, True),
+    ("institutes", [r'((?:\w+\s+){0,4}Enstitüsü)',
+                    r'(Aşı Enstitüsü|Bilişim Enstitüsü|Kanser Enstitüsü|Nükleer Bilimler Enstitüsü)',
+                    r'(Nüfus Etütleri Enstitüsü|Sağlık Bilimleri Enstitüsü|Fen Bilimleri Enstitüsü)',
+                    r'(Sosyal Bilimler Enstitüsü|Eğitim Bilimleri Enstitüsü|Türkiyat Araştırmaları Enstitüsü)'], 0, True),
+    ("research_centers", [r'\b(HATAM|HÜNİTEK|HÜNİKAL|IONOLAB|PDRMER)\b',
+                          r'(İleri Teknolojiler Uygulama ve Araştırma Merkezi)',
+                          r'(HIV-AIDS Tedavi ve Araştırma Merkezi)', r'(İlaç ve Kozmetik Ar-Ge Laboratuvarı)',
+                          r'(Nörolojik ve Psikiyatrik Uygulama Merkezi)', r'(Hareket Analizi ve Podiatri Merkezi)',
+                          r'((?:\w+\s+){0,6}(?:Merkezi|Uygulama ve Araştırma Merkezi|Araştırma Merkezi))',
+                          r'(Teknokent|Hacettepe Teknokent)', r'((?:\w+\s+){0,4}Laboratuvarı)'], 0, True),
+]
+
+def reference_extract(text):
+    entities = {entity_type: [] for entity_type in ENTITY_TYPES}
+    for entity_type, patterns, flags, stripped in REFERENCE:
+        for pattern in patterns:
+            matches = re.findall(pattern, text, flags)
+            if stripped:
+                matches = [m.strip() for m in matches if len(m.strip()) > 5]
+            entities[entity_type].extend(matches)
+    return {key: list(set(values)) for key, values in entities.items()}
+
+# Zor durumlar: büyük/küçük harf ve Türkçe I/İ, kelime içindeki sonekler, art arda sonekler,
+# noktalama, alt çizgi, farklı boşluklar, Unicode rakamlar
+WORDS = [
+    "Tıp", "Fakültesi", "FAKÜLTESİ", "XFakültesi", "Fakültesinde", "Bilgisayar", "Mühendisliği", "Bölümü",
+    "Anabilim Dalı", "Programı", "Program", "Programlar", "Lisans", "Yüksek", "Doktora", "Önlisans",
+    "Lisansüstü", "Dersi", "Kursu", "Enstitüsü", "Aşı", "Sağlık", "Bilimleri", "Uygulama", "ve", "Araştırma",
+    "Merkezi", "Laboratuvarı", "İlaç", "Kozmetik", "Ar-Ge", "HÜNİTEK", "hünitek", "HATAM", "HÜ", "hü", "H.Ü.",
+    "HACETTEPE", "Hacettepe", "hacettepe", "Üniversitesi", "ÜNİVERSİTESİ", "Teknokent", "İstanbul", "ISTANBUL",
+    "ıstanbul", "İZMİR", "SIHHİYE", "Sihhiye", "Beytepe", "Yerleşkesi", "Yerleşke", "KAMPÜS", "Türkiye", "Turkey",
+    "Madde", "MADDE", "12", "1967", "2019'da", "12/05/2020", "1.2.99", "3", "Mart", "ağustos", "a1999", "_2000",
+    "ab_cd", "Yapay", "Zeka", "HIV-AIDS", "Tedavi", "İleri", "Teknolojiler", "PDRMER", "ſıhhiye", "²", "١٩٩٩",
+]
+SEPARATORS = [" ", "  ", "\n", "\t", ", ", ". ", "'", "-", "", " \n ", "("]
+
+def golden_corpus():
+    texts = []
+    for path, encoding in [("hybrid_pdf_full.txt", "utf-8"), ("hybrid_pdf_content.txt", "utf-16")]:
+        with open(path, encoding=encoding) as f:
+            texts.extend(chunk_text(f.read()))
+    rnd = random.Random(0)
+    for _ in range(1500):
+        texts.append("".join(rnd.choice(WORDS) + rnd.choice(SEPARATORS) for _ in range(rnd.randint(1, 40))))
+    return texts
+
+def canonical(entities):
+    """Entity values as sorted lists (extractors return list(set(...)), in no fixed order)"""
+    return {key: sorted(values) for key, values in entities.items()}
+
+class TestEntityExtractor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = golden_corpus()
+
+    def test_identical_to_reference(self):
+        for text in self.corpus + ["", "Yapay Zeka Mühendisliği Programı Mühendislik Fakültesinde yer alır."]:
+            self.assertEqual(canonical(extract_entities(text)), canonical(reference_extract(text)), text[:200])
+
+    def test_batch(self):
+        texts = self.corpus[:200]
+        self.assertEqual([canonical(e) for e in extract_entities_batch(texts)],
+                         [canonical(extract_entities(text)) for text in texts])
+        self.assertEqual(extract_entities_batch([]), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pyarrow as pa
+
+import pipeline.vector_store as vector_store
+import pipeline.rag_engine as rag_engine
+from pipeline.vector_store import (VectorStore, EntityIndex, ENTITY_INDEX_SCHEMA,
+                                   make_record_batch, get_entity_index, rebuild_entity_index)
+from tests.isolation import IsolatedTestCase
+
+def add(source, texts, vectors, entities):
+    vector_store.add_record_batch(make_record_batch(texts, vectors, source, entities))
+    vector_store.flush_writes()
+
+def hits(entities):
+    return {chunk_id for chunk_id, _ in get_entity_index().lookup(entities)}
+
+def ids_of(source):
+    table = vector_store.get_store().table("vectors")
+    return {r["id"] for r in table.search().where(f"source = '{source}'").select(["id"]).to_list()}
+
+class TestEntityIndex(IsolatedTestCase):
+
+    def test_incremental_updates(self):
+        add("a.pdf", ["a0", "a1"], [[1.0, 0.0], [0.0, 1.0]],
+            [{"institutes": ["Aşı Enstitüsü"]}, {"madde_numbers": ["12"]}])
+        add("b.pdf", ["b0"], [[1.0, 1.0]], [{"institutes": ["AŞI ENSTİTÜSÜ"], "madde_numbers": ["12"]}])
+        a, b = ids_of("a.pdf"), ids_of("b.pdf")
+        query = {"institutes": ["aşı enstitüsü"], "madde_numbers": ["12"]}
+        self.assertEqual(hits(query), a | b)
+        self.assertEqual(get_entity_index().lookup(query)[0], (next(iter(b)), 2))
+
+        self.assertEqual(vector_store.copy_source("a.pdf", "c.pdf"), 2)
+        c = ids_of("c.pdf")
+        self.assertEqual(hits(query), a | b | c)
+        vector_store.rename_source("a.pdf", "d.pdf")
+        self.assertTrue(vector_store.delete_document_by_source("d.pdf"))
+        self.assertEqual(hits(query), b | c)
+        self.assertTrue(vector_store.delete_document_by_source("b.pdf"))
+        madde = hits({"madde_numbers": ["12"]})
+        self.assertEqual((len(madde), madde <= c), (1, True))
+
+        # Persisted, and the same as a rebuild from the entity columns
+        with patch.object(vector_store, "_store_instance", VectorStore(self.uri)):
+            self.assertEqual(hits(query), c)
+            self.assertEqual(rebuild_entity_index().lookup(query), get_entity_index().lookup(query))
+
+    def test_backfilled_for_existing_tables(self):
+        add("a.pdf", ["a0"], [[1.0, 0.0]], [{"faculties": ["Tıp Fakültesi"]}])
+        store = vector_store.get_store()
+        store.db.drop_table(vector_store.entity_index_name())
+
+        with patch.object(vector_store, "_store_instance", VectorStore(self.uri)):
+            self.assertEqual(hits({"faculties": ["tıp fakültesi"]}), ids_of("a.pdf"))
+            self.assertIsNotNone(vector_store.get_store().table(vector_store.entity_index_name()))
+
+    def test_candidates_outside_vector_top_k(self):
+        rnd = np.random.default_rng(0)
+        near = np.array([1.0, 0.0, 0.0]) + 0.05 * rnd.normal(size=(30, 3))
+        add("yakin.pdf", [f"yakın {i}" for i in range(30)], near, None)
+        add("enstitu.pdf", ["Aşı Enstitüsü 2018 yılında kurulmuştur."], [[0.0, 1.0, 0.0]],
+            [{"institutes": ["Aşı Enstitüsü"]}])
+
+        with patch.object(rag_engine, "get_embedding", return_value=[1.0, 0.0, 0.0]):
+            self.assertNotIn("enstitu.pdf", [r["source"] for r in vector_store.search_vectors([1.0, 0.0, 0.0], limit=12)])
+            items = rag_engine.retrieve_context("Aşı Enstitüsü ne zaman kuruldu?")
+        self.assertEqual(items[0]["source"], "enstitu.pdf")
+
+    def test_lookup_is_sub_millisecond(self):
+        rnd = np.random.default_rng(0)
+        n = 50000
+        postings = pa.Table.from_arrays([
+            pa.array(["madde_numbers"] * n), pa.array([str(v) for v in rnd.integers(0, 2000, n)]),
+            pa.array([f"id{i}" for i in range(n)]), pa.array([f"doc{i % 300}.pdf" for i in range(n)])
+        ], schema=ENTITY_INDEX_SCHEMA)
+        index = EntityIndex(postings)
+        query = {"madde_numbers": ["12", "7", "1999"], "institutes": ["aşı enstitüsü"]}
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            index.lookup(query, 512)
+        self.assertLess((time.perf_counter() - start) / 1000, 0.001)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
 import os
+import shutil
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 import pytesseract
+import pipeline.ocr_cache as ocr_cache
 from pipeline.pdf_loader import load_pdf
 
 # Mock clean up of log file
@@ -10,6 +13,22 @@ if os.path.exists(LOG_FILE):
     os.remove(LOG_FILE)
 
 class TestPDFLoaderErrorHandling(unittest.TestCase):
+
+    def setUp(self):
+        # Keep the OCR cache out of the repository's cache/ directory
+        self.tmp = tempfile.mkdtemp()
+        self.cache_patch = patch.object(ocr_cache, "_cache_instance", ocr_cache.OCRCache(os.path.join(self.tmp, "ocr.sqlite")))
+        self.cache_patch.start()
+
+    def tearDown(self):
+        self.cache_patch.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        # load_pdf logs to the working directory; do not leave the log behind
+        if os.path.exists(LOG_FILE):
+            os.remove(LOG_FILE)
     
     @patch('pipeline.pdf_loader.fitz.open')
     def test_tesseract_not_found_error(self, mock_fitz_open):
@@ -23,17 +42,17 @@ class TestPDFLoaderErrorHandling(unittest.TestCase):
         mock_page = MagicMock()
         mock_page.get_text.return_value = "   " 
         
-        # Mock pixmap and bytes for Image.open
+        # Mock pixmap and raw samples for Image.frombytes
         mock_pix = MagicMock()
-        mock_pix.tobytes.return_value = b'fake_image_data'
+        mock_pix.samples = b'fake_image_data'
         mock_page.get_pixmap.return_value = mock_pix
         
         mock_doc.__len__.return_value = 1
         mock_doc.load_page.return_value = mock_page
         mock_fitz_open.return_value = mock_doc
         
-        # Mock PIL.Image.open so we don't need real image bytes
-        with patch('pipeline.pdf_loader.Image.open') as mock_img_open:
+        # Mock PIL.Image.frombytes so we don't need real pixel data
+        with patch('pipeline.pdf_loader.Image.frombytes') as mock_img_open:
             mock_img_open.return_value = MagicMock()
             
             # Mock pytesseract to raise TesseractNotFoundError
@@ -0,0 +1,111 @@
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+import pipeline.vector_store as vector_store
+import pipeline.rag_engine as rag_engine
+from pipeline.vector_store import VectorStore, VectorWriter, make_record_batch
+from pipeline.lexical_index import LexicalIndex, tokenize, tokenize_texts
+from tests.isolation import IsolatedTestCase
+
+SAMPLES = [
+    "HACETTEPE ÜNİVERSİTESİ ÇİFT ANADAL PROGRAMI (ÇAP) YÖNERGESİ",
+    "Madde 12 - (1) Öğrenci, ÇAP'a başvurusunu Enstitüsünde yapar; IŞIK ve ılık.",
+    "HÜNİTEK, İleri Teknolojiler Uygulama ve Araştırma Merkezi'dir. 2019'da ² ½ x_y é",
+    "", "   ", "Beytepe'de 10.000 m² alan",
+]
+
+class TestTokenizer(unittest.TestCase):
+
+    def test_turkish_terms(self):
+        self.assertEqual(tokenize("HÜNİTEK ÇAP Madde 12 Enstitüsünde IŞIK"),
+                         ["hunit", "cap", "madde", "12", "ensti", "isik"])
+        self.assertEqual(tokenize("hunitek cap"), tokenize("HÜNİTEK ÇAP"))
+
+    def test_bulk_tokenizer_matches(self):
+        self.assertEqual(tokenize_texts(SAMPLES).to_pylist(), [tokenize(text) for text in SAMPLES])
+
+class TestLexicalIndex(unittest.TestCase):
+
+    def test_bm25_ranking_and_deletes(self):
+        index = LexicalIndex()
+        index.add(["1", "2", "3"], ["a.pdf", "a.pdf", "b.pdf"], [
+            "Çift anadal programına başvuru koşulları",
+            "ÇAP başvuruları Ekim ayında alınır. ÇAP kontenjanı sınırlıdır.",
+            "Yandal programı başvuruları",
+        ])
+        # "basvu" matches 1 and 3; the shorter chunk wins by length normalization
+        self.assertEqual([chunk_id for chunk_id, _ in index.search("cap basvurusu")], ["2", "3", "1"])
+        self.assertEqual(index.search("yok"), [])
+
+        index.rename_source("a.pdf", "c.pdf")
+        index.remove_source("c.pdf")  # two of three deleted -> compacted
+        self.assertEqual((len(index), [chunk_id for chunk_id, _ in index.search("başvuru")]), (1, ["3"]))
+        index.add(["4"], ["d.pdf"], ["ÇAP"])
+        self.assertEqual(index.search("çap")[0][0], "4")
+
+    def test_search_time(self):
+        rnd = np.random.default_rng(0)
+        words = np.array([f"kelime{i}" for i in range(30000)] + ["madde", "enstitüsü", "çap", "12"])
+        texts = [" ".join(rnd.choice(words, 100)) for _ in range(20000)]
+        index = LexicalIndex()
+        index.add([str(i) for i in range(len(texts))], ["doc.pdf"] * len(texts), texts)
+
+        start = time.perf_counter()
+        for _ in range(50):
+            self.assertEqual(len(index.search("Madde 12 Enstitüsü ÇAP kelime7", 12)), 12)
+        self.assertLess((time.perf_counter() - start) / 50, 0.005)
+
+class TestLexicalRetrieval(IsolatedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        rnd = np.random.default_rng(0)
+        near = np.array([1.0, 0.0, 0.0]) + 0.05 * rnd.normal(size=(30, 3))
+        self.add("yakin.pdf", [f"yakın metin {i}" for i in range(30)], near)
+        self.add("cap.pdf", ["ÇAP başvuruları Ekim ayında alınır."], [[0.0, 1.0, 0.0]])
+
+    def add(self, source, texts, vectors):
+        vector_store.add_record_batch(make_record_batch(texts, vectors, source))
+        vector_store.flush_writes()
+
+    def test_index_follows_writes(self):
+        self.assertEqual(len(vector_store.search_lexical("çap")), 1)
+        index = vector_store.get_lexical_index()
+
+        self.add("cap2.pdf", ["ÇAP kontenjanları"], [[0.0, 0.0, 1.0]])
+        self.assertEqual(len(vector_store.search_lexical("çap")), 2)
+        vector_store.rename_source("cap2.pdf", "cap3.pdf")
+        self.assertTrue(vector_store.delete_document_by_source("cap.pdf"))
+        self.assertEqual(len(vector_store.search_lexical("çap")), 1)
+        self.assertIs(vector_store.get_lexical_index(), index)  # updated, not rebuilt
+
+        # Another process writes: rebuilt from the table
+        with patch.object(vector_store, "_store_instance", VectorStore(self.uri)), \
+             patch.object(vector_store, "_writer_instance", VectorWriter()):
+            self.add("cap4.pdf", ["ÇAP yönergesi"], [[0.0, 0.0, 1.0]])
+        vector_store.get_store().refresh()
+        self.assertEqual(len(vector_store.search_lexical("çap")), 2)
+        self.assertIsNot(vector_store.get_lexical_index(), index)
+
+    def test_fused_into_retrieve_context(self):
+        query = "ÇAP başvurusu ne zaman?"
+        self.assertNotIn("cap.pdf", [r["source"] for r in vector_store.search_vectors([1.0, 0.0, 0.0], limit=12)])
+        with patch.object(rag_engine, "get_embedding", return_value=[1.0, 0.0, 0.0]):
+            items = rag_engine.retrieve_context(query)
+        self.assertEqual(items[0]["source"], "cap.pdf")
+        self.assertGreater(items[0]["lexical_score"], 0)
+
+        with patch.object(rag_engine, "get_embedding", return_value=[1.0, 0.0, 0.0]), \
+             patch.object(rag_engine, "LEXICAL_SEARCH_ENABLED", False):
+            self.assertNotIn("cap.pdf", [item["source"] for item in rag_engine.retrieve_context(query)])
+
+    def test_reciprocal_rank_fusion(self):
+        fused = rag_engine.reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+        self.assertEqual(sorted(fused, key=fused.get, reverse=True), ["a", "c", "b"])
+        self.assertAlmostEqual(fused["a"], 1 / 61 + 1 / 62)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import fitz
+
+import pipeline.ocr_cache as ocr_cache
+from pipeline.pdf_loader import load_pdf
+
+def fake_ocr(image, lang=None):
+    """Returns the image width so each page's OCR text is identifiable."""
+    # Make wider (earlier) pages slower so completion order != page order
+    time.sleep(max(0, 700 - image.size[0]) / 10000)
+    return f"OCR sayfa genişliği {image.size[0]}"
+
+class TestPageParallelOCR(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.pdf_path = os.path.join(self.tmp, "scan.pdf")
+        doc = fitz.open()
+        # Pages 0, 2, 3, 5 are blank (scanned); 1 and 4 have a text layer
+        for i in range(6):
+            page = doc.new_page(width=500 + i * 20, height=300)
+            if i in (1, 4):
+                page.insert_text((20, 40), f"Madde {i} - Bu sayfada yeterince uzun bir metin katmanı bulunmaktadır.")
+        doc.save(self.pdf_path)
+        doc.close()
+
+        self.cache_patch = patch.object(ocr_cache, "_cache_instance", ocr_cache.OCRCache(os.path.join(self.tmp, "ocr.sqlite")))
+        self.cache_patch.start()
+
+    def tearDown(self):
+        self.cache_patch.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def expected_pages(self):
+        return ["OCR sayfa genişliği 500", None, "OCR sayfa genişliği 540",
+                "OCR sayfa genişliği 560", None, "OCR sayfa genişliği 600"]
+
+    def check_order(self, text):
+        pages = text.split("\n")
+        for expected in self.expected_pages():
+            if expected:
+                self.assertIn(expected, pages)
+        positions = [text.index(e) for e in self.expected_pages() if e]
+        self.assertEqual(positions, sorted(positions))
+        self.assertLess(text.index("Madde 1"), text.index("OCR sayfa genişliği 540"))
+        self.assertGreater(text.index("Madde 4"), text.index("OCR sayfa genişliği 560"))
+
+    @patch('pipeline.pdf_loader.pytesseract.image_to_string', side_effect=fake_ocr)
+    def test_serial_ocr(self, mock_ocr):
+        stats = {}
+        text = load_pdf(self.pdf_path, ocr_workers=1, stats=stats)
+
+        self.check_order(text)
+        self.assertEqual(sorted(stats["ocr_timings"]), [0, 2, 3, 5])
+        self.assertEqual(mock_ocr.call_count, 4)
+
+    @patch('pipeline.pdf_loader.pytesseract.image_to_string', side_effect=fake_ocr)
+    def test_pooled_ocr_keeps_page_order(self, mock_ocr):
+        """Out-of-order completion on the pool still yields page-ordered text."""
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            with patch('pipeline.pdf_loader.get_ocr_pool', return_value=pool):
+                stats = {}
+                text = load_pdf(self.pdf_path, ocr_workers=3, stats=stats)
+
+        self.check_order(text)
+        self.assertEqual(sorted(stats["ocr_timings"]), [0, 2, 3, 5])
+        self.assertEqual(stats["pages"], 6)
+
+    @patch('pipeline.pdf_loader.pytesseract.image_to_string', side_effect=fake_ocr)
+    def test_dpi_controls_render_size(self, mock_ocr):
+        load_pdf(self.pdf_path, ocr_workers=1, dpi=144)
+        widths = sorted(call.args[0].size[0] for call in mock_ocr.call_args_list)
+        self.assertEqual(widths, [1000, 1080, 1120, 1200])
+
+    @patch('pipeline.pdf_loader.pytesseract.image_to_string', side_effect=fake_ocr)
+    def test_pages_are_ocrd_once(self, mock_ocr):
+        """Re-loading a scanned PDF serves every page from the OCR cache."""
+        first = load_pdf(self.pdf_path, ocr_workers=1)
+        self.assertEqual(mock_ocr.call_count, 4)
+
+        stats = {}
+        second = load_pdf(self.pdf_path, ocr_workers=3, stats=stats)
+        self.assertEqual(second, first)
+        self.assertEqual(mock_ocr.call_count, 4)
+        self.assertEqual(stats["ocr_cached_pages"], [0, 2, 3, 5])
+        self.assertEqual(stats["ocr_timings"], {})
+
+    @patch('pipeline.pdf_loader.pytesseract.image_to_string', side_effect=fake_ocr)
+    def test_cache_key_includes_dpi_and_language(self, mock_ocr):
+        load_pdf(self.pdf_path, ocr_workers=1)
+        load_pdf(self.pdf_path, ocr_workers=1, dpi=144)
+        self.assertEqual(mock_ocr.call_count, 8)
+
+        with patch('pipeline.pdf_loader.OCR_LANG', 'eng'):
+            load_pdf(self.pdf_path, ocr_workers=1)
+        self.assertEqual(mock_ocr.call_count, 12)
+
+if __name__ == '__main__':
+    unittest.main()
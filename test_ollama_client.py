@@ -0,0 +1,89 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+import requests
+
+import pipeline.embedder as embedder
+import pipeline.ollama_client as ollama_client
+from pipeline.ollama_client import OllamaClient, OllamaNotFoundError
+from mock_ollama import MockOllamaServer, fake_embedding
+
+class TestOllamaClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockOllamaServer(dim=8)
+        self.server.start()
+        self.url = f"{self.server.base_url}/api/embed"
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_connections_are_reused(self):
+        client = OllamaClient(max_concurrency=2)
+        for i in range(20):
+            client.post_json(self.url, {"input": [f"metin {i}"]})
+        self.assertEqual(len(self.server.connections), 1)
+        client.close()
+
+    def test_concurrency_limit(self):
+        self.server.request_latency = 0.05
+        client = OllamaClient(max_concurrency=3)
+        client.map(lambda i: client.post_json(self.url, {"input": [str(i)]}), range(12))
+        self.assertEqual(self.server.max_in_flight, 3)
+        self.assertLessEqual(len(self.server.connections), 3)
+        client.close()
+
+    def test_timeout(self):
+        self.server.request_latency = 1.0
+        client = OllamaClient(read_timeout=0.1, max_retries=1)
+        start = time.perf_counter()
+        with self.assertRaises(requests.exceptions.Timeout):
+            client.post_json(self.url, {"input": ["yavaş"]})
+        self.assertLess(time.perf_counter() - start, 0.8)
+        client.close()
+
+    def test_exponential_backoff_with_jitter(self):
+        client = OllamaClient(max_retries=4, backoff_base=0.05, backoff_max=0.15)
+        self.server.fail_next["/api/embed"] = 3
+        delays = []
+        backoff_delay = client.backoff_delay
+
+        def record(attempt):
+            delays.append((attempt, backoff_delay(attempt)))
+            return delays[-1][1]
+
+        with patch.object(client, "backoff_delay", side_effect=record):
+            client.post_json(self.url, {"input": ["tekrar"]})
+
+        self.assertEqual([attempt for attempt, _ in delays], [0, 1, 2])
+        for attempt, delay in delays:
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(0.15, 0.05 * 2 ** attempt))
+        client.close()
+
+    def test_not_found_is_not_retried(self):
+        self.server.legacy_only = True
+        client = OllamaClient(backoff_base=0)
+        with self.assertRaises(OllamaNotFoundError):
+            client.post_json(self.url, {"input": ["eski sürüm"]})
+        self.assertEqual(len(self.server.requests), 1)
+        client.close()
+
+    def test_async_embeddings_run_concurrently(self):
+        self.server.request_latency = 0.05
+        client = OllamaClient(max_concurrency=4, backoff_base=0)
+        texts = [f"chunk {i}" for i in range(8)]
+        with patch.object(embedder, "OLLAMA_BASE_URL", self.server.base_url), \
+             patch.object(ollama_client, "_client_instance", client):
+            result = asyncio.run(embedder.aget_embeddings(texts, batch_size=2))
+            single = asyncio.run(embedder.aget_embedding("tek"))
+
+        self.assertEqual(result, [fake_embedding(t, 8) for t in texts])
+        self.assertEqual(single, fake_embedding("tek", 8))
+        self.assertEqual(self.server.max_in_flight, 4)
+        client.close()
+
+if __name__ == '__main__':
+    unittest.main()
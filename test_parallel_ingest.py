@@ -0,0 +1,44 @@
+import os
+import unittest
+
+import fitz
+
+import pipeline.vector_store as vector_store
+from pipeline.ingest import ingest_files
+from tests.isolation import IngestTestCase
+
+def make_pdf(path, text):
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((50, 72), text)
+    doc.save(path)
+    doc.close()
+
+class TestParallelIngestion(IngestTestCase):
+
+    def test_results_and_errors_come_back(self):
+        """Every file gets a result; a broken PDF is reported without stopping the rest."""
+        paths = []
+        for i in range(3):
+            path = os.path.join(self.tmp, f"doc{i}.pdf")
+            make_pdf(path, f"Madde {i+1} - Hacettepe Universitesi yonerge metni numara {i}.")
+            paths.append(path)
+        broken = os.path.join(self.tmp, "broken.pdf")
+        with open(broken, "wb") as f:
+            f.write(b"not a pdf")
+        paths.append(broken)
+
+        results = ingest_files(paths, workers=2)
+        by_file = {r["file"]: r for r in results}
+
+        self.assertEqual(set(by_file), {"doc0.pdf", "doc1.pdf", "doc2.pdf", "broken.pdf"})
+        for i in range(3):
+            self.assertEqual(by_file[f"doc{i}.pdf"]["status"], "indexed")
+            self.assertEqual(by_file[f"doc{i}.pdf"]["stored"], 1)
+        self.assertIn(by_file["broken.pdf"]["status"], ("empty", "error"))
+
+        for i in range(3):
+            self.assertTrue(vector_store.is_file_indexed(f"doc{i}.pdf"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pipeline.rag_engine as rag_engine
+from pipeline.cache import AnswerStore, QueryCache, MemoryTier
+
+KURULUS = [1.0, 0.0, 0.0]
+KURULUS_PARAPHRASE = [0.98, 0.12, 0.0]  # cosine ~0.99
+YEMEKHANE = [0.0, 1.0, 0.0]
+
+class TestSemanticCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def cache(self, **kwargs):
+        return QueryCache(cache_dir=self.tmp, **kwargs)
+
+    def test_paraphrase_served_from_nearest_neighbour(self):
+        cache = self.cache()
+        cache.set("Hacettepe ne zaman kuruldu?", "1967", embedding=KURULUS)
+
+        query = "Hacettepe Üniversitesi hangi yıl kuruldu?"
+        self.assertIsNone(cache.get(query))
+        self.assertEqual(cache.get_similar(query, KURULUS_PARAPHRASE), "1967")
+        self.assertIsNone(cache.get_similar("Yemekhane nerede?", YEMEKHANE))
+        self.assertIsNone(cache.get_similar(query, None))
+        self.assertEqual(cache.stats()['semantic_hits'], 1)
+
+    def test_numbers_must_match(self):
+        cache = self.cache()
+        cache.set("Madde 12 neyi düzenler?", "Sınavları", embedding=KURULUS)
+        self.assertIsNone(cache.get_similar("Madde 13 neyi düzenler?", KURULUS))
+        self.assertEqual(cache.get_similar("12. madde neyi düzenler?", KURULUS), "Sınavları")
+
+    def test_persists_across_restarts(self):
+        first = self.cache()
+        first.set("Hacettepe ne zaman kuruldu?", "1967", embedding=KURULUS)
+        first.flush()
+        cache = self.cache()
+        self.assertEqual(cache.stats()['semantic_entries'], 1)
+        self.assertEqual(cache.get_similar("Hacettepe hangi yıl kuruldu?", KURULUS_PARAPHRASE), "1967")
+
+        cache.clear()
+        self.assertEqual(self.cache().stats()['semantic_entries'], 0)
+
+    def test_bounded_least_recently_used(self):
+        cache = self.cache(semantic_max_entries=2)
+        cache.set("soru a", "A", embedding=[1.0, 0.0, 0.0])
+        cache.set("soru b", "B", embedding=[0.0, 1.0, 0.0])
+        self.assertEqual(cache.get_similar("soru a?", [1.0, 0.0, 0.0]), "A")  # a used more recently than b
+        cache.set("soru c", "C", embedding=[0.0, 0.0, 1.0])
+
+        self.assertEqual(cache.stats()['semantic_entries'], 2)
+        self.assertIsNone(cache.get_similar("soru b?", [0.0, 1.0, 0.0]))
+        self.assertEqual(cache.get_similar("soru a?", [1.0, 0.0, 0.0]), "A")
+
+    def test_saves_are_batched(self):
+        path = os.path.join(self.tmp, "semantic_index.npz")
+        cache = self.cache(semantic_flush_every=3, semantic_flush_seconds=3600)
+        cache.set("soru a", "A", embedding=[1.0, 0.0, 0.0])
+        cache.set("soru a", "A2", embedding=[0.0, 1.0, 0.0])  # same key: row is updated in place
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(cache.stats()['semantic_entries'], 1)
+        cache.set("soru b", "B", embedding=[0.0, 0.0, 1.0])
+        self.assertTrue(os.path.exists(path))
+
+        cache.set("soru c", "C", embedding=[1.0, 0.0, 0.0])
+        self.assertEqual(self.cache().stats()['semantic_entries'], 2)
+        cache.flush()
+        restarted = self.cache()
+        self.assertEqual(restarted.stats()['semantic_entries'], 3)
+        self.assertEqual(restarted.get_similar("soru a?", [0.0, 1.0, 0.0]), "A2")
+
+    def test_expired_entries_leave_the_semantic_tier(self):
+        cache = self.cache(max_age_hours=0)
+        cache.set("Hacettepe ne zaman kuruldu?", "1967", embedding=KURULUS)
+        self.assertIsNone(cache.get_similar("Hacettepe hangi yıl kuruldu?", KURULUS))
+        self.assertEqual(cache.stats()['semantic_entries'], 0)
+
+    def test_generate_answer_skips_llm_for_paraphrase(self):
+        client = MagicMock()
+        client.post_json.return_value = "1967 yılında kurulmuştur."
+        embeddings = {"Hacettepe ne zaman kuruldu?": KURULUS,
+                      "Hacettepe Üniversitesi hangi yıl kuruldu?": KURULUS_PARAPHRASE}
+        with patch("pipeline.cache._cache_instance", self.cache()), \
+             patch.object(rag_engine, "ENABLE_CACHE", True), \
+             patch.object(rag_engine, "embed_query", side_effect=embeddings.get), \
+             patch.object(rag_engine, "retrieve_context", return_value=[]) as retrieve, \
+             patch.object(rag_engine, "get_ollama_client", return_value=client):
+            first = rag_engine.generate_answer("Hacettepe ne zaman kuruldu?")
+            second = rag_engine.generate_answer("Hacettepe Üniversitesi hangi yıl kuruldu?")
+
+        self.assertEqual(first, second)
+        client.post_json.assert_called_once()
+        retrieve.assert_called_once_with("Hacettepe ne zaman kuruldu?", KURULUS)
+
+def entry(answer):
+    return {'query': "soru", 'answer': answer, 'timestamp': 0, 'metadata': {}}
+
+class TestMemoryTier(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_bounded_by_entries_and_bytes(self):
+        tier = MemoryTier(max_entries=3, max_bytes=10 ** 6, policy="lru")
+        for key in "abcd":
+            tier.put(key, entry(key))
+        self.assertEqual((len(tier), "a" in tier, tier.evictions), (3, False, 1))
+
+        tier = MemoryTier(max_entries=100, max_bytes=30000, policy="lru")
+        for key in "abcdef":
+            tier.put(key, entry("ş" * 5000))  # ~10 KB each
+        self.assertLessEqual(tier.bytes, 30000)
+        self.assertEqual(set(tier._entries), {"e", "f"})
+        self.assertFalse(tier.put("big", entry("x" * 40000)))
+        tier.clear()
+        self.assertEqual((len(tier), tier.bytes), (0, 0))
+
+    def test_tinylfu_keeps_hot_entries(self):
+        keys = [hashlib.md5(str(i).encode()).hexdigest() for i in range(40)]
+        for policy, survivors in [("tinylfu", 2), ("lru", 0)]:
+            tier = MemoryTier(max_entries=4, policy=policy)
+            for key in keys[:2]:  # hot FAQs
+                for _ in range(5):
+                    tier.record_access(key)
+                tier.put(key, entry(key))
+            for key in keys[2:]:  # stream of one-off questions
+                tier.record_access(key)
+                tier.put(key, entry(key))
+            self.assertEqual(sum(key in tier for key in keys[:2]), survivors, policy)
+            self.assertEqual(len(tier), 4)
+
+    def test_query_cache_stats(self):
+        cache = QueryCache(cache_dir=self.tmp, memory_max_entries=1)
+        cache.set("Hacettepe ne zaman kuruldu?", "1967")
+        cache.get("Hacettepe ne zaman kuruldu?")
+        cache.get("Hacettepe ne zaman kuruldu?")
+        cache.get("Yemekhane nerede?")
+        cache.set("Yemekhane nerede?", "Beytepe")
+
+        stats = cache.stats()
+        self.assertEqual(stats['memory_entries'], 1)
+        self.assertGreater(stats['memory_bytes'], 0)
+        self.assertEqual((stats['hits'], stats['misses'], stats['memory_hits']), (2, 1, 2))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+        self.assertEqual(stats['memory_rejections'], 1)  # one-off did not replace the hot entry
+        self.assertEqual(cache.get("Yemekhane nerede?"), "Beytepe")  # still on disk
+
+class TestAnswerStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write_json(self, query, answer, age_hours=0):
+        key = hashlib.md5(query.lower().strip().encode('utf-8')).hexdigest()
+        entry = {'query': query, 'answer': answer, 'timestamp': time.time() - age_hours * 3600, 'metadata': {}}
+        with open(os.path.join(self.tmp, f"{key}.json"), 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+
+    def test_imports_legacy_json_once(self):
+        self.write_json("Hacettepe ne zaman kuruldu?", "1967")
+        self.write_json("Eski soru", "eski", age_hours=48)
+        cache = QueryCache(cache_dir=self.tmp)
+        self.assertEqual(cache.get("Hacettepe ne zaman kuruldu?"), "1967")
+        self.assertEqual(cache.stats()['disk_entries'], 1)  # expired one swept on open
+        self.assertEqual(cache.stats()['disk_expired'], 1)
+
+        cache.set("Hacettepe ne zaman kuruldu?", "1967 yılında")
+        self.write_json("Yeni JSON", "yok sayılır")
+        cache = QueryCache(cache_dir=self.tmp)
+        self.assertEqual(cache.get("Hacettepe ne zaman kuruldu?"), "1967 yılında")
+        self.assertIsNone(cache.get("Yeni JSON"))
+
+    def test_shared_between_instances(self):
+        first, second = QueryCache(cache_dir=self.tmp), QueryCache(cache_dir=self.tmp)
+        first.set("Yemekhane nerede?", "Beytepe", metadata={"sources": "a.pdf"})
+        self.assertEqual(second.get("yemekhane nerede?"), "Beytepe")
+        self.assertEqual(second.disk.get(first._get_cache_key("Yemekhane nerede?"))['metadata'], {"sources": "a.pdf"})
+        second.clear()
+        self.assertEqual(first.stats()['disk_entries'], 0)
+
+    def test_batch_expiry_sweep(self):
+        cache = QueryCache(cache_dir=self.tmp, max_age_hours=1, sweep_interval_seconds=0)
+        cache.set("Hacettepe ne zaman kuruldu?", "1967", embedding=KURULUS)
+        cache.set("Yemekhane nerede?", "Beytepe", embedding=YEMEKHANE)
+        cache.max_age_seconds = 0
+        self.assertEqual(cache.sweep_expired(), 2)
+        stats = cache.stats()
+        self.assertEqual((stats['disk_entries'], stats['memory_entries'], stats['semantic_entries']), (0, 0, 0))
+
+    def test_lookup_counts_are_buffered(self):
+        store = AnswerStore(os.path.join(self.tmp, "answers.sqlite"))
+        store.set("a", {'query': "q", 'answer': "cevap", 'timestamp': time.time()})
+        changes = store._conn.total_changes
+        store.get("a"), store.get("b")
+        self.assertEqual(store._conn.total_changes, changes)
+        self.assertEqual((store.stats()['hits'], store.stats()['misses']), (1, 1))
+
+        store.close()
+        stats = AnswerStore(os.path.join(self.tmp, "answers.sqlite")).stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+class TestSourceInvalidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_invalidates_only_dependent_entries(self):
+        cache = QueryCache(cache_dir=self.tmp)
+        cache.set("a v1", "A1", sources={"a.pdf": "v1"}, embedding=KURULUS)
+        cache.set("a v2", "A2", sources={"a.pdf": "v2"})
+        cache.set("b", "B", sources={"b.pdf": "v1"})
+        cache.set("bağlamsız", "Yok", sources={})
+        cache.set("etiketsiz", "E")
+
+        self.assertEqual(cache.invalidate_sources({"a.pdf": "v2"}), 2)  # a v1 + no-context answer
+        self.assertEqual([cache.get(q) for q in ["a v1", "a v2", "b", "bağlamsız", "etiketsiz"]],
+                         [None, "A2", "B", None, "E"])
+        self.assertEqual(cache.stats()['semantic_entries'], 0)
+        self.assertEqual(cache.invalidate_sources({"a.pdf": None, "b.pdf": None}), 2)
+        self.assertEqual(cache.stats()['disk_entries'], 1)
+        self.assertEqual(cache.stats()['invalidated'], 4)
+
+    def test_other_processes_drop_memory_copies(self):
+        assistant = QueryCache(cache_dir=self.tmp)
+        assistant.set("a", "A", sources={"a.pdf": "v1"})
+        assistant.set("b", "B", sources={"b.pdf": "v1"})
+        self.assertEqual(assistant.stats()['memory_entries'], 2)
+
+        with patch("pipeline.cache._cache_instance", None), patch("pipeline.cache.ENABLE_CACHE", True), \
+             patch("pipeline.cache.CACHE_DIR", self.tmp):
+            from pipeline.cache import invalidate_documents
+            self.assertEqual(invalidate_documents({"a.pdf": None}), 1)
+        self.assertIsNone(assistant.get("a"))
+        self.assertEqual(assistant.get("b"), "B")
+
+    def test_tagged_entries_live_longer(self):
+        cache = QueryCache(cache_dir=self.tmp, max_age_hours=1, tagged_max_age_hours=3)
+        cache.set("etiketli", "T", sources={"a.pdf": "v1"})
+        cache.set("etiketsiz", "U")
+        for key in ["etiketli", "etiketsiz"]:  # two hours old
+            cache.memory_cache.remove(cache._get_cache_key(key))
+            entry = cache.disk.get(cache._get_cache_key(key))
+            entry['timestamp'] -= 2 * 3600
+            cache.disk.set(cache._get_cache_key(key), entry)
+
+        self.assertEqual(cache.sweep_expired(), 1)
+        self.assertEqual((cache.get("etiketli"), cache.get("etiketsiz")), ("T", None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pipeline.vector_store as vector_store
+import pipeline.retrieval_cache as retrieval_cache
+import pipeline.rag_engine as rag_engine
+from pipeline.disk_cache import DiskLRUCache
+from pipeline.retrieval_cache import RetrievalCache
+from pipeline.vector_store import make_record_batch
+from tests.isolation import IsolatedTestCase
+
+RANKING = [{"id": "a", "score": 0.9}, {"id": "b", "score": 0.5}]
+
+class TestRetrievalCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_keyed_by_version_and_settings(self):
+        cache = RetrievalCache(max_entries=2)
+        cache.put("Madde 12  nedir?", 3, ["m", 6], RANKING)
+        self.assertEqual(cache.get("Madde 12 nedir?", 3, ["m", 6]), RANKING)
+        self.assertIsNone(cache.get("Madde 12 nedir?", 4, ["m", 6]))
+        self.assertIsNone(cache.get("Madde 12 nedir?", 3, ["m", 8]))
+
+        cache.put("b", 3, [], RANKING)
+        cache.put("c", 3, [], RANKING)  # evicts the first entry
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses'], stats['evictions']), (2, 1, 2, 1))
+
+    def test_persistent_tier(self):
+        path = os.path.join(self.tmp, "retrieval.sqlite")
+        RetrievalCache(persistent=DiskLRUCache(path)).put("soru", 3, [], RANKING)
+        cache = RetrievalCache(persistent=DiskLRUCache(path))
+        self.assertEqual(cache.get("soru", 3, []), RANKING)
+        self.assertEqual(cache.get("soru", 3, []), RANKING)
+        self.assertEqual((cache.stats()['disk_hits'], cache.stats()['hits']), (1, 1))
+
+class TestRetrieveContextCache(IsolatedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add("a.pdf", ["Aşı Enstitüsü 2018 yılında kurulmuştur.", "Yemekhane Beytepe'dedir."],
+                 [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+
+    def add(self, source, texts, vectors):
+        vector_store.add_record_batch(make_record_batch(texts, vectors, source))
+        vector_store.flush_writes()
+
+    def test_ranking_reused_until_the_table_changes(self):
+        query = "Aşı Enstitüsü ne zaman kuruldu?"
+        with patch.object(rag_engine, "get_embedding", return_value=[1.0, 0.0, 0.0]) as embed:
+            first = rag_engine.retrieve_context(query)
+            with patch.object(rag_engine, "search_vectors") as search:
+                self.assertEqual(rag_engine.retrieve_context(query), first)
+                search.assert_not_called()
+            self.assertEqual(embed.call_count, 1)
+
+            with patch.object(rag_engine, "TOP_K", 1):
+                self.assertEqual(len(rag_engine.retrieve_context(query)), 1)
+            for setting in ["VECTOR_NPROBES", "ENTITY_INDEX_MAX_IDS", "LEXICAL_TOP_K", "BM25_K1"]:
+                with patch.object(rag_engine, setting, 7), \
+                     patch.object(rag_engine, "_rank_context", return_value=[]) as rank:
+                    rag_engine.retrieve_context(query)
+                    rank.assert_called_once()
+
+            self.add("b.pdf", ["Aşı Enstitüsü yeni binasına taşındı."], [[0.9, 0.1, 0.0]])
+            self.assertIn("b.pdf", [item["source"] for item in rag_engine.retrieve_context(query)])
+        self.assertEqual(retrieval_cache.get_retrieval_cache().stats()['hits'], 1)
+
+    def test_generation_redone_without_retrieval(self):
+        client = MagicMock()
+        client.post_json.side_effect = ["Eski model cevabı", "Yeni model cevabı"]
+        with patch.object(rag_engine, "ENABLE_CACHE", False), \
+             patch.object(rag_engine, "get_embedding", return_value=[1.0, 0.0, 0.0]), \
+             patch.object(rag_engine, "get_ollama_client", return_value=client), \
+             patch.object(rag_engine, "_rank_context", wraps=rag_engine._rank_context) as rank:
+            first = rag_engine.generate_answer("Aşı Enstitüsü ne zaman kuruldu?")
+            with patch.object(rag_engine, "LLM_MODEL", "yeni-model"):
+                second = rag_engine.generate_answer("Aşı Enstitüsü ne zaman kuruldu?")
+
+        self.assertTrue(first.startswith("Eski") and second.startswith("Yeni"))
+        self.assertIn("Aşı Enstitüsü 2018", second)
+        rank.assert_called_once()
+        self.assertEqual(rag_engine.cache_stats()["retrieval"]["hit_rate"], 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
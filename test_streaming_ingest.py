@@ -0,0 +1,144 @@
+import os
+import random
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import fitz
+
+import pipeline.ingest as ingest
+import pipeline.vector_store as vector_store
+from pipeline.text_cleaner import clean_text, iter_clean_blocks
+from pipeline.chunker import chunk_text, iter_chunks
+from pipeline.pdf_loader import load_pdf
+from pipeline.streaming import StreamStage
+from tests.isolation import IngestTestCase
+
+def random_blocks(rnd, text):
+    """Splits text at random spaces into blocks that join back with a space."""
+    words = text.split(" ")
+    blocks, current = [], []
+    for word in words:
+        current.append(word)
+        if rnd.random() < 0.3:
+            blocks.append(" ".join(current))
+            current = []
+    if current or not blocks:
+        blocks.append(" ".join(current))
+    return blocks
+
+class TestStreamingStages(unittest.TestCase):
+
+    def test_clean_blocks_match_clean_text(self):
+        pages = [
+            "HACETTEPE ÜNİVERSİTESİ\nYÖNERGE\n1\n",
+            "Madde 1 - Bu yönergenin amacı öğren-\nci işlerini düzenlemektir.\na) birinci bent\nPage 2\n",
+            "ﬁnal sınavı   ve\tbütünleme\n12. fıkra devam-\n ediyor\n"
+        ]
+        blocks = list(iter_clean_blocks(pages))
+        self.assertEqual(" ".join(blocks), clean_text("\n".join(pages)))
+        self.assertEqual(blocks[1], "Madde 1 - Bu yönergenin amacı öğrenci işlerini düzenlemektir.")
+
+    def test_streamed_chunks_match_chunk_text(self):
+        """Random block boundaries (headers split across blocks, long sections) give the same chunks."""
+        rnd = random.Random(7)
+        tokens = ["Madde", "Madde 1", "madde 23", "1.", "a)", "\n", " ", "söz.", "kelime",
+                  "M", "Madd", "e 5", "5", "\n\n", "! "]
+        for _ in range(2000):
+            text = "".join(rnd.choice(tokens) + rnd.choice(["", " "]) for _ in range(rnd.randint(0, 60)))
+            max_size = rnd.randint(5, 50)
+            overlap = rnd.randint(0, max_size - 1)
+            blocks = random_blocks(rnd, text)
+            self.assertEqual(list(iter_chunks(blocks, max_size, overlap)),
+                             chunk_text(text, max_size, overlap), (blocks, max_size, overlap))
+
+    def test_long_preamble_is_split(self):
+        text = ("kelime " * 100) + "Madde 1 - Kısa madde."
+        chunks = chunk_text(text, max_size=120, overlap=10)
+        self.assertTrue(all(len(c) <= 120 for c in chunks))
+        self.assertEqual(chunks[-1], "Madde 1 - Kısa madde.")
+
+    def test_stage_applies_back_pressure(self):
+        produced = []
+
+        def producer():
+            for i in range(20):
+                produced.append(i)
+                yield i
+
+        stage = StreamStage("test", producer(), maxsize=2)
+        consumed = 0
+        for _ in stage:
+            time.sleep(0.01)
+            consumed += 1
+            # Producer can be at most queue size + one in hand ahead of the consumer
+            self.assertLessEqual(len(produced) - consumed, 3)
+        stats = stage.stats()
+        self.assertEqual(stats['items'], 20)
+        self.assertLessEqual(stats['max_depth'], 2)
+
+    def test_stage_error_reaches_consumer(self):
+        def producer():
+            yield 1
+            raise ValueError("bozuk sayfa")
+
+        with self.assertRaises(ValueError):
+            list(StreamStage("test", producer(), maxsize=2))
+
+    def test_closed_stage_releases_producer(self):
+        def producer():
+            for i in range(1000):
+                yield i
+
+        stage = StreamStage("test", producer(), maxsize=1)
+        next(iter(stage))
+        stage.close()
+        stage._thread.join(timeout=2)
+        self.assertFalse(stage._thread.is_alive())
+
+class TestStreamDocument(IngestTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.start_patches(patch.object(ingest, "EMBEDDING_BATCH_SIZE", 4))
+
+        self.pdf_path = os.path.join(self.tmp, "uzun.pdf")
+        doc = fitz.open()
+        for i in range(6):
+            page = doc.new_page()
+            for j in range(3):
+                n = i * 3 + j + 1
+                page.insert_text((50, 72 + j * 60), f"Madde {n} - Hacettepe yönergesinin {n}. maddesi.")
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def test_streams_in_embedding_batches(self):
+        expected = chunk_text(clean_text(load_pdf(self.pdf_path)))
+        result = ingest.stream_document(self.pdf_path)
+
+        self.assertEqual(result["status"], "indexed")
+        self.assertEqual(result["chunks"], len(expected))
+        self.assertEqual(vector_store.count_source_rows("uzun.pdf"), len(expected))
+        # 18 chunks in batches of 4 -> 5 requests, written as they arrive
+        self.assertEqual([n for p, n in self.server.requests if p == "/api/embed"], [4, 4, 4, 4, 2])
+
+    def test_failed_stream_leaves_no_partial_rows(self):
+        real_embed = ingest.embed_chunks
+        calls = []
+
+        def flaky_embed(chunks):
+            calls.append(len(chunks))
+            if len(calls) == 3:
+                raise RuntimeError("Ollama düştü")
+            return real_embed(chunks)
+
+        with patch.object(ingest, "embed_chunks", side_effect=flaky_embed):
+            result = ingest.stream_document(self.pdf_path)
+
+        self.assertEqual(result["status"], "error")
+        self.assertIn("Ollama düştü", result["error"])
+        self.assertEqual(vector_store.count_source_rows("uzun.pdf"), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+import pipeline.vector_store as vector_store
+from pipeline.vector_store import make_record_batch
+from tests.isolation import IsolatedTestCase
+
+def add_rows(n, start=0, dim=32, seed=0):
+    rnd = np.random.default_rng(seed)
+    centers = rnd.normal(size=(16, dim))
+    vectors = centers[rnd.integers(0, 16, n)] + 0.3 * rnd.normal(size=(n, dim))
+    vector_store.add_record_batch(make_record_batch(
+        [f"chunk {i}" for i in range(start, start + n)], vectors, "doc.pdf"))
+    vector_store.flush_writes()
+
+class TestVectorIndex(IsolatedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.start_patches(
+            patch.object(vector_store, "VECTOR_INDEX_MIN_ROWS", 500),
+            patch.object(vector_store, "VECTOR_INDEX_REBUILD_RATIO", 0.5),
+        )
+
+    def test_lifecycle(self):
+        add_rows(300)
+        self.assertIsNone(vector_store.maybe_update_index())
+        self.assertFalse(vector_store.index_status()["indexed"])
+
+        add_rows(300, start=300, seed=1)
+        self.assertEqual(vector_store.maybe_update_index(), "built")
+        status = vector_store.index_status()
+        self.assertTrue(status["indexed"])
+        self.assertEqual(status["index_type"], "IVF_PQ")
+        self.assertEqual((status["num_indexed_rows"], status["num_unindexed_rows"]), (600, 0))
+
+        add_rows(200, start=600, seed=2)
+        self.assertIsNone(vector_store.maybe_update_index())  # 200 <= 0.5 * 600
+        self.assertEqual(vector_store.index_status()["num_unindexed_rows"], 200)
+
+        add_rows(200, start=800, seed=3)
+        self.assertEqual(vector_store.maybe_update_index(), "rebuilt")
+        self.assertEqual(vector_store.index_status()["num_indexed_rows"], 1000)
+
+    def test_search_uses_index_and_finds_unindexed_rows(self):
+        add_rows(600)
+        vector_store.build_vector_index(num_partitions=8, num_sub_vectors=8)
+        add_rows(1, start=600, seed=9)
+
+        query = vector_store.get_db_connection().open_table("vectors").search() \
+            .where("text = 'chunk 600'").limit(1).to_list()[0]["embedding"]
+        results = vector_store.search_vectors(query, limit=3)
+        self.assertEqual(results[0]["text"], "chunk 600")
+
+    def test_recall_report(self):
+        add_rows(600)
+        flat = vector_store.measure_recall(samples=10, k=5, seed=1)
+        self.assertFalse(flat["indexed"])
+        self.assertEqual(flat["recall"], 1.0)
+
+        vector_store.build_vector_index(num_partitions=8, num_sub_vectors=8)
+        report = vector_store.measure_recall(samples=20, k=5, nprobes=8, refine_factor=10, seed=1)
+        self.assertTrue(report["indexed"])
+        self.assertEqual(report["samples"], 20)
+        self.assertGreaterEqual(report["recall"], 0.9)
+
+if __name__ == '__main__':
+    unittest.main()
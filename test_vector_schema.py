@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+import pyarrow as pa
+
+import pipeline.vector_store as vector_store
+from pipeline.vector_store import make_record_batch, vector_schema
+from tests.isolation import IsolatedTestCase
+
+class TestVectorSchema(IsolatedTestCase):
+
+    def test_explicit_schema(self):
+        vector_store.create_table_if_not_exists(dim=1024)
+        table = vector_store.get_db_connection().open_table("vectors")
+        self.assertEqual(table.schema.field("embedding").type, pa.list_(pa.float32(), 1024))
+        self.assertEqual(table.schema.metadata[vector_store.NORMALIZED_KEY], b"l2")
+        self.assertEqual(table.count_rows(), 0)
+
+    def test_embeddings_are_normalized(self):
+        b = make_record_batch(["a", "b", "sıfır"], [[3.0, 4.0], [0.0, 2.0], [0.0, 0.0]], "x.pdf")
+        self.assertEqual(b.schema, vector_schema(2))
+        vectors = np.stack(b.column("embedding").to_numpy(zero_copy_only=False))
+        np.testing.assert_allclose(vectors, [[0.6, 0.8], [0.0, 1.0], [0.0, 0.0]], rtol=1e-6)
+
+    def test_dot_search_matches_cosine(self):
+        vector_store.add_documents([
+            {"text": "a", "embedding": [10.0, 0.0], "source": "a.pdf", "metadata": "{}"},
+            {"text": "b", "embedding": [3.0, 4.0], "source": "b.pdf", "metadata": "{}"},
+            {"text": "c", "embedding": [-0.5, 0.0], "source": "c.pdf", "metadata": "{}"},
+        ])
+        results = vector_store.search_vectors([2.0, 0.0], limit=3)
+        self.assertEqual([r["text"] for r in results], ["a", "b", "c"])
+        np.testing.assert_allclose([r["_distance"] for r in results], [0.0, 0.4, 2.0], atol=1e-6)
+
+    def test_old_table_is_migrated_in_place(self):
+        # Layout written by earlier versions: list<double> inferred from Python lists
+        db = vector_store.get_db_connection()
+        db.create_table("vectors", data=[
+            {"id": "1", "text": "a", "embedding": [30.0, 40.0], "source": "a.pdf",
+             "metadata": '{"faculties": ["Tıp Fakültesi", "TIP FAKÜLTESİ"], "dates": ["1967"]}'},
+            {"id": "2", "text": "b", "embedding": [0.0, -5.0], "source": "b.pdf", "metadata": "{}"},
+        ])
+        version = db.open_table("vectors").version
+
+        self.assertTrue(vector_store.ensure_vector_schema())
+        self.assertFalse(vector_store.ensure_vector_schema())
+
+        table = vector_store.get_db_connection().open_table("vectors")
+        self.assertGreater(table.version, version)
+        self.assertEqual(table.schema, vector_schema(2))
+        rows = table.to_arrow().to_pylist()
+        self.assertEqual([r["id"] for r in rows], ["1", "2"])
+        np.testing.assert_allclose([r["embedding"] for r in rows], [[0.6, 0.8], [0.0, -1.0]], rtol=1e-6)
+        # JSON entities become normalized list columns
+        self.assertEqual([(r["faculties"], r["dates"]) for r in rows], [(["tıp fakültesi"], ["1967"]), ([], [])])
+
+        # New rows keep the layout and search uses it
+        vector_store.add_record_batch(make_record_batch(["c"], [[1.0, 0.0]], "c.pdf"))
+        self.assertEqual(vector_store.search_vectors([0.0, 1.0], limit=1)[0]["text"], "a")
+
+if __name__ == '__main__':
+    unittest.main()
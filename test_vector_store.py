@@ -0,0 +1,170 @@
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+import lancedb
+import numpy as np
+
+import pipeline.vector_store as vector_store
+from pipeline.vector_store import VectorStore, VectorWriter, make_record_batch
+from tests.isolation import IsolatedTestCase
+
+def batch(source, n, dim=4, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim))
+    return make_record_batch([f"{source} {i}" for i in range(n)], vectors, source)
+
+class TestVectorStore(IsolatedTestCase):
+
+    def test_connection_and_table_are_reused(self):
+        vector_store.add_documents([{"text": "a", "embedding": [1.0, 0.0], "source": "a.pdf"}])
+        store = vector_store.get_store()
+
+        with patch.object(vector_store.lancedb, "connect", wraps=lancedb.connect) as connect, \
+             patch.object(store.db, "open_table", wraps=store.db.open_table) as open_table:
+            for _ in range(5):
+                self.assertEqual(len(vector_store.search_vectors([1.0, 0.0])), 1)
+                self.assertTrue(vector_store.is_file_indexed("a.pdf"))
+                self.assertEqual(vector_store.count_source_rows("a.pdf"), 1)
+            vector_store.delete_document_by_source("a.pdf")
+
+        self.assertEqual(connect.call_count, 0)
+        self.assertEqual(open_table.call_count, 0)
+        self.assertIs(vector_store.get_store(), store)
+
+    def test_missing_table(self):
+        store = vector_store.get_store()
+        self.assertIsNone(store.table("vectors"))
+        self.assertEqual(store.version("vectors"), 0)
+        self.assertEqual(vector_store.search_vectors([1.0, 0.0]), [])
+
+        vector_store.add_record_batch(batch("a.pdf", 2))
+        self.assertEqual(vector_store.count_source_rows("a.pdf"), 2)
+        self.assertGreater(store.version("vectors"), 0)
+
+    def test_uri_change_creates_new_store(self):
+        store = vector_store.get_store()
+        with patch.object(vector_store, "LANCEDB_URI", os.path.join(self.tmp, "other")):
+            other = vector_store.get_store()
+        self.assertIsNot(other, store)
+        self.assertEqual(other.uri, os.path.join(self.tmp, "other"))
+
+    def test_writes_from_other_processes(self):
+        vector_store.add_record_batch(batch("a.pdf", 2))
+        vector_store.flush_writes()
+
+        def other_process_writes(fn):
+            # Another process: its own store and writer on the same directory
+            with patch.object(vector_store, "_store_instance", VectorStore(self.uri)), \
+                 patch.object(vector_store, "_writer_instance", VectorWriter()):
+                fn()
+
+        # Interval not elapsed: the cached handles keep their version until refreshed
+        slow = VectorStore(self.uri, consistency_seconds=3600)
+        with patch.object(vector_store, "_store_instance", slow):
+            self.assertEqual(vector_store.count_source_rows("a.pdf"), 2)
+            other_process_writes(lambda: vector_store.add_documents(batch("b.pdf", 3).to_pylist()))
+            self.assertEqual(vector_store.count_source_rows("b.pdf"), 0)
+            slow.refresh()
+            self.assertEqual(vector_store.count_source_rows("b.pdf"), 3)
+            self.assertEqual(len(vector_store.search_vectors([1.0, 0.0, 0.0, 0.0], limit=10)), 5)
+
+        eager = VectorStore(self.uri, consistency_seconds=0)
+        with patch.object(vector_store, "_store_instance", eager):
+            self.assertTrue(vector_store.is_file_indexed("a.pdf"))
+            other_process_writes(lambda: vector_store.delete_document_by_source("a.pdf"))
+            self.assertFalse(vector_store.is_file_indexed("a.pdf"))
+            self.assertEqual(lancedb.connect(self.uri).open_table("vectors").count_rows(), 3)
+
+    def test_shared_between_threads(self):
+        vector_store.add_record_batch(batch("seed.pdf", 4))
+        vector_store.flush_writes()
+        errors = []
+
+        def reader():
+            try:
+                for _ in range(20):
+                    self.assertTrue(vector_store.search_vectors([1.0, 0.0, 0.0, 0.0], limit=2))
+            except Exception as e:
+                errors.append(e)
+
+        def writer(i):
+            try:
+                for j in range(5):
+                    vector_store.add_record_batch(batch(f"doc{i}.pdf", 2, seed=j))
+                    vector_store.flush_writes()
+                vector_store.delete_document_by_source(f"doc{i}.pdf")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=reader) for _ in range(3)]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(vector_store.count_source_rows("seed.pdf"), 4)
+        self.assertEqual(vector_store.count_source_rows("doc0.pdf"), 0)
+
+class TestManifest(IsolatedTestCase):
+
+    def test_manifest_follows_writes(self):
+        vector_store.add_record_batch(batch("a.pdf", 3))
+        vector_store.add_record_batch(batch("b.pdf", 2))
+        vector_store.flush_writes()
+        manifest = vector_store.get_manifest()
+        self.assertEqual({s: e["chunks"] for s, e in manifest.items()}, {"a.pdf": 3, "b.pdf": 2})
+        self.assertIsNotNone(manifest["a.pdf"]["ingested_at"])
+
+        self.assertEqual(vector_store.copy_source("a.pdf", "a_kopya.pdf"), 3)
+        self.assertEqual(vector_store.rename_source("b.pdf", "c.pdf"), 2)
+        self.assertTrue(vector_store.delete_document_by_source("a.pdf"))
+        self.assertFalse(vector_store.delete_document_by_source("a.pdf"))
+
+        expected = {"a_kopya.pdf": 3, "c.pdf": 2}
+        self.assertEqual({s: e["chunks"] for s, e in vector_store.get_manifest().items()}, expected)
+        # Persisted: a fresh process reads the same manifest
+        with patch.object(vector_store, "_store_instance", VectorStore(self.uri)):
+            self.assertEqual({s: e["chunks"] for s, e in vector_store.get_manifest().items()}, expected)
+
+    def test_lookups_do_not_scan_vectors(self):
+        vector_store.add_record_batch(batch("a.pdf", 3))
+        vector_store.flush_writes()
+        table = vector_store.get_store().table("vectors")
+
+        with patch.object(table, "search", side_effect=AssertionError("vector scan")), \
+             patch.object(table, "delete", wraps=table.delete) as delete:
+            self.assertTrue(vector_store.is_file_indexed("a.pdf"))
+            self.assertFalse(vector_store.is_file_indexed("yok.pdf"))
+            self.assertEqual(vector_store.count_source_rows("a.pdf"), 3)
+            self.assertFalse(vector_store.delete_document_by_source("yok.pdf"))
+            self.assertEqual(delete.call_count, 0)
+            self.assertTrue(vector_store.delete_document_by_source("a.pdf"))
+            self.assertEqual(delete.call_count, 1)
+
+    def test_manifest_is_backfilled(self):
+        # Table written before the manifest existed
+        lancedb.connect(self.uri).create_table("vectors", data=batch("eski.pdf", 4).to_pylist() + batch("yeni.pdf", 1).to_pylist())
+
+        manifest = vector_store.get_manifest()
+        self.assertEqual({s: e["chunks"] for s, e in manifest.items()}, {"eski.pdf": 4, "yeni.pdf": 1})
+        self.assertIsNone(manifest["eski.pdf"]["ingested_at"])
+        self.assertIsNotNone(vector_store.get_store().table(vector_store.manifest_name()))
+
+    def test_source_scalar_index(self):
+        vector_store.add_record_batch(batch("a.pdf", 5))
+        vector_store.flush_writes()
+        table = vector_store.get_store().table("vectors")
+        self.assertIn(["source"], [list(index.columns) for index in table.list_indices()])
+
+        self.assertFalse(vector_store.refresh_source_index())
+        vector_store.add_record_batch(batch("b.pdf", 5))
+        vector_store.flush_writes()
+        self.assertTrue(vector_store.refresh_source_index())
+        stats = [table.index_stats(i.name) for i in table.list_indices() if list(i.columns) == ["source"]][0]
+        self.assertEqual((stats.num_indexed_rows, stats.num_unindexed_rows), (10, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+import fitz
+import numpy as np
+
+import pipeline.ingest as ingest
+import pipeline.vector_store as vector_store
+from pipeline.vector_store import VectorWriter, make_record_batch
+from tests.isolation import IsolatedTestCase, IngestTestCase
+
+def batch(source, n, dim=4):
+    return make_record_batch([f"{source} chunk {i}" for i in range(n)],
+                             np.ones((n, dim), dtype=np.float32), source)
+
+def num_fragments():
+    table = vector_store.get_db_connection().open_table("vectors")
+    return table.stats()["fragment_stats"]["num_fragments"]
+
+class TestVectorWriter(IsolatedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.writer = VectorWriter(max_rows=10)
+        self.start_patches(patch.object(vector_store, "_writer_instance", self.writer))
+
+    def test_record_batch_layout(self):
+        b = make_record_batch(["a", "b"], [[1.0, 2.0], [3.0, 4.0]], "x.pdf")
+        self.assertEqual(str(b.schema.field("embedding").type), "fixed_size_list<item: float>[2]")
+        self.assertEqual(b.column("source").to_pylist(), ["x.pdf", "x.pdf"])
+        with self.assertRaises(ValueError):
+            make_record_batch(["a", "b"], [[1.0, 2.0], [3.0]], "x.pdf")
+
+    def test_small_batches_are_written_together(self):
+        for i in range(3):
+            vector_store.add_record_batch(batch(f"doc{i}.pdf", 3))
+        self.assertEqual(self.writer.pending_rows, 9)
+        self.assertEqual(self.writer.flushes, 0)
+
+        vector_store.add_record_batch(batch("doc3.pdf", 3))  # 12 rows >= max_rows
+        self.assertEqual(self.writer.pending_rows, 0)
+        self.assertEqual(self.writer.flushes, 1)
+        self.assertEqual(num_fragments(), 1)
+        self.assertEqual(vector_store.count_source_rows("doc3.pdf"), 3)
+
+    def test_flush_by_bytes(self):
+        self.writer.max_bytes = batch("a.pdf", 2).nbytes * 2
+        vector_store.add_record_batch(batch("a.pdf", 2))
+        self.assertEqual(self.writer.flushes, 0)
+        vector_store.add_record_batch(batch("b.pdf", 2))
+        self.assertEqual(self.writer.flushes, 1)
+
+    def test_reads_and_deletes_see_buffered_rows(self):
+        vector_store.add_record_batch(batch("a.pdf", 2))
+        vector_store.add_record_batch(batch("b.pdf", 2))
+        vector_store.delete_document_by_source("a.pdf")
+        self.assertEqual(self.writer.pending_rows, 2)
+
+        self.assertEqual(vector_store.count_source_rows("b.pdf"), 2)
+        self.assertEqual(vector_store.count_source_rows("a.pdf"), 0)
+        self.assertEqual(vector_store.rename_source("b.pdf", "c.pdf"), 2)
+
+    def test_add_documents(self):
+        vector_store.add_documents([
+            {"id": "1", "text": "metin", "embedding": [0.1, 0.2], "source": "v.pdf", "entities": {"faculties": ["Tıp Fakültesi"]}},
+            {"id": "2", "text": "metin 2", "embedding": [0.3, 0.4], "source": "v.pdf", "metadata": '{"dates": ["1967"]}'},
+        ])
+        rows = vector_store.get_db_connection().open_table("vectors").to_arrow().to_pylist()
+        self.assertEqual([r["id"] for r in rows], ["1", "2"])
+        self.assertEqual((rows[0]["faculties"], rows[1]["dates"]), (["tıp fakültesi"], ["1967"]))
+        self.assertEqual(self.writer.pending_rows, 0)
+
+    def test_concurrent_writers(self):
+        def worker(i):
+            for j in range(5):
+                vector_store.add_record_batch(batch(f"doc{i}.pdf", 1))
+            vector_store.delete_document_by_source(f"missing{i}.pdf")
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        vector_store.flush_writes()
+
+        self.assertEqual(sum(vector_store.count_source_rows(f"doc{i}.pdf") for i in range(4)), 20)
+        self.assertLessEqual(num_fragments(), 3)
+
+class TestIngestWrites(IngestTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.writer = VectorWriter(max_rows=1000)
+        self.start_patches(patch.object(vector_store, "_writer_instance", self.writer))
+
+        self.paths = []
+        for i in range(4):
+            path = os.path.join(self.tmp, f"doc{i}.pdf")
+            doc = fitz.open()
+            page = doc.new_page()
+            page.insert_text((50, 72), f"Madde 1 - Hacettepe Üniversitesi küçük belge {i}.")
+            page.insert_text((50, 132), "Madde 2 - Yönergenin son maddesi.")
+            doc.save(path)
+            doc.close()
+            self.paths.append(path)
+
+    def test_small_documents_share_one_fragment(self):
+        results = ingest.ingest_files(self.paths)
+
+        self.assertEqual([r["status"] for r in results], ["indexed"] * 4)
+        self.assertEqual(self.writer.flushes, 1)
+        self.assertEqual(num_fragments(), 1)
+        for i in range(4):
+            self.assertEqual(self.registry.get(f"doc{i}.pdf")["chunks"], 2)
+
+    def test_failed_flush_is_not_registered(self):
+        with patch.object(vector_store, "_append_table", side_effect=OSError("disk full")):
+            results = ingest.ingest_files(self.paths[:2])
+
+        self.assertEqual([r["status"] for r in results], ["error", "error"])
+        self.assertIn("disk full", results[0]["error"])
+        self.assertIsNone(self.registry.get("doc0.pdf"))
+        self.assertEqual(self.writer.pending_rows, 0)
+
+if __name__ == '__main__':
+    unittest.main()
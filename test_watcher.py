@@ -0,0 +1,192 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import fitz
+from watchdog.events import FileCreatedEvent, FileModifiedEvent, FileMovedEvent, FileDeletedEvent
+
+import pipeline.vector_store as vector_store
+from pipeline.watcher import PDFHandler, IngestQueue, DocumentWatcher, make_job, UPSERT, MOVE, REMOVE
+from tests.isolation import IngestTestCase
+
+def make_pdf(path, text):
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((50, 72), text + " Hacettepe Üniversitesi yönerge metni.")
+    doc.save(path)
+    doc.close()
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+class CollectingQueue:
+    def __init__(self):
+        self.jobs = []
+
+    def put(self, job):
+        self.jobs.append(job)
+
+class TestPDFHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.queue = CollectingQueue()
+        self.handler = PDFHandler(self.queue, debounce=0.2)
+
+    def tearDown(self):
+        self.handler.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.tmp, name)
+
+    def test_events_are_coalesced_until_file_is_stable(self):
+        path = self.path("a.pdf")
+        with open(path, "wb") as f:
+            self.handler.on_created(FileCreatedEvent(path))
+            for _ in range(5):
+                f.write(b"x" * 1000)
+                f.flush()
+                self.handler.on_modified(FileModifiedEvent(path))
+                time.sleep(0.1)  # shorter than the debounce: still "being written"
+
+        self.assertEqual(self.queue.jobs, [])
+        self.assertTrue(wait_until(lambda: self.queue.jobs, timeout=3))
+        time.sleep(0.5)
+        self.assertEqual(len(self.queue.jobs), 1)
+        self.assertEqual(self.queue.jobs[0]["action"], UPSERT)
+        self.assertEqual(self.queue.jobs[0]["priority"], (1, 5000))
+
+    def test_growing_file_waits_for_stable_size(self):
+        """Size changing without events (slow copy) still delays the job."""
+        path = self.path("slow.pdf")
+        with open(path, "wb") as f:
+            f.write(b"x")
+            self.handler.on_created(FileCreatedEvent(path))
+            for _ in range(6):
+                time.sleep(0.1)
+                f.write(b"x")
+                f.flush()
+            self.assertEqual(self.queue.jobs, [])
+        self.assertTrue(wait_until(lambda: self.queue.jobs, timeout=3))
+        self.assertEqual(self.queue.jobs[0]["priority"], (1, 7))
+
+    def test_move_and_delete(self):
+        old, new = self.path("eski.pdf"), self.path("yeni.pdf")
+        with open(new, "wb") as f:
+            f.write(b"pdf")
+        self.handler.on_modified(FileModifiedEvent(old))
+        self.handler.on_moved(FileMovedEvent(old, new))
+        self.handler.on_deleted(FileDeletedEvent(self.path("silinen.pdf")))
+        self.handler.on_created(FileCreatedEvent(self.path("notlar.txt")))
+
+        self.assertTrue(wait_until(lambda: len(self.queue.jobs) == 2, timeout=3))
+        jobs = {job["path"]: job for job in self.queue.jobs}
+        self.assertEqual(jobs[new]["action"], MOVE)
+        self.assertEqual(jobs[new]["src_path"], old)
+        self.assertEqual(jobs[self.path("silinen.pdf")]["action"], REMOVE)
+
+    def test_download_rename_is_an_upsert(self):
+        final = self.path("indirilen.pdf")
+        with open(final, "wb") as f:
+            f.write(b"pdf")
+        self.handler.on_moved(FileMovedEvent(self.path("indirilen.pdf.part"), final))
+        self.assertTrue(wait_until(lambda: self.queue.jobs, timeout=3))
+        self.assertEqual(self.queue.jobs[0]["action"], UPSERT)
+
+class TestIngestQueue(unittest.TestCase):
+
+    def test_priority_and_deduplication(self):
+        release = threading.Event()
+        order = []
+
+        def handler(job):
+            if job["path"] == "blocker":
+                release.wait(5)
+            order.append(job["path"])
+
+        q = IngestQueue(workers=1, handler=handler)
+        try:
+            q.put(make_job(UPSERT, "blocker"))
+            time.sleep(0.1)  # worker is busy with the blocker
+            q.put(make_job(UPSERT, "big.pdf", size=3000))
+            q.put(make_job(UPSERT, "small.pdf", size=10))
+            q.put(make_job(UPSERT, "big.pdf", size=3000))
+            q.put(make_job(REMOVE, "gone.pdf"))
+            release.set()
+            self.assertTrue(q.wait_idle(timeout=5))
+        finally:
+            q.stop()
+
+        self.assertEqual(order, ["blocker", "gone.pdf", "small.pdf", "big.pdf"])
+
+    def test_same_path_never_runs_concurrently(self):
+        running = set()
+        overlaps = []
+        runs = []
+
+        def handler(job):
+            if job["path"] in running:
+                overlaps.append(job["path"])
+            running.add(job["path"])
+            time.sleep(0.1)
+            running.discard(job["path"])
+            runs.append(job["path"])
+
+        q = IngestQueue(workers=3, handler=handler)
+        try:
+            q.put(make_job(UPSERT, "a.pdf"))
+            time.sleep(0.03)
+            q.put(make_job(UPSERT, "a.pdf"))  # arrives while a.pdf is running
+            q.put(make_job(UPSERT, "b.pdf"))
+            self.assertTrue(q.wait_idle(timeout=5))
+        finally:
+            q.stop()
+
+        self.assertEqual(overlaps, [])
+        self.assertEqual(sorted(runs), ["a.pdf", "a.pdf", "b.pdf"])
+
+class TestDocumentWatcher(IngestTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.docs = os.path.join(self.tmp, "belgeler")
+        os.makedirs(self.docs)
+        self.watcher = DocumentWatcher(self.docs, workers=2, debounce=0.2).start()
+
+    def tearDown(self):
+        self.watcher.stop()
+        self.watcher.join()
+
+    def test_create_update_rename_delete(self):
+        staging = os.path.join(self.tmp, "staging.pdf")
+        path = os.path.join(self.docs, "a.pdf")
+
+        make_pdf(staging, "Madde 1 - İlk sürüm.")
+        shutil.copy(staging, path)
+        self.assertTrue(wait_until(lambda: vector_store.count_source_rows("a.pdf") == 1))
+
+        make_pdf(staging, "Madde 1 - İkinci sürüm. Madde 2 - Yeni madde.")
+        shutil.copy(staging, path)
+        self.assertTrue(wait_until(lambda: vector_store.count_source_rows("a.pdf") == 2))
+
+        renamed = os.path.join(self.docs, "b.pdf")
+        os.rename(path, renamed)
+        self.assertTrue(wait_until(lambda: vector_store.count_source_rows("b.pdf") == 2))
+        self.assertTrue(wait_until(lambda: self.registry.get("a.pdf") is None))
+        self.assertEqual(vector_store.count_source_rows("a.pdf"), 0)
+
+        os.remove(renamed)
+        self.assertTrue(wait_until(lambda: vector_store.count_source_rows("b.pdf") == 0))
+        self.assertTrue(wait_until(lambda: self.registry.get("b.pdf") is None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Shared test isolation: every test gets a temporary directory holding its LanceDB
+database, document registry and cache files, and fresh instances of the module-level
+singletons (vector writer/store, embedding / query-embedding / retrieval / answer /
+OCR caches), so tests never read or write lancedb_data/ or cache/ and never see each
+other's state. IngestTestCase also runs a mock Ollama server for the embedder.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pipeline.cache as query_cache
+import pipeline.doc_registry as doc_registry
+import pipeline.embedder as embedder
+import pipeline.embedding_cache as embedding_cache
+import pipeline.ocr_cache as ocr_cache
+import pipeline.retrieval_cache as retrieval_cache
+import pipeline.vector_store as vector_store
+from mock_ollama import MockOllamaServer
+
+class IsolatedTestCase(unittest.TestCase):
+    """TestCase whose vector store, registry and caches live in self.tmp"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.uri = os.path.join(self.tmp, "db")
+        self.registry = doc_registry.DocumentRegistry(os.path.join(self.tmp, "registry.json"))
+        self.start_patches(
+            patch.object(vector_store, "LANCEDB_URI", self.uri),
+            patch.object(vector_store, "_writer_instance", vector_store.VectorWriter()),
+            patch.object(vector_store, "_store_instance", None),
+            patch.object(doc_registry, "_registry_instance", self.registry),
+            patch.object(embedding_cache, "_cache_instance",
+                         embedding_cache.EmbeddingCache(os.path.join(self.tmp, "emb.sqlite"))),
+            patch.object(embedding_cache, "_query_cache_instance", embedding_cache.QueryEmbeddingCache()),
+            patch.object(retrieval_cache, "_cache_instance", retrieval_cache.RetrievalCache()),
+            patch.object(query_cache, "CACHE_DIR", os.path.join(self.tmp, "cache")),
+            patch.object(query_cache, "_cache_instance", None),
+            patch.object(ocr_cache, "_cache_instance", ocr_cache.OCRCache(os.path.join(self.tmp, "ocr.sqlite"))),
+        )
+
+    def start_patches(self, *patches):
+        """Starts patches; they are stopped after tearDown, in reverse order"""
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+class IngestTestCase(IsolatedTestCase):
+    """IsolatedTestCase with a mock Ollama server (self.server) behind the embedder"""
+
+    def setUp(self):
+        super().setUp()
+        self.server = MockOllamaServer(dim=8)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.start_patches(patch.object(embedder, "OLLAMA_BASE_URL", self.server.base_url))
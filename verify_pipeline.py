@@ -59,7 +59,7 @@ def run_verification():
         "text": chunk,
         "embedding": get_embedding(chunk),
         "source": "test_doc.pdf",
-        "metadata": "{}"
+        "entities": {}
     } for chunk in chunks]
     
     add_documents(doc_data)